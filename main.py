@@ -4,10 +4,9 @@ import os
 import plotly.graph_objects as go
 import webbrowser
 from chart_volume import plot_close_and_volume
-from quant_stat.range_calculations import add_range_indicators
-from utils.date_utils import add_day_of_week
 from strat_OM.plot_range import plot_range_chart
-from quant_stat.get_levels import get_levels
+from quant_stat.daily_builder import resample_daily, resample_daily_chunked, build_daily_levels, update_daily_levels, day_type_legend
+from utils.minute_cache import load_minute_range
 
 symbol = 'ES'
 timeframe = '1D'
@@ -17,6 +16,23 @@ expansion_pct = 0.4  # 40% expansión para range_enter
 stop_multiplier_pct = 2.5  # 50% para range_stop
 range_lookback = 3  # Lookback de 20 días para cálculo de range    
 
+# Clasificación de day_type: límites de range entre tipos y etiquetas (una más que límites)
+day_type_bins = [50, 60, 70, 80, 100]
+day_type_labels = ['mean', 'upto_60', 'upto_70', 'upto_80', 'upto_100', 'more_100']
+
+# Day_type adaptativo: percentil del range dentro de los day_type_window días anteriores (None = límites fijos)
+day_type_window = None
+if day_type_window is not None:
+    day_type_bins = [20, 40, 60, 80, 95]  # percentiles
+    day_type_labels = ['pct_0_20', 'pct_20_40', 'pct_40_60', 'pct_60_80', 'pct_80_95', 'pct_95_100']
+
+# Modo incremental: solo procesa los minutos nuevos desde el último día de es_1D_data_range.csv
+incremental = False
+
+# Modo streaming: resample del CSV por bloques, sin cargar todo el histórico en memoria
+streaming = False
+streaming_chunksize = 1_000_000
+
 # ====================================================
 # 📥 CARGA DE DATOS
 # ====================================================
@@ -24,82 +40,45 @@ directorio = 'data'
 nombre_fichero = 'es_1min_data.csv'
 ruta_completa = os.path.join(directorio, nombre_fichero)
 
-print("\n======================== 🔍 df  ===========================")
-df = pd.read_csv(ruta_completa, index_col=0, parse_dates=True)
-print('Fichero:', ruta_completa, 'importado')
-print(f"Características del Fichero Base: {df.shape}")
-
-# Normalizar columnas a minúsculas y renombrar 'volumen' a 'volume'
-df.columns = [col.strip().lower() for col in df.columns]
-df = df.rename(columns={'volumen': 'volume'})
-
-
-
-
-# ====================================================
-
-# 🔁 Resample a velas diarias
-df_daily = df.resample('1D').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).dropna()
-
-# Reset index para usar 'date' como columna
-df_daily = df_daily.reset_index()
-
-print(df_daily.head())
-print(f"Datos diarios - shape: {df_daily.shape}")
-print(df_daily.info())
-
-# Añadir indicadores de range
-df_daily = add_range_indicators(df_daily, expansion_pct, stop_multiplier_pct, range_lookback)
-
-# Añadir día de la semana
-df_daily = add_day_of_week(df_daily, 'date')
-
-# Añadir niveles de trading
-df_daily = get_levels(df_daily)
-
-# Añadir clasificación de day_type basada en range
-def classify_day_type(range_value):
-    """
-    Clasifica el tipo de día basado en el valor del range
+output_daily = os.path.join('data', 'es_1D_data_range.csv')
 
-    Parameters:
-    range_value (float): Valor del range diario
-
-    Returns:
-    str: Clasificación del día
-    """
-    if pd.isna(range_value):
-        return 'unknown'
-    elif range_value < 50:
-        return 'mean'
-    elif range_value < 60:
-        return 'upto_60'
-    elif range_value < 70:
-        return 'upto_70'
-    elif range_value < 80:
-        return 'upto_80'
-    elif range_value < 100:
-        return 'upto_100'
-    else:
-        return 'more_100'
-
-df_daily['day_type'] = df_daily['range'].apply(classify_day_type)
-
-# Remover filas donde dow == "sunday"
-df_daily = df_daily[df_daily['dow'] != 'sunday']
-
-# Reordenar columnas
-column_order = ['date', 'dow', 'open', 'high', 'low', 'close', 'volume', 'range', 'day_type', 'range_avg', 'range_enter', 'range_stop', 'long_level', 'short_level', 'long_stop', 'short_stop']
-df_daily = df_daily[column_order]
+if incremental and os.path.exists(output_daily):
+    print("\n======================== 🔁 ACTUALIZACIÓN INCREMENTAL ===========================")
+    df_daily = update_daily_levels(ruta_completa, output_daily, expansion_pct, stop_multiplier_pct, range_lookback,
+                                   day_type_bins, day_type_labels, day_type_window)
+elif streaming:
+    print("\n======================== 🌊 RESAMPLE POR BLOQUES ===========================")
+    df_daily = resample_daily_chunked(ruta_completa, streaming_chunksize)
+    print(f"Datos diarios - shape: {df_daily.shape}")
+
+    # Indicadores de range, día de la semana, niveles de trading y day_type (sin domingos)
+    df_daily = build_daily_levels(df_daily, expansion_pct, stop_multiplier_pct, range_lookback,
+                                  day_type_bins, day_type_labels, day_type_window)
+else:
+    print("\n======================== 🔍 df  ===========================")
+    # La primera ejecución convierte el CSV a parquet particionado; las siguientes leen la caché
+    df = load_minute_range(ruta_completa)
+    print('Fichero:', ruta_completa, 'importado')
+    print(f"Características del Fichero Base: {df.shape}")
+
+    # Normalizar columnas a minúsculas y renombrar 'volumen' a 'volume'
+    df.columns = [col.strip().lower() for col in df.columns]
+    df = df.rename(columns={'volumen': 'volume'})
+
+    # ====================================================
+
+    # 🔁 Resample a velas diarias
+    df_daily = resample_daily(df)
+
+    print(df_daily.head())
+    print(f"Datos diarios - shape: {df_daily.shape}")
+    print(df_daily.info())
+
+    # Indicadores de range, día de la semana, niveles de trading y day_type (sin domingos)
+    df_daily = build_daily_levels(df_daily, expansion_pct, stop_multiplier_pct, range_lookback,
+                                  day_type_bins, day_type_labels, day_type_window)
 
 # Guardar datos diarios en carpeta data
-output_daily = os.path.join('data', 'es_1D_data_range.csv')
 df_daily.to_csv(output_daily, index=False)
 
 print(f"Datos diarios guardados en: {output_daily}")
@@ -109,13 +88,12 @@ print(f"\n=== DISTRIBUCIÓN DE TIPOS DE DÍA ===")
 day_type_counts = df_daily['day_type'].value_counts().sort_index()
 day_type_pct = df_daily['day_type'].value_counts(normalize=True).sort_index() * 100
 
-print("Clasificación basada en range diario:")
-print("- mean: < 50 puntos")
-print("- upto_60: 50-60 puntos")
-print("- upto_70: 60-70 puntos")
-print("- upto_80: 70-80 puntos")
-print("- upto_100: 80-100 puntos")
-print("- more_100: > 100 puntos")
+if day_type_window is None:
+    print("Clasificación basada en range diario:")
+else:
+    print(f"Clasificación adaptativa (percentil del range en ventana de {day_type_window} días):")
+for line in day_type_legend(day_type_bins, day_type_labels, day_type_window):
+    print(f"- {line}")
 print()
 
 for day_type in day_type_counts.index:
@@ -0,0 +1,354 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from quant_stat.range_calculations import calculate_range, range_indicator_matrices
+from quant_stat.get_levels import level_matrices
+from quant_stat.rolling_quantile import rolling_percentile_rank
+from utils.date_utils import DOW_NAMES, get_dow_codes
+from utils.minute_cache import load_minute_range
+from utils.minute_loader import parse_timestamps
+
+# Orden de columnas de es_1D_data_range.csv
+DAILY_COLUMNS = ['date', 'dow', 'open', 'high', 'low', 'close', 'volume', 'range', 'day_type', 'range_avg', 'range_enter', 'range_stop', 'long_level', 'short_level', 'long_stop', 'short_stop']
+
+# Clasificación de day_type por range: límites superiores (exclusivos) de cada tipo
+DAY_TYPE_BINS = [50, 60, 70, 80, 100]
+DAY_TYPE_LABELS = ['mean', 'upto_60', 'upto_70', 'upto_80', 'upto_100', 'more_100']
+
+# Clasificación adaptativa: límites en percentiles del range dentro de la ventana de días anteriores
+ADAPTIVE_DAY_TYPE_BINS = [20, 40, 60, 80, 95]
+ADAPTIVE_DAY_TYPE_LABELS = ['pct_0_20', 'pct_20_40', 'pct_40_60', 'pct_60_80', 'pct_80_95', 'pct_95_100']
+
+# Caché de etapas del pipeline diario (base, niveles, day_type) por huella de las velas
+FEATURE_CACHE_SIZE = 16
+_FEATURE_CACHE = OrderedDict()
+
+def resample_daily(df):
+    """
+    Agrega los datos de 1 minuto a velas diarias OHLCV
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto indexados por fecha con open/high/low/close/volume
+
+    Returns:
+    DataFrame: Velas diarias con 'date' como columna
+    """
+    df_daily = df.resample('1D').agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum'
+    }).dropna()
+
+    # Reset index para usar 'date' como columna
+    return df_daily.reset_index()
+
+def _aggregate_days(df):
+    """
+    Agrega filas de 1 minuto (ordenadas) a OHLCV por día, solo días con datos
+    """
+    day_keys = df.index.floor('D').rename(df.index.name)
+    return df.groupby(day_keys).agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum'
+    })
+
+def resample_daily_chunked(csv_path, chunksize=1_000_000):
+    """
+    Agrega el CSV de 1 minuto a velas diarias leyéndolo por bloques (memoria acotada)
+
+    Cada bloque agrega sus días completos; las filas del último día del bloque, que
+    puede continuar en el siguiente, se guardan y se anteponen al bloque siguiente.
+    El resultado es el mismo que resample_daily sobre el fichero completo.
+
+    Parameters:
+    csv_path (str): Ruta al CSV de 1 minuto (ordenado por fecha)
+    chunksize (int): Filas por bloque
+
+    Returns:
+    DataFrame: Velas diarias con 'date' como columna
+    """
+    daily_parts = []
+    pending = None
+    rows_read = 0
+
+    for chunk in pd.read_csv(csv_path, index_col=0, chunksize=chunksize):
+        chunk.index = parse_timestamps(chunk.index.to_numpy()).rename(chunk.index.name)
+
+        # Normalizar columnas igual que main.py
+        chunk.columns = [col.strip().lower() for col in chunk.columns]
+        chunk = chunk.rename(columns={'volumen': 'volume'})
+        rows_read += len(chunk)
+
+        if pending is not None:
+            if len(chunk) > 0 and chunk.index[0] < pending.index[-1]:
+                raise ValueError("El CSV de 1 minuto debe estar ordenado por fecha para el resample por bloques")
+            chunk = pd.concat([pending, chunk])
+
+        if not chunk.index.is_monotonic_increasing:
+            raise ValueError("El CSV de 1 minuto debe estar ordenado por fecha para el resample por bloques")
+
+        # El último día del bloque queda pendiente hasta ver el siguiente bloque
+        last_day = chunk.index[-1].floor('D')
+        is_pending = chunk.index >= last_day
+        pending = chunk[is_pending]
+
+        complete = chunk[~is_pending]
+        if len(complete) > 0:
+            daily_parts.append(_aggregate_days(complete))
+
+        print(f"  {rows_read:,} filas procesadas", end='\r')
+
+    if pending is not None and len(pending) > 0:
+        daily_parts.append(_aggregate_days(pending))
+
+    print(f"\nResample por bloques completado: {rows_read:,} filas")
+
+    df_daily = pd.concat(daily_parts).dropna()
+
+    # Reset index para usar 'date' como columna
+    return df_daily.reset_index()
+
+def classify_day_types(range_values, bins=None, labels=None):
+    """
+    Clasifica el tipo de día por su range con límites configurables (np.digitize)
+
+    Parameters:
+    range_values (array): Ranges diarios
+    bins (list): Límites crecientes entre tipos (default DAY_TYPE_BINS)
+    labels (list): Etiquetas, una más que límites (default DAY_TYPE_LABELS)
+
+    Returns:
+    ndarray: Etiqueta de day_type por día ('unknown' si el range es NaN)
+    """
+    bins = DAY_TYPE_BINS if bins is None else list(bins)
+    labels = DAY_TYPE_LABELS if labels is None else list(labels)
+    if len(labels) != len(bins) + 1:
+        raise ValueError(f"Se necesitan {len(bins) + 1} etiquetas para {len(bins)} límites de day_type")
+    if len(bins) > 1 and not np.all(np.diff(bins) > 0):
+        raise ValueError("Los límites de day_type deben ser crecientes")
+
+    range_values = np.asarray(range_values, dtype=np.float64)
+    positions = np.digitize(range_values, bins, right=False)
+
+    result = np.array(labels, dtype=object)[positions]
+    result[np.isnan(range_values)] = 'unknown'
+
+    return result
+
+def day_type_legend(bins=None, labels=None, day_type_window=None):
+    """
+    Descripción de cada day_type a partir de sus límites (misma regla que classify_day_types)
+
+    Parameters:
+    bins (list): Límites crecientes entre tipos (default DAY_TYPE_BINS, o ADAPTIVE_DAY_TYPE_BINS con ventana)
+    labels (list): Etiquetas, una más que límites (default DAY_TYPE_LABELS, o ADAPTIVE_DAY_TYPE_LABELS con ventana)
+    day_type_window (int): Ventana del day_type adaptativo; con ella los límites son percentiles del range
+
+    Returns:
+    list: Líneas 'etiqueta: intervalo' en el orden de las etiquetas
+    """
+    if day_type_window is None:
+        default_bins, default_labels = DAY_TYPE_BINS, DAY_TYPE_LABELS
+        unit = 'puntos'
+    else:
+        default_bins, default_labels = ADAPTIVE_DAY_TYPE_BINS, ADAPTIVE_DAY_TYPE_LABELS
+        unit = 'percentil'
+    bins = default_bins if bins is None else list(bins)
+    labels = default_labels if labels is None else list(labels)
+    if len(labels) != len(bins) + 1:
+        raise ValueError(f"Se necesitan {len(bins) + 1} etiquetas para {len(bins)} límites de day_type")
+
+    legend = [f"{labels[0]}: < {bins[0]:g} {unit}"]
+    for label, lower, upper in zip(labels[1:-1], bins[:-1], bins[1:]):
+        legend.append(f"{label}: {lower:g}-{upper:g} {unit}")
+    legend.append(f"{labels[-1]}: >= {bins[-1]:g} {unit}")
+
+    return legend
+
+def _bars_fingerprint(df_daily):
+    """
+    Huella de las velas diarias (fechas y OHLC) para la caché de etapas
+    """
+    digest = hashlib.sha1()
+    dates = pd.to_datetime(df_daily['date'])
+    digest.update(str(dates.dtype).encode())
+    digest.update(pd.DatetimeIndex(dates).asi8.tobytes())
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        digest.update(df_daily[col].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def _cached_stage(key, compute):
+    """
+    Devuelve el resultado cacheado de una etapa o lo calcula y lo guarda (LRU)
+    """
+    if key in _FEATURE_CACHE:
+        _FEATURE_CACHE.move_to_end(key)
+        return _FEATURE_CACHE[key]
+
+    result = compute()
+    _FEATURE_CACHE[key] = result
+    while len(_FEATURE_CACHE) > FEATURE_CACHE_SIZE:
+        _FEATURE_CACHE.popitem(last=False)
+
+    return result
+
+def clear_feature_cache():
+    """
+    Vacía la caché de etapas del pipeline diario
+    """
+    _FEATURE_CACHE.clear()
+
+def build_daily_levels(df_daily, expansion_pct, stop_multiplier_pct, range_lookback, day_type_bins=None, day_type_labels=None, day_type_window=None):
+    """
+    Añade indicadores de range, dow, niveles y day_type a las velas diarias
+
+    Pipeline en tres etapas sobre arrays (sin copias intermedias del DataFrame), cada
+    una cacheada por separado: base (range y dow), niveles (por expansion_pct,
+    stop_multiplier_pct y range_lookback) y day_type (por límites). Cambiar solo los
+    límites de day_type no recalcula los niveles.
+
+    Con day_type_window el day_type es adaptativo: cada día se clasifica por el percentil
+    de su range dentro de los day_type_window días anteriores (sin domingos), y los
+    límites pasan a ser percentiles (default ADAPTIVE_DAY_TYPE_BINS). Los días sin
+    historia suficiente quedan como 'unknown'.
+
+    Los indicadores se calculan con los domingos incluidos y los domingos se eliminan al final.
+
+    Parameters:
+    df_daily (DataFrame): Velas diarias de resample_daily
+    expansion_pct (float): Expansión para range_enter
+    stop_multiplier_pct (float): Multiplicador para range_stop
+    range_lookback (int): Lookback para range_avg
+    day_type_bins (list): Límites de day_type (opcional, default DAY_TYPE_BINS)
+    day_type_labels (list): Etiquetas de day_type (opcional, default DAY_TYPE_LABELS)
+    day_type_window (int): Días de la ventana para el day_type adaptativo (opcional, None = límites fijos)
+
+    Returns:
+    DataFrame: Datos diarios sin domingos con las columnas de DAILY_COLUMNS
+    """
+    bars_key = _bars_fingerprint(df_daily)
+    if day_type_window is None:
+        default_bins, default_labels = DAY_TYPE_BINS, DAY_TYPE_LABELS
+    else:
+        default_bins, default_labels = ADAPTIVE_DAY_TYPE_BINS, ADAPTIVE_DAY_TYPE_LABELS
+    bins = tuple(default_bins if day_type_bins is None else day_type_bins)
+    labels = tuple(default_labels if day_type_labels is None else day_type_labels)
+
+    # Etapa 1: range y código del día de la semana
+    def compute_base():
+        return {
+            'range': calculate_range(df_daily).to_numpy(dtype=np.float64),
+            'dow_code': get_dow_codes(df_daily['date'])
+        }
+    base = _cached_stage(('base', bars_key), compute_base)
+
+    # Etapa 2: range_avg, range_enter/range_stop y los 4 niveles
+    def compute_levels():
+        ranges = range_indicator_matrices(df_daily, [expansion_pct], [stop_multiplier_pct], [range_lookback])
+        levels = level_matrices(df_daily, ranges['range_enter'], ranges['range_stop'])
+        return {
+            'range_avg': ranges['range_avg'][:, 0],
+            'range_enter': ranges['range_enter'][:, 0],
+            'range_stop': ranges['range_stop'][:, 0],
+            **{col: matrix[:, 0] for col, matrix in levels.items()}
+        }
+    levels = _cached_stage(('levels', bars_key, expansion_pct, stop_multiplier_pct, range_lookback), compute_levels)
+
+    # Remover filas donde dow == "sunday"
+    keep = base['dow_code'] != DOW_NAMES.index('sunday') + 1
+
+    # Etapa 3: day_type sobre el range redondeado (o sobre su percentil en la ventana)
+    rounded_range = np.round(base['range'], 2)
+
+    def compute_day_type():
+        if day_type_window is None:
+            return classify_day_types(rounded_range, bins, labels)
+        percentile = np.full(len(rounded_range), np.nan)
+        percentile[keep] = rolling_percentile_rank(rounded_range[keep], day_type_window)
+        return classify_day_types(percentile, bins, labels)
+    day_type = _cached_stage(('day_type', bars_key, bins, labels, day_type_window), compute_day_type)
+    dow_names = np.array(DOW_NAMES, dtype=object)[base['dow_code'] - 1]
+
+    columns = {
+        'date': pd.to_datetime(df_daily['date'])[keep],
+        'dow': pd.Series(dow_names[keep], index=df_daily.index[keep], dtype='str')
+    }
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        columns[col] = df_daily[col][keep]
+    columns['range'] = pd.Series(rounded_range[keep], index=df_daily.index[keep])
+    columns['day_type'] = pd.Series(day_type[keep], index=df_daily.index[keep])
+    for col in ['range_avg', 'range_enter', 'range_stop', 'long_level', 'short_level', 'long_stop', 'short_stop']:
+        columns[col] = pd.Series(levels[col][keep], index=df_daily.index[keep])
+
+    return pd.DataFrame(columns)[DAILY_COLUMNS]
+
+def update_daily_levels(data_path, daily_path, expansion_pct, stop_multiplier_pct, range_lookback, day_type_bins=None, day_type_labels=None, day_type_window=None):
+    """
+    Actualiza es_1D_data_range.csv de forma incremental con los minutos nuevos
+
+    Se recalcula desde el último día guardado (inclusive, por si estaba incompleto)
+    leyendo solo los minutos desde range_lookback días antes, que bastan para que
+    range_avg y los niveles (shift de un día) salgan idénticos a una reconstrucción
+    completa (con day_type adaptativo, el warm-up cubre también day_type_window días).
+    Los parámetros deben ser los mismos con los que se generó el fichero.
+
+    Parameters:
+    data_path (str): Ruta al CSV de 1 minuto
+    daily_path (str): Ruta a es_1D_data_range.csv existente
+    expansion_pct (float): Expansión para range_enter
+    stop_multiplier_pct (float): Multiplicador para range_stop
+    range_lookback (int): Lookback para range_avg
+    day_type_bins (list): Límites de day_type (opcional, default DAY_TYPE_BINS)
+    day_type_labels (list): Etiquetas de day_type (opcional, default DAY_TYPE_LABELS)
+    day_type_window (int): Ventana del day_type adaptativo (opcional)
+
+    Returns:
+    DataFrame: Datos diarios completos (filas existentes + filas nuevas/recalculadas)
+    """
+    df_existing = pd.read_csv(daily_path, parse_dates=['date'])
+    if len(df_existing) == 0:
+        raise ValueError(f"El fichero diario {daily_path} está vacío; ejecutar una reconstrucción completa")
+
+    last_date = df_existing['date'].iloc[-1]
+    last_position = len(df_existing) - 1
+
+    # range_lookback (o day_type_window) días guardados antes del último: cada uno es al
+    # menos una vela (los domingos solo añaden velas extra dentro de la ventana)
+    warmup_position = last_position - max(range_lookback, day_type_window or 0)
+    if warmup_position <= 0:
+        warmup_start = None
+    else:
+        warmup_start = df_existing['date'].iloc[warmup_position].strftime('%Y-%m-%d')
+
+    print(f"Último día guardado: {last_date.date()} | Warm-up desde: {warmup_start or 'inicio'}")
+
+    df = load_minute_range(data_path, warmup_start)
+    df.columns = [col.strip().lower() for col in df.columns]
+    df = df.rename(columns={'volumen': 'volume'})
+
+    df_new = build_daily_levels(resample_daily(df), expansion_pct, stop_multiplier_pct, range_lookback,
+                                day_type_bins, day_type_labels, day_type_window)
+    df_new = df_new[df_new['date'] >= last_date]
+
+    df_daily = pd.concat([df_existing[df_existing['date'] < last_date], df_new], ignore_index=True)
+
+    print(f"Días recalculados/añadidos: {len(df_new)} (total: {len(df_daily):,})")
+
+    return df_daily
+
+if __name__ == "__main__":
+    print("Daily builder module loaded successfully")
+    print("Available functions:")
+    print("- resample_daily(df)")
+    print("- resample_daily_chunked(csv_path, chunksize=1_000_000)")
+    print("- classify_day_types(range_values, bins=None, labels=None)")
+    print("- day_type_legend(bins=None, labels=None, day_type_window=None)")
+    print("- build_daily_levels(df_daily, expansion_pct, stop_multiplier_pct, range_lookback, day_type_bins=None, day_type_labels=None, day_type_window=None)")
+    print("- clear_feature_cache()")
+    print("- update_daily_levels(data_path, daily_path, expansion_pct, stop_multiplier_pct, range_lookback, day_type_bins=None, day_type_labels=None, day_type_window=None)")
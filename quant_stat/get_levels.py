@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def calculate_entry_level_long(df):
@@ -94,9 +95,37 @@ def add_entry_levels(df):
 
     return df_copy
 
+def level_matrices(df, range_enter, range_stop):
+    """
+    Versión por lotes de get_levels sobre matrices días x combinaciones
+
+    Parameters:
+    df (DataFrame): DataFrame con columna 'open' (mismas filas que las matrices)
+    range_enter (ndarray): Matriz días x combinaciones de range_enter
+    range_stop (ndarray): Matriz días x combinaciones de range_stop
+
+    Returns:
+    dict: Matrices long_level, short_level, long_stop, short_stop (NaN en el primer día)
+    """
+    day_open = df['open'].to_numpy(dtype=np.float64)[:, np.newaxis]
+
+    # Range de ayer: desplazar una fila hacia adelante
+    prev_enter = np.full(range_enter.shape, np.nan)
+    prev_enter[1:] = range_enter[:-1]
+    prev_stop = np.full(range_stop.shape, np.nan)
+    prev_stop[1:] = range_stop[:-1]
+
+    return {
+        'long_level': np.round(day_open + prev_enter, 2),
+        'short_level': np.round(day_open - prev_enter, 2),
+        'long_stop': np.round(day_open - prev_stop, 2),
+        'short_stop': np.round(day_open + prev_stop, 2)
+    }
+
 if __name__ == "__main__":
     print("Get levels module loaded successfully")
     print("Available functions:")
     print("- calculate_entry_level(df)")
     print("- calculate_stop_level(df)")
-    print("- add_entry_levels(df)")
\ No newline at end of file
+    print("- add_entry_levels(df)")
+    print("- level_matrices(df, range_enter, range_stop)")
\ No newline at end of file
@@ -86,4 +86,88 @@ def add_range_indicators(df, expansion_pct=0.1, stop_multiplier=2.0, lookback=20
     df_copy['range_enter'] = calculate_range_enter(df_copy, expansion_pct, use_avg=True, lookback=lookback).round(2)
     df_copy['range_stop'] = calculate_range_stop(df_copy, stop_multiplier, use_avg=True, lookback=lookback).round(2)
 
-    return df_copy
\ No newline at end of file
+    return df_copy
+
+def rolling_mean_matrix(values, lookbacks):
+    """
+    Medias móviles de un array para varios lookbacks a la vez con sumas acumuladas
+
+    Misma semántica que Series.rolling(window=lookback, min_periods=1).mean(): la media
+    usa solo los valores no NaN de la ventana y es NaN si no hay ninguno.
+
+    Parameters:
+    values (array): Valores por día (p.ej. el range)
+    lookbacks (array): Lookbacks a calcular
+
+    Returns:
+    ndarray: Matriz días x lookbacks con las medias móviles
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lookbacks = np.asarray(lookbacks, dtype=np.int64)
+    if (lookbacks < 1).any():
+        raise ValueError("Los lookbacks deben ser >= 1")
+
+    valid = ~np.isnan(values)
+    cum_sum = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    cum_count = np.concatenate(([0], np.cumsum(valid)))
+
+    # Ventana [i - lookback + 1, i] de cada día, recortada al inicio de la serie
+    ends = np.arange(1, len(values) + 1)[:, np.newaxis]
+    starts = np.maximum(ends - lookbacks[np.newaxis, :], 0)
+
+    window_sum = cum_sum[ends] - cum_sum[starts]
+    window_count = cum_count[ends] - cum_count[starts]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_count > 0, window_sum / window_count, np.nan)
+
+def range_indicator_matrices(df, expansion_pcts, stop_multipliers, lookbacks):
+    """
+    Versión por lotes de add_range_indicators: todas las combinaciones en una sola llamada
+
+    Las combinaciones son el producto (expansion_pct, stop_multiplier, lookback) en ese
+    orden; range_avg se calcula una vez por lookback y no se copia el DataFrame.
+
+    Parameters:
+    df (DataFrame): DataFrame con columnas 'high' y 'low'
+    expansion_pcts (list): Valores de expansion_pct
+    stop_multipliers (list): Valores de stop_multiplier
+    lookbacks (list): Valores de lookback
+
+    Returns:
+    dict: 'params' (DataFrame con una fila por combinación) y matrices días x combinaciones
+          'range_avg', 'range_enter' y 'range_stop' (redondeadas como add_range_indicators)
+    """
+    expansion_grid, stop_grid, lookback_grid = np.meshgrid(
+        np.asarray(expansion_pcts, dtype=np.float64),
+        np.asarray(stop_multipliers, dtype=np.float64),
+        np.asarray(lookbacks, dtype=np.int64),
+        indexing='ij'
+    )
+    expansion_grid = expansion_grid.ravel()
+    stop_grid = stop_grid.ravel()
+    lookback_grid = lookback_grid.ravel()
+
+    unique_lookbacks, lookback_pos = np.unique(lookback_grid, return_inverse=True)
+    range_avg = rolling_mean_matrix(calculate_range(df).to_numpy(dtype=np.float64), unique_lookbacks)
+    range_avg = range_avg[:, lookback_pos]
+
+    return {
+        'params': pd.DataFrame({
+            'expansion_pct': expansion_grid,
+            'stop_multiplier': stop_grid,
+            'lookback': lookback_grid
+        }),
+        'range_avg': np.round(range_avg, 2),
+        'range_enter': np.round(range_avg * expansion_grid, 2),
+        'range_stop': np.round(range_avg * stop_grid, 2)
+    }
+
+if __name__ == "__main__":
+    print("Range calculations module loaded successfully")
+    print("Available functions:")
+    print("- calculate_range(df)")
+    print("- calculate_range_avg(df, lookback=20)")
+    print("- add_range_indicators(df, expansion_pct=0.1, stop_multiplier=2.0, lookback=20)")
+    print("- rolling_mean_matrix(values, lookbacks)")
+    print("- range_indicator_matrices(df, expansion_pcts, stop_multipliers, lookbacks)")
@@ -0,0 +1,143 @@
+import numpy as np
+
+def _fenwick_add(tree, position, delta):
+    """
+    Suma delta en la posición (base 1) del árbol de Fenwick
+    """
+    size = len(tree) - 1
+    while position <= size:
+        tree[position] += delta
+        position += position & -position
+
+def _fenwick_prefix(tree, position):
+    """
+    Número de elementos en las posiciones 1..position
+    """
+    total = 0
+    while position > 0:
+        total += tree[position]
+        position -= position & -position
+    return total
+
+def _fenwick_kth(tree, k, top_bit):
+    """
+    Menor posición (base 1) cuya suma acumulada alcanza k (k-ésimo elemento de la ventana)
+    """
+    position = 0
+    step = top_bit
+    while step > 0:
+        candidate = position + step
+        if candidate < len(tree) and tree[candidate] < k:
+            position = candidate
+            k -= tree[candidate]
+        step >>= 1
+    return position + 1
+
+def _compress(values):
+    """
+    Compresión de coordenadas: posición en el árbol (base 1) de cada valor, 0 para NaN
+
+    Returns:
+    tuple: (valores distintos ordenados, posición por día)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    distinct = np.unique(values[valid])
+    ranks = np.zeros(len(values), dtype=np.int64)
+    ranks[valid] = np.searchsorted(distinct, values[valid]) + 1
+    return distinct, ranks
+
+def _rolling_window(ranks, size, window, min_periods, visit):
+    """
+    Recorre la serie manteniendo en un árbol de Fenwick los valores de la ventana anterior
+
+    Para cada día i la ventana son los 'window' valores no NaN anteriores (sin incluir i);
+    visit(i, tree, count) se llama cuando la ventana tiene al menos min_periods valores.
+    Cada día cuesta O(log n): una inserción, una eliminación y la consulta de visit.
+    """
+    if window < 1:
+        raise ValueError("La ventana debe ser >= 1")
+    if min_periods is None:
+        min_periods = window
+
+    tree = [0] * (size + 1)
+    window_ranks = []
+    oldest = 0
+
+    for i, rank in enumerate(ranks.tolist()):
+        count = len(window_ranks) - oldest
+        if count >= min_periods:
+            visit(i, tree, count)
+
+        if rank > 0:
+            _fenwick_add(tree, rank, 1)
+            window_ranks.append(rank)
+            if len(window_ranks) - oldest > window:
+                _fenwick_add(tree, window_ranks[oldest], -1)
+                oldest += 1
+
+def rolling_percentile_rank(values, window, min_periods=None):
+    """
+    Percentil de cada valor dentro de la ventana de los 'window' valores anteriores
+
+    El percentil es el porcentaje de la ventana con valor <= que el del día, así que
+    solo usa información pasada (el día no forma parte de su propia ventana).
+
+    Parameters:
+    values (array): Serie diaria (p.ej. el range)
+    window (int): Número de días anteriores de la ventana
+    min_periods (int): Días mínimos en la ventana (default window); antes devuelve NaN
+
+    Returns:
+    ndarray: Percentil 0-100 por día (NaN sin historia suficiente o si el valor es NaN)
+    """
+    distinct, ranks = _compress(values)
+    result = np.full(len(ranks), np.nan)
+
+    def visit(i, tree, count):
+        if ranks[i] > 0:
+            result[i] = 100.0 * _fenwick_prefix(tree, int(ranks[i])) / count
+
+    _rolling_window(ranks, len(distinct), window, min_periods, visit)
+
+    return result
+
+def rolling_quantile(values, window, quantile, min_periods=None):
+    """
+    Cuantil de la ventana de los 'window' valores anteriores a cada día (sin interpolar)
+
+    Devuelve el k-ésimo menor valor de la ventana con k = ceil(quantile * n), el mismo
+    criterio que np.quantile(..., method='inverted_cdf').
+
+    Parameters:
+    values (array): Serie diaria (p.ej. el range)
+    window (int): Número de días anteriores de la ventana
+    quantile (float): Cuantil entre 0 y 1
+    min_periods (int): Días mínimos en la ventana (default window); antes devuelve NaN
+
+    Returns:
+    ndarray: Umbral por día (NaN sin historia suficiente)
+    """
+    if not 0 <= quantile <= 1:
+        raise ValueError(f"El cuantil debe estar entre 0 y 1: {quantile}")
+
+    distinct, ranks = _compress(values)
+    result = np.full(len(ranks), np.nan)
+
+    top_bit = 1
+    while top_bit * 2 <= len(distinct):
+        top_bit *= 2
+
+    def visit(i, tree, count):
+        k = max(1, int(np.ceil(quantile * count)))
+        result[i] = distinct[_fenwick_kth(tree, k, top_bit) - 1]
+
+    _rolling_window(ranks, len(distinct), window, min_periods, visit)
+
+    return result
+
+if __name__ == "__main__":
+    print("Rolling quantile module loaded successfully")
+    print("Available functions:")
+    print("- rolling_percentile_rank(values, window, min_periods=None)")
+    print("- rolling_quantile(values, window, quantile, min_periods=None)")
@@ -0,0 +1,686 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from day_index import build_day_index
+from session_grid import build_session_grid, grid_first_crossovers
+from range_query import build_range_index, first_touch
+from trade_buffer import BREAKOUT_TRADE_DTYPE, create_trade_buffer, append_trade, trade_records
+from online_metrics import create_online_metrics, update_online_metrics
+
+# Mapeo de dow_filter a nombre del día (igual que en order_management)
+DOW_MAPPING = {
+    1: 'monday',
+    2: 'tuesday',
+    3: 'wednesday',
+    4: 'thursday',
+    5: 'friday'
+}
+
+# Códigos de motivo de salida del motor vectorizado
+EXIT_STOP_LOSS = 0
+EXIT_TARGET = 1
+EXIT_END_OF_PERIOD = 2
+
+LEVEL_COLUMNS = ['long_level', 'short_level', 'long_stop', 'short_stop']
+
+# Caché de tablas de candidatos de entrada por (huella de niveles, dow_filter)
+# (cada tabla ocupa ~10 bytes por minuto: pocas entradas bastan para un barrido)
+ENTRY_CACHE_SIZE = 4
+_ENTRY_CACHE = OrderedDict()
+
+def build_minute_arrays(df, day_index=None):
+    """
+    Extrae los arrays de minutos y de sesiones (sin niveles) que usa el motor vectorizado
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha, con columna dow
+    day_index (DataFrame): Índice de sesiones (opcional, se construye si no se pasa)
+
+    Returns:
+    dict: Arrays por fila (date_ns, close) y por día (offsets, fechas y dow)
+    """
+    if day_index is None:
+        day_index = build_day_index(df)
+
+    day_start = day_index['start'].to_numpy(dtype=np.int64)
+    day_end = day_index['end'].to_numpy(dtype=np.int64)
+
+    return {
+        'date_ns': pd.to_datetime(df['date']).values.astype('datetime64[ns]').view(np.int64),
+        'close': df['close'].to_numpy(dtype=np.float64),
+        'day_start': day_start,
+        'day_end': day_end,
+        'day_dates': np.array(day_index['date_only'].values, dtype='datetime64[D]'),
+        'day_dow': df['dow'].to_numpy(dtype=object)[day_start]
+    }
+
+def build_breakout_arrays(df, day_index=None):
+    """
+    Extrae los arrays contiguos que necesita el motor vectorizado
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha, con niveles y columna dow
+    day_index (DataFrame): Índice de sesiones (opcional, se construye si no se pasa)
+
+    Returns:
+    dict: Arrays por fila (date_ns, close) y por día (offsets, fechas, dow y niveles)
+    """
+    if day_index is None:
+        day_index = build_day_index(df)
+
+    arrays = build_minute_arrays(df, day_index)
+
+    # Los niveles son constantes dentro del día: basta con la primera fila
+    for col in LEVEL_COLUMNS:
+        arrays[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)[arrays['day_start']]
+
+    return arrays
+
+def build_compact_arrays(df_compact, df_day_levels):
+    """
+    Arrays del motor a partir de la representación compacta (create_subset con compact=True)
+
+    Parameters:
+    df_compact (DataFrame): Minutos compactos (date, precios float32, dow_code)
+    df_day_levels (DataFrame): Tabla por día con start/end, dow y niveles (los niveles son
+                               opcionales: sin ellos el resultado equivale a build_minute_arrays)
+
+    Returns:
+    dict: Mismo contenido que build_breakout_arrays
+    """
+    arrays = {
+        'date_ns': pd.to_datetime(df_compact['date']).values.astype('datetime64[ns]').view(np.int64),
+        'close': df_compact['close'].to_numpy(dtype=np.float64),
+        'day_start': df_day_levels['start'].to_numpy(dtype=np.int64),
+        'day_end': df_day_levels['end'].to_numpy(dtype=np.int64),
+        'day_dates': np.array(df_day_levels['date_only'].values, dtype='datetime64[D]'),
+        'day_dow': df_day_levels['dow'].to_numpy(dtype=object)
+    }
+    for col in LEVEL_COLUMNS:
+        if col in df_day_levels.columns:
+            arrays[col] = df_day_levels[col].to_numpy(dtype=np.float64)
+
+    return arrays
+
+def eligible_rows(arrays):
+    """
+    Días procesados y minutos evaluables, con la misma regla que el bucle
+
+    Un día se procesa si tiene al menos 2 minutos y los 4 niveles definidos; el primer
+    minuto de cada día nunca se evalúa.
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+
+    Returns:
+    tuple: (processed por día, day_id por fila, eligible por fila)
+    """
+    day_start = arrays['day_start']
+    day_end = arrays['day_end']
+
+    levels_ok = ~(np.isnan(arrays['long_level']) | np.isnan(arrays['short_level']) |
+                  np.isnan(arrays['long_stop']) | np.isnan(arrays['short_stop']))
+    processed = ((day_end - day_start) >= 2) & levels_ok
+
+    day_id = np.repeat(np.arange(len(day_start)), day_end - day_start)
+    eligible = processed[day_id]
+    eligible[day_start] = False
+
+    return processed, day_id, eligible
+
+def build_exit_index(arrays):
+    """
+    Índices de mínimos/máximos del close (solo minutos evaluables) para buscar salidas en O(log n)
+
+    Depende de los niveles (qué días se procesan), así que se puede reutilizar entre
+    ejecuciones con distintos trail/tp_days/stop sobre los mismos niveles.
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+
+    Returns:
+    dict: 'min' y 'max' (resultados de build_range_index)
+    """
+    _, _, eligible = eligible_rows(arrays)
+    return {
+        'min': build_range_index(arrays['close'], 'min', eligible),
+        'max': build_range_index(arrays['close'], 'max', eligible)
+    }
+
+def _trail_threshold(entry_price, trail, direction):
+    """
+    Precio exacto a partir del cual se activa el break-even
+
+    Long: menor precio p con p - entry >= trail. Short: mayor p con entry - p >= trail.
+    Se ajusta con nextafter para reproducir exactamente la comparación en coma flotante.
+    """
+    if not np.isfinite(entry_price + trail):
+        return entry_price + trail if direction > 0 else entry_price - trail
+
+    if direction > 0:
+        meets = lambda p: p - entry_price >= trail
+        threshold = entry_price + trail
+        outward, inward = np.inf, -np.inf
+    else:
+        meets = lambda p: entry_price - p >= trail
+        threshold = entry_price - trail
+        outward, inward = -np.inf, np.inf
+
+    while not meets(threshold):
+        threshold = np.nextafter(threshold, outward)
+    while meets(np.nextafter(threshold, inward)):
+        threshold = np.nextafter(threshold, inward)
+
+    return threshold
+
+def _find_exit_indexed(exit_index, entry_idx, last_idx, direction, entry_price, initial_stop, trail):
+    """
+    Igual que _find_exit, pero con consultas de primer toque sobre los índices de mínimos/máximos
+
+    Returns:
+    tuple: (stop_idx o None, posición donde se activa el break-even o None)
+    """
+    end = last_idx + 1
+
+    # Long: stop y break-even hacia abajo (mínimos), activación del trail hacia arriba (máximos)
+    if direction > 0:
+        stop_can_move = initial_stop < entry_price
+        adverse, favorable = exit_index['min'], exit_index['max']
+    else:
+        stop_can_move = initial_stop > entry_price
+        adverse, favorable = exit_index['max'], exit_index['min']
+
+    be_idx = None
+    if stop_can_move:
+        be_found = first_touch(favorable, entry_idx, end, _trail_threshold(entry_price, trail, direction))
+        be_idx = None if be_found < 0 else be_found
+
+    limit = end if be_idx is None else be_idx
+    stop_found = first_touch(adverse, entry_idx, limit, initial_stop)
+    if stop_found < 0 and be_idx is not None:
+        stop_found = first_touch(adverse, be_idx, end, entry_price)
+
+    stop_idx = None if stop_found < 0 else stop_found
+
+    return stop_idx, be_idx
+
+def _first_true(mask):
+    """
+    Posición del primer True de una máscara (None si no hay ninguno)
+    """
+    if len(mask) == 0:
+        return None
+    pos = int(np.argmax(mask))
+    return pos if mask[pos] else None
+
+def _find_exit(close, eligible, entry_idx, last_idx, direction, entry_price, initial_stop, trail):
+    """
+    Busca la salida por stop (con trailing a break-even) entre entry_idx y last_idx inclusive
+
+    Returns:
+    tuple: (stop_idx o None, posición donde se activa el break-even o None)
+    """
+    window = slice(entry_idx, last_idx + 1)
+    prices = close[window]
+    valid = eligible[window]
+
+    if direction > 0:
+        stop_can_move = initial_stop < entry_price
+        be_mask = valid & (prices - entry_price >= trail)
+        hit_mask = valid & (prices <= initial_stop)
+        be_hit_mask = valid & (prices <= entry_price)
+    else:
+        stop_can_move = initial_stop > entry_price
+        be_mask = valid & (entry_price - prices >= trail)
+        hit_mask = valid & (prices >= initial_stop)
+        be_hit_mask = valid & (prices >= entry_price)
+
+    be_pos = _first_true(be_mask) if stop_can_move else None
+
+    # Antes del break-even manda el stop inicial; desde ese minuto, el stop está en la entrada
+    limit = len(prices) if be_pos is None else be_pos
+    stop_pos = _first_true(hit_mask[:limit])
+    if stop_pos is None and be_pos is not None:
+        be_stop = _first_true(be_hit_mask[be_pos:])
+        stop_pos = None if be_stop is None else be_pos + be_stop
+
+    stop_idx = None if stop_pos is None else entry_idx + stop_pos
+    be_idx = None if be_pos is None else entry_idx + be_pos
+
+    return stop_idx, be_idx
+
+def levels_fingerprint(arrays):
+    """
+    Huella de todo lo que determina las entradas: closes, sesiones, fechas, dow y los 4 niveles
+
+    Las fechas entran en la huella porque la tabla cacheada incluye processed_dates.
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+
+    Returns:
+    str: Hash sha1 en hexadecimal
+    """
+    digest = hashlib.sha1()
+    for key in ['close', 'day_start', 'day_end'] + LEVEL_COLUMNS:
+        values = np.ascontiguousarray(arrays[key])
+        digest.update(key.encode())
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    digest.update(np.asarray(arrays['day_dates'], dtype='datetime64[D]').astype(np.int64).tobytes())
+    digest.update('|'.join(str(d).lower() for d in arrays['day_dow']).encode())
+
+    return digest.hexdigest()
+
+def _first_row_per_day(rows, day_start, day_end):
+    """
+    Primera fila de rows dentro de cada día [day_start, day_end) (-1 si no hay)
+    """
+    pos = np.searchsorted(rows, day_start, side='left')
+    if len(rows) == 0:
+        return np.full(len(day_start), -1, dtype=np.int64)
+    candidate = rows[np.minimum(pos, len(rows) - 1)]
+    return np.where((pos < len(rows)) & (candidate < day_end), candidate, -1).astype(np.int64)
+
+def build_entry_candidates(arrays, dow_filter=0, grid=None):
+    """
+    Tabla de candidatos de entrada: todo lo que no depende de los parámetros de salida
+
+    Los crossovers long/short, el primer cruce de cada día y los días en los que se
+    puede entrar solo dependen de los closes, los niveles y el filtro de día de la
+    semana. Trail, stop y tp_days solo deciden qué candidatos se toman (por solape
+    con el trade activo) y cómo salen, lo que resuelve run_exit_stage.
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+    dow_filter (int): Filtro de día de la semana (0=sin filtro, 1=lunes ... 5=viernes)
+    grid (dict): Rejilla de build_session_grid con close (opcional, para el primer cruce)
+
+    Returns:
+    dict: Filas de cruce long/short, primer cruce por día (-1 si no hay), días con
+          entrada posible y días procesados con sus fechas
+    """
+    close = arrays['close']
+    day_start = arrays['day_start']
+    day_end = arrays['day_end']
+    long_level = arrays['long_level']
+    short_level = arrays['short_level']
+
+    # Días procesados y minutos donde se evalúan señales y salidas
+    processed, day_id, eligible = eligible_rows(arrays)
+
+    # Subset vacío (p.ej. un rango sin sesiones): tabla vacía, sin entradas, como el bucle
+    if len(close) == 0:
+        empty_rows = np.array([], dtype=np.int64)
+        return {
+            'dow_filter': dow_filter,
+            'day_id': day_id,
+            'eligible': eligible,
+            'long_rows': empty_rows,
+            'short_rows': empty_rows,
+            'first_long': np.full(len(day_start), -1, dtype=np.int64),
+            'first_short': np.full(len(day_start), -1, dtype=np.int64),
+            'entry_days': empty_rows,
+            'processed_days': empty_rows,
+            'processed_dates': arrays['day_dates'][empty_rows]
+        }
+
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+
+    row_long = long_level[day_id]
+    row_short = short_level[day_id]
+    long_rows = np.flatnonzero(eligible & (prev_close <= row_long) & (row_long < close))
+    short_rows = np.flatnonzero(eligible & (prev_close >= row_short) & (row_short > close))
+
+    # Primer cruce de cada día (fila original o -1)
+    if grid is not None:
+        long_col, short_col = grid_first_crossovers(grid, long_level, short_level)
+        first_long = np.where(long_col >= 0, day_start + long_col, -1)
+        first_short = np.where(short_col >= 0, day_start + short_col, -1)
+    else:
+        first_long = _first_row_per_day(long_rows, day_start, day_end)
+        first_short = _first_row_per_day(short_rows, day_start, day_end)
+
+    # Filtro de día de la semana (solo para nuevas entradas)
+    if dow_filter > 0:
+        dow_name = DOW_MAPPING.get(dow_filter)
+        dow_ok = np.array([str(d).lower() == dow_name for d in arrays['day_dow']], dtype=bool)
+    else:
+        dow_ok = np.ones(len(day_start), dtype=bool)
+
+    # Sin ningún cruce en el día no puede haber entradas
+    entry_days = np.flatnonzero(processed & dow_ok & ((first_long >= 0) | (first_short >= 0)))
+
+    # Último minuto de cada día procesado (candidato a salida por tp_days)
+    processed_days = np.flatnonzero(processed)
+
+    return {
+        'dow_filter': dow_filter,
+        'day_id': day_id,
+        'eligible': eligible,
+        'long_rows': long_rows,
+        'short_rows': short_rows,
+        'first_long': first_long,
+        'first_short': first_short,
+        'entry_days': entry_days,
+        'processed_days': processed_days,
+        'processed_dates': arrays['day_dates'][processed_days]
+    }
+
+def get_entry_candidates(arrays, dow_filter=0, grid=None):
+    """
+    build_entry_candidates con caché por (huella de niveles, dow_filter)
+
+    Ejecuciones sucesivas con los mismos niveles (p.ej. un barrido de trail o tp_days)
+    reutilizan la tabla y solo repiten la etapa de salidas.
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+    dow_filter (int): Filtro de día de la semana
+    grid (dict): Rejilla de build_session_grid (opcional, solo si hay que construir la tabla)
+
+    Returns:
+    dict: Resultado de build_entry_candidates
+    """
+    key = (levels_fingerprint(arrays), dow_filter)
+    if key in _ENTRY_CACHE:
+        _ENTRY_CACHE.move_to_end(key)
+        return _ENTRY_CACHE[key]
+
+    candidates = build_entry_candidates(arrays, dow_filter=dow_filter, grid=grid)
+    _ENTRY_CACHE[key] = candidates
+    while len(_ENTRY_CACHE) > ENTRY_CACHE_SIZE:
+        _ENTRY_CACHE.popitem(last=False)
+
+    return candidates
+
+def clear_entry_cache():
+    """
+    Vacía la caché de tablas de candidatos de entrada
+    """
+    _ENTRY_CACHE.clear()
+
+def run_exit_stage(arrays, candidates, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0, exit_index=None,
+                   metrics=None, stop_rule=None):
+    """
+    Etapa de posición/salidas: recorre los candidatos de entrada y resuelve cada trade
+
+    Solo se visitan los días con entrada posible; tras cada salida se salta directamente
+    al siguiente día candidato.
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+    candidates (dict): Resultado de build_entry_candidates / get_entry_candidates
+    use_fixed_stop (bool): Si usar stop fijo en USD en lugar de stop basado en range
+    fixed_stop_usd (float): Cantidad en USD para stop fijo
+    trail (float): Puntos de ganancia para mover el stop a break-even
+    tp_days (int): Días para mantener la posición (0=cierre mismo día)
+    exit_index (dict): Índices de build_exit_index (opcional)
+    metrics (dict): Acumuladores de create_online_metrics, actualizados al cerrar cada trade (opcional)
+    stop_rule (callable): stop_rule(metrics) -> bool; si devuelve True se detiene la ejecución
+                          tras el trade actual (opcional, p.ej. partial(should_stop, ...))
+
+    Returns:
+    ndarray: Registro estructurado de trades (BREAKOUT_TRADE_DTYPE, acceso por campo)
+    """
+    if stop_rule is not None and metrics is None:
+        metrics = create_online_metrics()
+
+    close = arrays['close']
+    day_start = arrays['day_start']
+    day_end = arrays['day_end']
+    day_dates = arrays['day_dates']
+    long_stop = arrays['long_stop']
+    short_stop = arrays['short_stop']
+
+    day_id = candidates['day_id']
+    eligible = candidates['eligible']
+    long_rows = candidates['long_rows']
+    short_rows = candidates['short_rows']
+    first_long = candidates['first_long']
+    first_short = candidates['first_short']
+    entry_days = candidates['entry_days']
+    processed_days = candidates['processed_days']
+    processed_dates = candidates['processed_dates']
+
+    n_rows = len(close)
+    n_days = len(day_start)
+
+    def next_signal(rows, from_idx, to_idx):
+        pos = np.searchsorted(rows, from_idx, side='left')
+        if pos < len(rows) and rows[pos] < to_idx:
+            return int(rows[pos])
+        return None
+
+    date_ns = arrays['date_ns']
+    buffer = create_trade_buffer(BREAKOUT_TRADE_DTYPE)
+
+    pos = 0
+    while pos < len(entry_days):
+        day = int(entry_days[pos])
+        start, end = day_start[day], day_end[day]
+        search_from = start + 1
+        long_done = False
+        short_done = False
+        next_day = day + 1
+
+        while True:
+            if search_from == start + 1:
+                long_idx = None if first_long[day] < 0 else int(first_long[day])
+                short_idx = None if first_short[day] < 0 else int(first_short[day])
+            else:
+                long_idx = None if long_done else next_signal(long_rows, search_from, end)
+                short_idx = None if short_done else next_signal(short_rows, search_from, end)
+            if long_idx is None and short_idx is None:
+                break
+
+            if short_idx is None or (long_idx is not None and long_idx < short_idx):
+                entry_idx, direction = long_idx, 1
+                long_done = True
+            else:
+                entry_idx, direction = short_idx, -1
+                short_done = True
+
+            entry_price = close[entry_idx]
+            if use_fixed_stop:
+                stop_points = fixed_stop_usd / 50
+                initial_stop = entry_price - stop_points if direction > 0 else entry_price + stop_points
+            else:
+                initial_stop = long_stop[day] if direction > 0 else short_stop[day]
+
+            # Día objetivo: primer día procesado con fecha >= entrada + tp_days
+            target_date = day_dates[day] + np.timedelta64(int(tp_days), 'D')
+            target_pos = np.searchsorted(processed_dates, target_date, side='left')
+            target_pos = max(target_pos, np.searchsorted(processed_days, day, side='left'))
+            if target_pos < len(processed_days):
+                target_idx = int(day_end[processed_days[target_pos]] - 1)
+                last_idx = target_idx
+            else:
+                target_idx = None
+                last_idx = n_rows - 1
+
+            if exit_index is not None:
+                stop_idx, be_idx = _find_exit_indexed(exit_index, entry_idx, last_idx, direction,
+                                                      entry_price, initial_stop, trail)
+            else:
+                stop_idx, be_idx = _find_exit(close, eligible, entry_idx, last_idx, direction,
+                                              entry_price, initial_stop, trail)
+
+            if stop_idx is not None and (target_idx is None or stop_idx < target_idx):
+                exit_idx, exit_code = stop_idx, EXIT_STOP_LOSS
+            elif target_idx is not None:
+                exit_idx, exit_code = target_idx, EXIT_TARGET
+            else:
+                exit_idx, exit_code = n_rows - 1, EXIT_END_OF_PERIOD
+
+            final_stop = entry_price if (be_idx is not None and be_idx <= exit_idx) else initial_stop
+            exit_price = close[exit_idx]
+            profit_points = exit_price - entry_price if direction > 0 else entry_price - exit_price
+
+            append_trade(buffer, (entry_idx, exit_idx, date_ns[entry_idx], date_ns[exit_idx], day,
+                                  day_id[exit_idx], direction, exit_code, entry_price, exit_price,
+                                  final_stop, profit_points > 0))
+
+            if metrics is not None:
+                update_online_metrics(metrics, round(profit_points * 50, 2), profit_points > 0,
+                                      round((date_ns[exit_idx] - date_ns[entry_idx]) / 1e9 / 60, 1),
+                                      entry_ns=date_ns[entry_idx], exit_ns=date_ns[exit_idx])
+                if stop_rule is not None and stop_rule(metrics):
+                    metrics['stopped_early'] = True
+                    next_day = n_days
+                    break
+
+            if exit_code == EXIT_END_OF_PERIOD:
+                next_day = n_days
+                break
+
+            exit_day = int(day_id[exit_idx])
+            if exit_day != day:
+                # El día de salida ya tiene las señales bloqueadas: seguir al siguiente
+                next_day = exit_day + 1
+                break
+
+            # Nuevas entradas posibles a partir del minuto siguiente a la salida
+            search_from = exit_idx + 1
+
+        pos = int(np.searchsorted(entry_days, next_day, side='left'))
+
+    return trade_records(buffer)
+
+def run_breakout_arrays(arrays, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0, grid=None, exit_index=None, candidates=None,
+                        metrics=None, stop_rule=None):
+    """
+    Motor de breakout sobre arrays NumPy (misma lógica que el bucle minuto a minuto)
+
+    Se divide en dos etapas: la tabla de candidatos de entrada (crossovers por día,
+    cacheada por niveles y dow_filter) y la etapa de posición/salidas, que es la única
+    que depende de trail, stop y tp_days.
+
+    Con la rejilla días x minutos (session_grid) el primer cruce de cada día se obtiene
+    para todos los días con una sola reducción al construir la tabla de candidatos.
+    Con exit_index (build_exit_index) la salida se busca por primer toque en O(log n),
+    sin recorrer el tramo hasta el día objetivo (útil con tp_days largos).
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+    dow_filter (int): Filtro de día de la semana (0=sin filtro, 1=lunes ... 5=viernes)
+    use_fixed_stop (bool): Si usar stop fijo en USD en lugar de stop basado en range
+    fixed_stop_usd (float): Cantidad en USD para stop fijo
+    trail (float): Puntos de ganancia para mover el stop a break-even
+    tp_days (int): Días para mantener la posición (0=cierre mismo día)
+    grid (dict): Rejilla de build_session_grid con close (opcional)
+    exit_index (dict): Índices de build_exit_index (opcional)
+    candidates (dict): Tabla de build_entry_candidates ya construida (opcional, usa la caché si no se pasa)
+    metrics (dict): Acumuladores de create_online_metrics (opcional, ver run_exit_stage)
+    stop_rule (callable): Regla de parada anticipada (opcional, ver run_exit_stage)
+
+    Returns:
+    ndarray: Registro estructurado de trades (BREAKOUT_TRADE_DTYPE, acceso por campo)
+    """
+    if candidates is None:
+        candidates = get_entry_candidates(arrays, dow_filter=dow_filter, grid=grid)
+    elif candidates['dow_filter'] != dow_filter:
+        raise ValueError(f"La tabla de candidatos es de dow_filter={candidates['dow_filter']}, no de {dow_filter}")
+
+    return run_exit_stage(arrays, candidates, use_fixed_stop=use_fixed_stop, fixed_stop_usd=fixed_stop_usd,
+                          trail=trail, tp_days=tp_days, exit_index=exit_index, metrics=metrics, stop_rule=stop_rule)
+
+def breakout_trades_to_frame(arrays, trades, tp_days=0, timestamps=None):
+    """
+    Convierte los arrays de trades al esquema de trades_df de order_management
+
+    Parameters:
+    arrays (dict): Resultado de build_breakout_arrays
+    trades (ndarray): Registro de trades de run_breakout_arrays
+    tp_days (int): Días de mantenimiento (para la etiqueta de salida)
+    timestamps (Series): Columna 'date' original (opcional, conserva su dtype exacto)
+
+    Returns:
+    DataFrame: Registro de operaciones con las mismas columnas que el bucle
+    """
+    if len(trades) == 0:
+        return pd.DataFrame([])
+
+    if timestamps is None:
+        timestamps = pd.Series(pd.to_datetime(arrays['date_ns'], utc=True))
+
+    entry_idx = trades['entry_idx']
+    exit_idx = trades['exit_idx']
+    direction = trades['direction']
+
+    entry_price = trades['entry_price']
+    exit_price = trades['exit_price']
+    profit_points = np.where(direction > 0, exit_price - entry_price, entry_price - exit_price)
+    time_in_market = (trades['exit_ns'] - trades['entry_ns']) / 1e9 / 60
+
+    target_reason = 'END_OF_DAY' if tp_days == 0 else f'TARGET_PROFIT_{tp_days}D'
+    reason_names = {EXIT_STOP_LOSS: 'STOP_LOSS', EXIT_TARGET: target_reason, EXIT_END_OF_PERIOD: 'END_OF_PERIOD'}
+
+    # dow del día de salida (del día de entrada si se cierra al final del período), como en el bucle
+    dow_day = np.where(trades['exit_code'] == EXIT_END_OF_PERIOD, trades['entry_day'], trades['exit_day'])
+
+    return pd.DataFrame({
+        'date': list(pd.DatetimeIndex(arrays['day_dates'][trades['entry_day']]).date),
+        'dow': list(arrays['day_dow'][dow_day]),
+        'trade_type': ['BUY' if d > 0 else 'SELL' for d in direction],
+        'entry_time': timestamps.iloc[entry_idx].tolist(),
+        'entry_price': entry_price,
+        'exit_time': timestamps.iloc[exit_idx].tolist(),
+        'exit_price': exit_price,
+        'exit_reason': [reason_names[code] for code in trades['exit_code']],
+        'profit_points': np.round(profit_points, 2),
+        'profit_usd': np.round(profit_points * 50, 2),
+        'profit_label': np.where(trades['is_profit'], 'PROFIT', 'LOSS').tolist(),
+        'time_in_market_minutes': np.round(time_in_market, 1),
+        'stop_level': trades['stop_level']
+    })
+
+def run_breakout_engine(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0, day_index=None, use_grid=False, use_exit_index=False,
+                        metrics=None, stop_rule=None, day_levels=None):
+    """
+    Ejecuta el motor vectorizado sobre un DataFrame ordenado y devuelve trades_df
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha (índice 0..n-1)
+    dow_filter, use_fixed_stop, fixed_stop_usd, trail, tp_days: Igual que order_management
+    day_index (DataFrame): Índice de sesiones (opcional)
+    use_grid (bool): Si usar la rejilla días x minutos para los cruces
+    use_exit_index (bool): Si buscar las salidas con el índice de mínimos/máximos (range_query)
+    metrics (dict): Acumuladores de create_online_metrics (opcional, ver run_exit_stage)
+    stop_rule (callable): Regla de parada anticipada (opcional, ver run_exit_stage)
+    day_levels (DataFrame): Tabla por día de create_subset(compact=True); con ella df son los
+                            minutos compactos y los arrays salen de build_compact_arrays
+
+    Returns:
+    DataFrame: Registro de operaciones
+    """
+    if day_levels is not None:
+        arrays = build_compact_arrays(df, day_levels)
+    else:
+        arrays = build_breakout_arrays(df, day_index)
+    grid = build_session_grid(arrays) if use_grid else None
+    exit_index = build_exit_index(arrays) if use_exit_index else None
+    trades = run_breakout_arrays(arrays, dow_filter=dow_filter, use_fixed_stop=use_fixed_stop,
+                                 fixed_stop_usd=fixed_stop_usd, trail=trail, tp_days=tp_days, grid=grid,
+                                 exit_index=exit_index, metrics=metrics, stop_rule=stop_rule)
+    return breakout_trades_to_frame(arrays, trades, tp_days=tp_days, timestamps=df['date'])
+
+if __name__ == "__main__":
+    print("Breakout engine module loaded successfully")
+    print("Available functions:")
+    print("- build_minute_arrays(df, day_index=None)")
+    print("- build_breakout_arrays(df, day_index=None)")
+    print("- build_compact_arrays(df_compact, df_day_levels)")
+    print("- eligible_rows(arrays)")
+    print("- build_exit_index(arrays)")
+    print("- levels_fingerprint(arrays)")
+    print("- build_entry_candidates(arrays, dow_filter=0, grid=None)")
+    print("- get_entry_candidates(arrays, dow_filter=0, grid=None)")
+    print("- clear_entry_cache()")
+    print("- run_exit_stage(arrays, candidates, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0, exit_index=None, metrics=None, stop_rule=None)")
+    print("- run_breakout_arrays(arrays, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0, grid=None, exit_index=None, candidates=None, metrics=None, stop_rule=None)")
+    print("- breakout_trades_to_frame(arrays, trades, tp_days=0, timestamps=None)")
+    print("- run_breakout_engine(df, ...)")
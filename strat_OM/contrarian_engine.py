@@ -0,0 +1,427 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio padre al path para importar quant_stat
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from quant_stat.rolling_quantile import rolling_quantile
+from session_grid import build_session_grid, first_true_per_day, end_of_day
+from range_query import build_range_index, first_touch, first_touch_many
+
+# Códigos de motivo de salida del motor contrarian
+EXIT_STOP_LOSS = 0
+EXIT_TARGET = 1
+EXIT_EOD = 2
+
+EXIT_REASONS = {EXIT_STOP_LOSS: 'STOP_LOSS', EXIT_TARGET: 'TARGET', EXIT_EOD: 'EOD'}
+
+def build_contrarian_arrays(df, day_index, range_column):
+    """
+    Extrae los arrays por fila y por día que usa el motor contrarian
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha (índice 0..n-1)
+    day_index (DataFrame): Índice de sesiones de build_day_index
+    range_column (str): Columna cuyo primer valor del día anterior se guarda como prev_day_range
+
+    Returns:
+    dict: Arrays open/high/low/close y range por fila, offsets y fechas por día
+    """
+    return {
+        'open': df['open'].to_numpy(dtype=np.float64),
+        'high': df['high'].to_numpy(dtype=np.float64),
+        'low': df['low'].to_numpy(dtype=np.float64),
+        'close': df['close'].to_numpy(dtype=np.float64),
+        'range_value': df[range_column].to_numpy(),
+        'day_start': day_index['start'].to_numpy(dtype=np.int64),
+        'day_end': day_index['end'].to_numpy(dtype=np.int64),
+        'day_dates': np.array(day_index['date_only'].values)
+    }
+
+def prev_range_thresholds(arrays, min_prev_range=100, window=0, quantile=0.8):
+    """
+    Umbral de range por día para el filtro "range del día anterior > umbral"
+
+    Con window > 0 el umbral de cada día es el cuantil 'quantile' de los ranges de los
+    window días anteriores (estructura ordenada incremental, O(log w) por día); mientras
+    no hay historia suficiente se usa el umbral fijo min_prev_range.
+
+    Parameters:
+    arrays (dict): Resultado de build_contrarian_arrays
+    min_prev_range (float): Umbral fijo en puntos
+    window (int): Días de la ventana (0 = umbral fijo para todos los días)
+    quantile (float): Cuantil de la ventana entre 0 y 1
+
+    Returns:
+    ndarray: Umbral por día (se compara con el range de ese mismo día)
+    """
+    n_days = len(arrays['day_start'])
+    if window <= 0:
+        return np.full(n_days, float(min_prev_range))
+
+    # Range real de cada día (max high - min low) sobre sus minutos
+    day_high = np.fmax.reduceat(arrays['high'], arrays['day_start'])
+    day_low = np.fmin.reduceat(arrays['low'], arrays['day_start'])
+
+    thresholds = rolling_quantile(day_high - day_low, window, quantile)
+    return np.where(np.isnan(thresholds), float(min_prev_range), thresholds)
+
+def run_contrarian_grid(arrays, stop_loss, target, min_prev_range=100, grid=None):
+    """
+    Motor contrarian sobre la rejilla días x minutos (misma lógica que el bucle por días)
+
+    Cada día se opera como mucho una vez y se cierra en el mismo día, así que todos los
+    días se resuelven a la vez: extremos del día anterior, entrada por gap o por toque
+    del high/low anterior y salida por stop/target son reducciones sobre el eje de minutos.
+
+    Parameters:
+    arrays (dict): Resultado de build_contrarian_arrays
+    stop_loss (float): Puntos de stop
+    target (float): Puntos de target
+    min_prev_range (float o array): Range mínimo del día anterior para operar (se opera si range > min_prev_range);
+                                    un array da un umbral por día (prev_range_thresholds)
+    grid (dict): Rejilla de build_session_grid con open/high/low/close (opcional)
+
+    Returns:
+    dict: Arrays por trade (day, entry_row, exit_row, direction, entry_price, exit_price, exit_code, ...)
+    """
+    if grid is None:
+        grid = build_session_grid(arrays, columns=('open', 'high', 'low', 'close'))
+
+    length = grid['length']
+    n_days = len(length)
+
+    # Agregados diarios (max/min ignoran NaN como pandas; open/close: primer/último minuto)
+    with np.errstate(invalid='ignore'):
+        day_high = np.fmax.reduce(grid['high'], axis=1) if grid['high'].shape[1] > 0 else np.full(n_days, np.nan)
+        day_low = np.fmin.reduce(grid['low'], axis=1) if grid['low'].shape[1] > 0 else np.full(n_days, np.nan)
+    day_open = grid['open'][:, 0] if grid['open'].shape[1] > 0 else np.full(n_days, np.nan)
+
+    # Días operables: desde el segundo, con minutos y range del día anterior no <= min_prev_range
+    days = np.arange(1, n_days)
+    prev_high = day_high[days - 1]
+    prev_low = day_low[days - 1]
+    threshold = np.broadcast_to(np.asarray(min_prev_range, dtype=np.float64), (n_days,))[days - 1]
+    keep = ~((prev_high - prev_low) <= threshold) & (length[days] > 0)
+    days, prev_high, prev_low = days[keep], prev_high[keep], prev_low[keep]
+
+    current_open = day_open[days]
+    high = grid['high'][days]
+    low = grid['low'][days]
+
+    # Entrada: gap por encima/debajo del rango anterior a la apertura, o primer toque del high/low
+    gap_sell = current_open > prev_high
+    gap_buy = ~gap_sell & (current_open < prev_low)
+    inside = (prev_low <= current_open) & (current_open <= prev_high)
+
+    touch_sell = high >= prev_high[:, np.newaxis]
+    touch_buy = low <= prev_low[:, np.newaxis]
+    touch_col = first_true_per_day(touch_sell | touch_buy)
+    touched = inside & (touch_col >= 0)
+    safe_col = np.maximum(touch_col, 0)
+    touch_is_sell = touch_sell[np.arange(len(days)), safe_col]
+
+    has_entry = gap_sell | gap_buy | touched
+    entry_col = np.where(touched, safe_col, 0)
+    direction = np.where(gap_sell | (touched & touch_is_sell), -1, 1).astype(np.int8)
+    entry_price = np.where(gap_sell | gap_buy, current_open, np.where(touch_is_sell, prev_high, prev_low))
+
+    sel = np.flatnonzero(has_entry)
+    days, prev_high, prev_low, current_open = days[sel], prev_high[sel], prev_low[sel], current_open[sel]
+    entry_col, direction, entry_price = entry_col[sel], direction[sel], entry_price[sel]
+    high, low = high[sel], low[sel]
+
+    # Salida: primer minuto desde la entrada que toca stop o target (el stop tiene prioridad)
+    is_sell = (direction < 0)[:, np.newaxis]
+    stop_price = np.where(direction < 0, entry_price + stop_loss, entry_price - stop_loss)
+    target_price = np.where(direction < 0, entry_price - target, entry_price + target)
+    stop_hit = np.where(is_sell, high >= stop_price[:, np.newaxis], low <= stop_price[:, np.newaxis])
+    target_hit = np.where(is_sell, low <= target_price[:, np.newaxis], high >= target_price[:, np.newaxis])
+
+    exit_col = first_true_per_day(stop_hit | target_hit, from_col=entry_col)
+    has_exit = exit_col >= 0
+    safe_exit = np.maximum(exit_col, 0)
+    exit_is_stop = stop_hit[np.arange(len(days)), safe_exit]
+
+    last_col = length[days] - 1
+    day_close = end_of_day(grid['close'][days], length[days])
+    exit_code = np.where(~has_exit, EXIT_EOD, np.where(exit_is_stop, EXIT_STOP_LOSS, EXIT_TARGET)).astype(np.int8)
+    exit_price = np.where(~has_exit, day_close, np.where(exit_is_stop, stop_price, target_price))
+    exit_col = np.where(has_exit, exit_col, last_col)
+
+    row_index = grid['row_index'][days]
+    positions = np.arange(len(days))
+    prev_start = arrays['day_start'][days - 1]
+
+    return {
+        'day': days,
+        'entry_row': row_index[positions, entry_col],
+        'exit_row': row_index[positions, exit_col],
+        'direction': direction,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'exit_code': exit_code,
+        'prev_day_range': arrays['range_value'][prev_start],
+        'prev_high': prev_high,
+        'prev_low': prev_low,
+        'current_open': current_open,
+        'current_high': day_high[days],
+        'current_low': day_low[days],
+        'current_close': day_close
+    }
+
+def build_daily_aggregates(arrays):
+    """
+    Tabla OHLC por día con una sola pasada (reduceat sobre los offsets de sesión)
+
+    max/min ignoran NaN como pandas; open/close son el primer/último minuto del día.
+
+    Parameters:
+    arrays (dict): Resultado de build_contrarian_arrays (días con al menos un minuto)
+
+    Returns:
+    dict: Arrays por día 'open', 'high', 'low', 'close'
+    """
+    day_start = arrays['day_start']
+    if len(day_start) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {'open': empty, 'high': empty, 'low': empty, 'close': empty}
+
+    return {
+        'open': arrays['open'][day_start],
+        'high': np.fmax.reduceat(arrays['high'], day_start),
+        'low': np.fmin.reduceat(arrays['low'], day_start),
+        'close': arrays['close'][arrays['day_end'] - 1]
+    }
+
+def run_contrarian_vectorized(arrays, stop_loss, target, min_prev_range=100, index=None):
+    """
+    Motor contrarian con operaciones vectorizadas (misma lógica que el bucle por días)
+
+    Usa la tabla diaria de build_daily_aggregates para el filtro de range y las entradas
+    por gap, y consultas de primer toque en bloque (first_touch_many) sobre los índices de
+    máximos del high y mínimos del low para los toques de nivel y las salidas. No necesita
+    la rejilla días x minutos, así que escala al histórico completo.
+
+    Parameters:
+    arrays (dict): Resultado de build_contrarian_arrays
+    stop_loss (float): Puntos de stop
+    target (float): Puntos de target
+    min_prev_range (float o array): Range mínimo del día anterior (se opera si range > min_prev_range)
+    index (dict): Resultado de build_contrarian_index (opcional, se construye si no se pasa)
+
+    Returns:
+    dict: Arrays por trade con las mismas claves que run_contrarian_grid
+    """
+    if index is None:
+        index = {
+            'high': build_range_index(arrays['high'], 'max'),
+            'low': build_range_index(arrays['low'], 'min')
+        }
+
+    daily = build_daily_aggregates(arrays)
+    day_start = arrays['day_start']
+    day_end = arrays['day_end']
+    n_days = len(day_start)
+
+    # Días operables: desde el segundo, con range del día anterior no <= umbral
+    days = np.arange(1, n_days)
+    prev_high = daily['high'][days - 1]
+    prev_low = daily['low'][days - 1]
+    threshold = np.broadcast_to(np.asarray(min_prev_range, dtype=np.float64), (n_days,))[days - 1]
+    keep = ~((prev_high - prev_low) <= threshold)
+    days, prev_high, prev_low = days[keep], prev_high[keep], prev_low[keep]
+    current_open = daily['open'][days]
+    start, end = day_start[days], day_end[days]
+
+    # Entrada: gap por encima/debajo del rango anterior a la apertura, o primer toque del high/low
+    gap_sell = current_open > prev_high
+    gap_buy = ~gap_sell & (current_open < prev_low)
+    inside = (prev_low <= current_open) & (current_open <= prev_high)
+
+    sell_touch = np.full(len(days), -1, dtype=np.int64)
+    buy_touch = np.full(len(days), -1, dtype=np.int64)
+    sel = np.flatnonzero(inside)
+    sell_touch[sel] = first_touch_many(index['high'], start[sel], end[sel], prev_high[sel])
+    buy_touch[sel] = first_touch_many(index['low'], start[sel], end[sel], prev_low[sel])
+
+    # En el mismo minuto el bucle comprueba antes el high (SELL)
+    touch_is_sell = (sell_touch >= 0) & ((buy_touch < 0) | (sell_touch <= buy_touch))
+    touch_row = np.where(touch_is_sell, sell_touch, buy_touch)
+    touched = inside & (touch_row >= 0)
+
+    has_entry = gap_sell | gap_buy | touched
+    entry_row = np.where(touched, touch_row, start)
+    direction = np.where(gap_sell | (touched & touch_is_sell), -1, 1).astype(np.int8)
+    entry_price = np.where(gap_sell | gap_buy, current_open, np.where(touch_is_sell, prev_high, prev_low))
+
+    sel = np.flatnonzero(has_entry)
+    days, prev_high, prev_low, current_open = days[sel], prev_high[sel], prev_low[sel], current_open[sel]
+    entry_row, direction, entry_price, end = entry_row[sel], direction[sel], entry_price[sel], end[sel]
+
+    # Salida: primer minuto desde la entrada que toca stop o target (el stop tiene prioridad)
+    is_sell = direction < 0
+    stop_price = np.where(is_sell, entry_price + stop_loss, entry_price - stop_loss)
+    target_price = np.where(is_sell, entry_price - target, entry_price + target)
+
+    stop_row = np.full(len(days), -1, dtype=np.int64)
+    target_row = np.full(len(days), -1, dtype=np.int64)
+    for side, adverse, favorable in ((is_sell, 'high', 'low'), (~is_sell, 'low', 'high')):
+        rows = np.flatnonzero(side)
+        stop_row[rows] = first_touch_many(index[adverse], entry_row[rows], end[rows], stop_price[rows])
+        target_row[rows] = first_touch_many(index[favorable], entry_row[rows], end[rows], target_price[rows])
+
+    exit_is_stop = (stop_row >= 0) & ((target_row < 0) | (stop_row <= target_row))
+    has_exit = (stop_row >= 0) | (target_row >= 0)
+    day_close = daily['close'][days]
+
+    exit_code = np.where(~has_exit, EXIT_EOD, np.where(exit_is_stop, EXIT_STOP_LOSS, EXIT_TARGET)).astype(np.int8)
+    exit_price = np.where(~has_exit, day_close, np.where(exit_is_stop, stop_price, target_price))
+    exit_row = np.where(~has_exit, end - 1, np.where(exit_is_stop, stop_row, target_row))
+
+    return {
+        'day': days,
+        'entry_row': entry_row,
+        'exit_row': exit_row,
+        'direction': direction,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'exit_code': exit_code,
+        'prev_day_range': arrays['range_value'][day_start[days - 1]],
+        'prev_high': prev_high,
+        'prev_low': prev_low,
+        'current_open': current_open,
+        'current_high': daily['high'][days],
+        'current_low': daily['low'][days],
+        'current_close': day_close
+    }
+
+def build_contrarian_index(df):
+    """
+    Índices de máximos del high y mínimos del low para buscar toques de nivel en O(log n)
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha (índice 0..n-1)
+
+    Returns:
+    dict: 'high' (índice 'max') y 'low' (índice 'min') de build_range_index
+    """
+    return {
+        'high': build_range_index(df['high'].to_numpy(dtype=np.float64), 'max'),
+        'low': build_range_index(df['low'].to_numpy(dtype=np.float64), 'min')
+    }
+
+def _earliest(first_row, second_row):
+    """
+    Fila más temprana de dos búsquedas (-1 = no encontrada); en empate gana la primera
+
+    Returns:
+    tuple: (fila o -1, True si la fila viene de la primera búsqueda)
+    """
+    if first_row >= 0 and (second_row < 0 or first_row <= second_row):
+        return first_row, True
+    return second_row, False
+
+def find_level_touch(index, start, end, prev_high, prev_low):
+    """
+    Primer minuto en [start, end) que toca el high anterior (SELL) o el low anterior (BUY)
+
+    Parameters:
+    index (dict): Resultado de build_contrarian_index
+    start (int): Primera fila del día
+    end (int): Fila siguiente a la última del día
+    prev_high (float): High del día anterior
+    prev_low (float): Low del día anterior
+
+    Returns:
+    tuple: (fila, 'SELL'/'BUY') o (None, None) si no toca ningún nivel
+    """
+    sell_row = first_touch(index['high'], start, end, prev_high)
+    buy_row = first_touch(index['low'], start, end, prev_low)
+
+    row, is_sell = _earliest(sell_row, buy_row)
+    if row < 0:
+        return None, None
+
+    return row, 'SELL' if is_sell else 'BUY'
+
+def find_stop_target_exit(index, entry_row, end, entry_type, stop_price, target_price):
+    """
+    Primer minuto desde la entrada que toca el stop o el target (el stop tiene prioridad)
+
+    Parameters:
+    index (dict): Resultado de build_contrarian_index
+    entry_row (int): Fila de entrada (se evalúa también)
+    end (int): Fila siguiente a la última del día
+    entry_type (str): 'SELL' o 'BUY'
+    stop_price (float): Precio de stop
+    target_price (float): Precio de target
+
+    Returns:
+    tuple: (fila, 'STOP_LOSS'/'TARGET') o (None, None) si no se toca ninguno
+    """
+    if entry_type == 'SELL':
+        stop_row = first_touch(index['high'], entry_row, end, stop_price)
+        target_row = first_touch(index['low'], entry_row, end, target_price)
+    else:
+        stop_row = first_touch(index['low'], entry_row, end, stop_price)
+        target_row = first_touch(index['high'], entry_row, end, target_price)
+
+    row, is_stop = _earliest(stop_row, target_row)
+    if row < 0:
+        return None, None
+
+    return row, 'STOP_LOSS' if is_stop else 'TARGET'
+
+def contrarian_trades_to_frame(arrays, trades, timestamps):
+    """
+    Convierte los arrays de trades al esquema de contrarian_volatility_trading
+
+    Parameters:
+    arrays (dict): Resultado de build_contrarian_arrays
+    trades (dict o ndarray): Resultado de run_contrarian_grid o registro CONTRARIAN_TRADE_DTYPE (trade_buffer)
+    timestamps (Series): Columna 'date' del DataFrame (conserva su dtype exacto)
+
+    Returns:
+    DataFrame: Resultados de trading, una fila por día operado
+    """
+    if len(trades['day']) == 0:
+        return pd.DataFrame([])
+
+    direction = trades['direction']
+    pnl = np.where(direction > 0, trades['exit_price'] - trades['entry_price'],
+                   trades['entry_price'] - trades['exit_price'])
+
+    return pd.DataFrame({
+        'date': list(arrays['day_dates'][trades['day']]),
+        'entry_time': timestamps.iloc[trades['entry_row']].tolist(),
+        'exit_time': timestamps.iloc[trades['exit_row']].tolist(),
+        'entry_type': ['BUY' if d > 0 else 'SELL' for d in direction],
+        'entry_price': trades['entry_price'],
+        'exit_price': trades['exit_price'],
+        'exit_reason': [EXIT_REASONS[code] for code in trades['exit_code']],
+        'pnl': pnl,
+        'prev_day_range': list(trades['prev_day_range']),
+        'prev_high': trades['prev_high'],
+        'prev_low': trades['prev_low'],
+        'current_open': trades['current_open'],
+        'current_high': trades['current_high'],
+        'current_low': trades['current_low'],
+        'current_close': trades['current_close']
+    })
+
+if __name__ == "__main__":
+    print("Contrarian engine module loaded successfully")
+    print("Available functions:")
+    print("- build_contrarian_arrays(df, day_index, range_column)")
+    print("- prev_range_thresholds(arrays, min_prev_range=100, window=0, quantile=0.8)")
+    print("- run_contrarian_grid(arrays, stop_loss, target, min_prev_range=100, grid=None)")
+    print("- build_daily_aggregates(arrays)")
+    print("- run_contrarian_vectorized(arrays, stop_loss, target, min_prev_range=100, index=None)")
+    print("- build_contrarian_index(df)")
+    print("- find_level_touch(index, start, end, prev_high, prev_low)")
+    print("- find_stop_target_exit(index, entry_row, end, entry_type, stop_price, target_price)")
+    print("- contrarian_trades_to_frame(arrays, trades, timestamps)")
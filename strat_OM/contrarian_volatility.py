@@ -3,6 +3,11 @@ import numpy as np
 import os
 from create_2022_subset import create_subset
 from plot_contrarian import plot_contrarian_results
+from day_index import build_day_index, get_day_data
+from contrarian_engine import build_contrarian_arrays, prev_range_thresholds, run_contrarian_grid, contrarian_trades_to_frame
+from contrarian_engine import run_contrarian_vectorized
+from contrarian_engine import build_contrarian_index, find_level_touch, find_stop_target_exit, EXIT_REASONS
+from trade_buffer import CONTRARIAN_TRADE_DTYPE, create_trade_buffer, append_trade, trade_records
 
 # =============================================================================
 # CONFIGURACIÓN DE FECHAS Y PARÁMETROS
@@ -15,7 +20,15 @@ STOP_LOSS = 50      # puntos (ajustado para ES)
 TARGET = 100        # puntos (ajustado para ES)
 TRAILING_STOP = 50  # puntos para break-even
 
-def contrarian_volatility_trading(df):
+# Filtro de volatilidad del día anterior: se opera si su range supera el umbral
+MIN_PREV_RANGE = 100       # puntos (umbral fijo)
+PREV_RANGE_WINDOW = 0      # días para el umbral adaptativo (0 = usar siempre MIN_PREV_RANGE)
+PREV_RANGE_QUANTILE = 0.8  # cuantil de los ranges de la ventana usado como umbral adaptativo
+
+# Motor: 'vectorized' = tabla diaria + operaciones vectorizadas, 'loop' = bucle por días (referencia)
+ENGINE = 'vectorized'
+
+def contrarian_volatility_trading(df, engine='loop'):
     """
     Sistema de trading contrarian basado en volatilidad baja del día anterior
 
@@ -31,6 +44,9 @@ def contrarian_volatility_trading(df):
 
     Parameters:
     df (DataFrame): Datos con columnas necesarias
+    engine (str): 'loop' = bucle por días (referencia), 'grid' = rejilla días x minutos (contrarian_engine),
+                  'indexed' = bucle por días con toques de nivel en O(log n) (range_query),
+                  'vectorized' = tabla OHLC diaria y toques en bloque, sin bucle por días (contrarian_engine)
 
     Returns:
     DataFrame: Resultados de trading
@@ -57,24 +73,45 @@ def contrarian_volatility_trading(df):
             df['range_calc'] = df['high'] - df['low']
             day_type_col = 'range_calc'
 
-    # DataFrame para resultados
-    trades = []
+    # Registro de trades con esquema fijo (se convierte a DataFrame al final)
+    trades = create_trade_buffer(CONTRARIAN_TRADE_DTYPE)
+    exit_codes = {reason: code for code, reason in EXIT_REASONS.items()}
 
     # Preparar datos: agrupar por fecha y obtener datos diarios
     df['date_only'] = pd.to_datetime(df['date']).dt.date
 
-    # Obtener días únicos para iterar
-    unique_dates = sorted(df['date_only'].unique())
+    # El índice de sesiones necesita los datos ordenados por fecha
+    if not pd.to_datetime(df['date']).is_monotonic_increasing:
+        df = df.sort_values('date').reset_index(drop=True)
+
+    # Índice de sesiones: offsets start/end de cada día (días únicos ordenados)
+    day_index = build_day_index(df)
+    unique_dates = list(day_index['date_only'])
 
     print(f"Procesando {len(unique_dates)} días únicos...")
 
+    # Umbral de range del día anterior por día (fijo o cuantil de la ventana de días anteriores)
+    arrays = build_contrarian_arrays(df, day_index, day_type_col)
+    range_thresholds = prev_range_thresholds(arrays, MIN_PREV_RANGE, PREV_RANGE_WINDOW, PREV_RANGE_QUANTILE)
+
+    # Motor sobre la rejilla días x minutos: mismo registro de trades, todos los días a la vez
+    if engine == 'grid':
+        trades_grid = run_contrarian_grid(arrays, STOP_LOSS, TARGET, min_prev_range=range_thresholds)
+        return contrarian_trades_to_frame(arrays, trades_grid, df['date'])
+    elif engine == 'vectorized':
+        trades_vectorized = run_contrarian_vectorized(arrays, STOP_LOSS, TARGET, min_prev_range=range_thresholds)
+        return contrarian_trades_to_frame(arrays, trades_vectorized, df['date'])
+    elif engine == 'indexed':
+        touch_index = build_contrarian_index(df)
+    elif engine != 'loop':
+        raise ValueError(f"Motor no soportado: {engine} (usar 'loop', 'grid', 'indexed' o 'vectorized')")
+
     # Iterar desde el segundo día (necesitamos día anterior)
     for i in range(1, len(unique_dates)):
         current_date = unique_dates[i]
-        prev_date = unique_dates[i-1]
 
         # Obtener datos del día anterior (agregados)
-        prev_day_data = df[df['date_only'] == prev_date]
+        prev_day_data = get_day_data(df, day_index, i - 1)
         prev_day_high = prev_day_data['high'].max()
         prev_day_low = prev_day_data['low'].min()
         prev_day_summary = {
@@ -86,19 +123,19 @@ def contrarian_volatility_trading(df):
             day_type_col: prev_day_data[day_type_col].iloc[0] if day_type_col in prev_day_data.columns else 'unknown'
         }
 
-        # Solo operar si el día anterior tuvo volatilidad ALTA (range > 100 puntos)
+        # Solo operar si el día anterior tuvo volatilidad ALTA (range > umbral del día anterior)
         # Usar siempre el range diario calculado
         prev_range_numeric = prev_day_summary['range_daily']
 
         # Debug: imprimir información del range
-        if len(trades) < 5:  # Solo para los primeros días
+        if trades['size'] < 5:  # Solo para los primeros días
             print(f"Día {current_date}: range_diario={prev_range_numeric:.1f} puntos")
 
-        if prev_range_numeric <= 100:
+        if prev_range_numeric <= range_thresholds[i - 1]:
             continue
 
         # Obtener datos del día actual (minuto a minuto)
-        current_day_data = df[df['date_only'] == current_date].sort_values('date')
+        current_day_data = get_day_data(df, day_index, i)
 
         if len(current_day_data) == 0:
             continue
@@ -107,41 +144,57 @@ def contrarian_volatility_trading(df):
         prev_high = prev_day_summary['high']
         prev_low = prev_day_summary['low']
         current_open = current_day_data['open'].iloc[0]
+        day_start = day_index['start'].iat[i]
+        day_end = day_index['end'].iat[i]
 
         entry_price = None
         entry_type = None
         exit_price = None
         exit_reason = None
         entry_time = None
-        exit_time = None
+        entry_row = None
+        exit_row = None
 
         # Caso 1: Apertura por encima del high anterior -> SELL a la apertura
         if current_open > prev_high:
             entry_price = current_open
             entry_type = 'SELL'
             entry_time = current_day_data['date'].iloc[0]
+            entry_row = day_start
 
         # Caso 2: Apertura por debajo del low anterior -> BUY a la apertura
         elif current_open < prev_low:
             entry_price = current_open
             entry_type = 'BUY'
             entry_time = current_day_data['date'].iloc[0]
+            entry_row = day_start
 
         # Caso 3: Apertura entre high y low -> esperar a que toque un nivel
+        elif prev_low <= current_open <= prev_high and engine == 'indexed':
+            # Primer toque del high/low anterior por búsqueda en el índice de máximos/mínimos
+            touch_row, touch_type = find_level_touch(touch_index, day_start, day_end, prev_high, prev_low)
+            if touch_row is not None:
+                entry_price = prev_high if touch_type == 'SELL' else prev_low
+                entry_type = touch_type
+                entry_time = df['date'].iat[touch_row]
+                entry_row = touch_row
+
         elif prev_low <= current_open <= prev_high:
             # Buscar en datos minuto a minuto si toca algún nivel
-            for idx, row in current_day_data.iterrows():
+            for offset, (idx, row) in enumerate(current_day_data.iterrows()):
                 # Si toca el high -> SELL
                 if row['high'] >= prev_high and entry_price is None:
                     entry_price = prev_high
                     entry_type = 'SELL'
                     entry_time = row['date']
+                    entry_row = day_start + offset
                     break
                 # Si toca el low -> BUY
                 elif row['low'] <= prev_low and entry_price is None:
                     entry_price = prev_low
                     entry_type = 'BUY'
                     entry_time = row['date']
+                    entry_row = day_start + offset
                     break
 
         # Si hay entrada, simular la gestión de stop/target
@@ -151,63 +204,57 @@ def contrarian_volatility_trading(df):
 
             # Filtrar datos después de la entrada
             entry_data = current_day_data[current_day_data['date'] >= entry_time]
-
-            # Buscar exit en datos minuto a minuto
-            for idx, row in entry_data.iterrows():
-                if entry_type == 'SELL':
-                    # Para SELL: stop si sube demasiado, target si baja lo suficiente
-                    if row['high'] >= stop_price:
-                        exit_price = stop_price
-                        exit_reason = 'STOP_LOSS'
-                        exit_time = row['date']
-                        break
-                    elif row['low'] <= target_price:
-                        exit_price = target_price
-                        exit_reason = 'TARGET'
-                        exit_time = row['date']
-                        break
-                else:  # BUY
-                    # Para BUY: stop si baja demasiado, target si sube lo suficiente
-                    if row['low'] <= stop_price:
-                        exit_price = stop_price
-                        exit_reason = 'STOP_LOSS'
-                        exit_time = row['date']
-                        break
-                    elif row['high'] >= target_price:
-                        exit_price = target_price
-                        exit_reason = 'TARGET'
-                        exit_time = row['date']
-                        break
+            first_exit_row = day_end - len(entry_data)
+
+            if engine == 'indexed' and len(entry_data) > 0:
+                # Primer toque de stop/target desde la entrada por búsqueda en el índice
+                exit_row, touch_reason = find_stop_target_exit(touch_index, first_exit_row, day_end,
+                                                               entry_type, stop_price, target_price)
+                if exit_row is not None:
+                    exit_price = stop_price if touch_reason == 'STOP_LOSS' else target_price
+                    exit_reason = touch_reason
+            else:
+                # Buscar exit en datos minuto a minuto
+                for offset, (idx, row) in enumerate(entry_data.iterrows()):
+                    if entry_type == 'SELL':
+                        # Para SELL: stop si sube demasiado, target si baja lo suficiente
+                        if row['high'] >= stop_price:
+                            exit_price = stop_price
+                            exit_reason = 'STOP_LOSS'
+                            exit_row = first_exit_row + offset
+                            break
+                        elif row['low'] <= target_price:
+                            exit_price = target_price
+                            exit_reason = 'TARGET'
+                            exit_row = first_exit_row + offset
+                            break
+                    else:  # BUY
+                        # Para BUY: stop si baja demasiado, target si sube lo suficiente
+                        if row['low'] <= stop_price:
+                            exit_price = stop_price
+                            exit_reason = 'STOP_LOSS'
+                            exit_row = first_exit_row + offset
+                            break
+                        elif row['high'] >= target_price:
+                            exit_price = target_price
+                            exit_reason = 'TARGET'
+                            exit_row = first_exit_row + offset
+                            break
 
             # Si no se tocó stop ni target, salir al cierre
             if exit_price is None:
                 exit_price = current_day_data['close'].iloc[-1]
                 exit_reason = 'EOD'
-                exit_time = current_day_data['date'].iloc[-1]
-
-            # Calcular PnL
-            pnl = (exit_price - entry_price) if entry_type == 'BUY' else (entry_price - exit_price)
-
-            trade = {
-                'date': current_date,
-                'entry_time': entry_time,
-                'exit_time': exit_time,
-                'entry_type': entry_type,
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'exit_reason': exit_reason,
-                'pnl': pnl,
-                'prev_day_range': prev_day_summary[day_type_col],
-                'prev_high': prev_high,
-                'prev_low': prev_low,
-                'current_open': current_open,
-                'current_high': current_day_data['high'].max(),
-                'current_low': current_day_data['low'].min(),
-                'current_close': current_day_data['close'].iloc[-1]
-            }
-            trades.append(trade)
-
-    return pd.DataFrame(trades)
+                exit_row = day_end - 1
+
+            append_trade(trades, (i, entry_row, exit_row, 1 if entry_type == 'BUY' else -1,
+                                  exit_codes[exit_reason], entry_price, exit_price,
+                                  prev_day_summary[day_type_col], prev_high, prev_low, current_open,
+                                  current_day_data['high'].max(), current_day_data['low'].min(),
+                                  current_day_data['close'].iloc[-1]))
+
+    # Conversión al esquema de resultados (PnL, etiquetas y timestamps) solo al final
+    return contrarian_trades_to_frame(arrays, trade_records(trades), df['date'])
 
 def calculate_performance_metrics(trades_df):
     """
@@ -315,7 +362,10 @@ def main():
 
     print("=== SISTEMA DE TRADING CONTRARIAN VOLATILITY ===")
     print(f"Período: {start_date} a {end_date}")
-    print("Lógica: Contrarian en días de ALTA volatilidad (range > 100 puntos)")
+    if PREV_RANGE_WINDOW > 0:
+        print(f"Lógica: Contrarian en días de ALTA volatilidad (range > percentil {PREV_RANGE_QUANTILE * 100:.0f} de {PREV_RANGE_WINDOW} días)")
+    else:
+        print(f"Lógica: Contrarian en días de ALTA volatilidad (range > {MIN_PREV_RANGE} puntos)")
     print(f"Stop: {STOP_LOSS} puntos | Target: {TARGET} puntos | Trailing: {TRAILING_STOP} puntos")
 
     # Cargar datos
@@ -325,7 +375,7 @@ def main():
 
     # Ejecutar sistema de trading
     print("\n=== EJECUTANDO SISTEMA DE TRADING ===")
-    trades_df = contrarian_volatility_trading(df_subset)
+    trades_df = contrarian_volatility_trading(df_subset, engine=ENGINE)
 
     if len(trades_df) == 0:
         print("No se generaron trades con los criterios especificados")
@@ -1,24 +1,133 @@
 import pandas as pd
 import os
 import sys
+import hashlib
 
 # Agregar el directorio padre al path para importar utils
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
-from utils.date_utils import add_day_of_week
+import numpy as np
+from utils.date_utils import add_day_of_week, get_dow_codes, DOW_NAMES
+from utils.minute_cache import load_minute_range, file_fingerprint
+from utils.bar_store import has_bar_store, open_bar_store, slice_bar_store, bar_store_frame
+from day_index import build_day_index
 
-def create_subset(start_date, end_date, output_filename=None):
+LEVEL_COLUMNS = ['long_level', 'short_level', 'long_stop', 'short_stop']
+
+# Directorio (dentro de data/) con los subsets ya calculados
+SUBSET_CACHE_DIRNAME = 'subset_cache'
+
+# Máximo de subsets guardados por versión de los ficheros fuente (se eliminan los más antiguos)
+SUBSET_CACHE_MAX_ENTRIES = 8
+
+def get_subset_cache_path(data_dir, start_date, end_date):
+    """
+    Ruta del subset cacheado, direccionada por contenido
+
+    El nombre combina la huella del fichero de minutos y la del fichero diario de niveles
+    (prefijo de fuente) con el rango pedido: si cualquiera de los ficheros cambia, la clave
+    cambia y se recalcula.
+
+    Parameters:
+    data_dir (str): Directorio data/
+    start_date (str): Fecha inicial
+    end_date (str): Fecha final
+
+    Returns:
+    str: Ruta del fichero parquet del subset
+    """
+    raw_fingerprint = file_fingerprint(os.path.join(data_dir, 'es_1min_data.csv'))
+    daily_fingerprint = file_fingerprint(os.path.join(data_dir, 'es_1D_data_range.csv'))
+    source_key = hashlib.sha1(f"{raw_fingerprint}|{daily_fingerprint}".encode()).hexdigest()[:16]
+    range_key = hashlib.sha1(f"{start_date}|{end_date}".encode()).hexdigest()[:16]
+
+    return os.path.join(data_dir, SUBSET_CACHE_DIRNAME, f'subset_{source_key}_{range_key}.parquet')
+
+def evict_subset_cache(cache_path, max_entries=SUBSET_CACHE_MAX_ENTRIES):
+    """
+    Limpia la caché de subsets al escribir una entrada nueva
+
+    Elimina los subsets calculados con otra versión de los ficheros fuente (prefijo de fuente
+    distinto, nunca se volverán a leer) y, de los vigentes, deja solo los max_entries usados
+    más recientemente (fecha de modificación, que se actualiza en cada lectura).
+
+    Parameters:
+    cache_path (str): Ruta de la entrada recién escrita (get_subset_cache_path)
+    max_entries (int): Subsets vigentes a conservar
+
+    Returns:
+    int: Número de ficheros eliminados
+    """
+    cache_dir = os.path.dirname(cache_path)
+    source_prefix = os.path.basename(cache_path).rsplit('_', 1)[0] + '_'
+
+    stale = []
+    current = []
+    for name in os.listdir(cache_dir):
+        if not (name.startswith('subset_') and name.endswith('.parquet')):
+            continue
+        path = os.path.join(cache_dir, name)
+        if name.startswith(source_prefix):
+            current.append(path)
+        else:
+            stale.append(path)
+
+    current.sort(key=os.path.getmtime, reverse=True)
+    removed = 0
+    for path in stale + [path for path in current[max_entries:] if path != cache_path]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+
+    return removed
+
+def _export_subset_csv(df_filtered, data_dir, start_date, end_date, output_filename=None):
+    """
+    Exporta el subset a CSV legible en data/ (opcional)
+    """
+    # Generar nombre de archivo si no se proporciona
+    if output_filename is None:
+        year_start = start_date[:4]
+        year_end = end_date[:4]
+        if year_start == year_end:
+            output_filename = f'es_1min_data_{year_start}.csv'
+        else:
+            output_filename = f'es_1min_data_{year_start}_{year_end}.csv'
+
+    # Guardar en directorio data
+    output_path = os.path.join(data_dir, output_filename)
+    df_filtered.to_csv(output_path, index=False)
+
+    print(f"\nArchivo guardado como: {output_path}")
+    print(f"Número de registros: {len(df_filtered):,}")
+    print(f"Columnas guardadas: {list(df_filtered.columns)}")
+
+    return output_path
+
+def create_subset(start_date, end_date, output_filename=None, export_csv=False, use_cache=True, compact=False):
     """
     Crea un subconjunto del archivo es_1min_data para un período específico
 
+    Los subsets se cachean en data/subset_cache/ (parquet) con una clave que depende del
+    rango y de las huellas de es_1min_data.csv y es_1D_data_range.csv; una petición
+    repetida se sirve directamente desde la caché. Al escribir se eliminan las entradas
+    de ficheros fuente anteriores y las menos usadas (evict_subset_cache).
+
     Parameters:
     start_date (str): Fecha inicial en formato 'YYYY-MM-DD'
     end_date (str): Fecha final en formato 'YYYY-MM-DD'
-    output_filename (str): Nombre del archivo de salida (opcional)
+    output_filename (str): Nombre del archivo CSV de salida (opcional, solo con export_csv)
+    export_csv (bool): Si exportar además el subset a CSV legible en data/
+    use_cache (bool): Si leer/escribir la caché de subsets
+    compact (bool): Si devolver la representación compacta (ver compact_subset) construida
+                    directamente, sin repetir los niveles en cada minuto. Solo lee la caché:
+                    con compact=True no se escribe (ni se exporta CSV) si no había entrada.
 
     Returns:
-    DataFrame: Datos filtrados
+    DataFrame: Datos filtrados (con compact=True, tupla (df_compact, df_day_levels))
     """
 
     # Cargar datos originales desde directorio data
@@ -26,20 +135,33 @@ def create_subset(start_date, end_date, output_filename=None):
     parent_dir = os.path.dirname(current_dir)
     data_dir = os.path.join(parent_dir, 'data')
     data_path = os.path.join(data_dir, 'es_1min_data.csv')
-    print(f"Cargando datos desde: {data_path}")
 
-    df = pd.read_csv(data_path, index_col=0, parse_dates=True)
-    print(f"Datos originales: {df.shape}")
-    print(f"Rango de fechas original: {df.index.min()} a {df.index.max()}")
+    # Servir desde la caché si el mismo subset ya se calculó con los mismos ficheros
+    cache_path = get_subset_cache_path(data_dir, start_date, end_date) if use_cache else None
+    if cache_path is not None and os.path.exists(cache_path):
+        print(f"Subset cargado desde caché: {cache_path}")
+        df_filtered = pd.read_parquet(cache_path)
+        # Marcar la entrada como usada recientemente para la limpieza de la caché
+        os.utime(cache_path)
+        print(f"Datos finales: {df_filtered.shape}")
+        if export_csv:
+            _export_subset_csv(df_filtered, data_dir, start_date, end_date, output_filename)
+        if compact:
+            return compact_subset(df_filtered)
+        return df_filtered
+
+    print(f"Cargando datos desde: {data_path}")
 
-    # Filtrar período específico
-    df_filtered = df.loc[start_date:end_date].copy()
+    if has_bar_store(data_path):
+        # Vistas del rango sobre el bar store (búsqueda binaria, sin copiar las columnas)
+        store = open_bar_store(data_path)
+        df_filtered = bar_store_frame(slice_bar_store(store, start_date, end_date), store['manifest'], as_index=False)
+    else:
+        # Leer solo las particiones año/mes que solapan el período (caché parquet)
+        df_filtered = load_minute_range(data_path, start_date, end_date).reset_index()
 
     print(f"\nDatos filtrados para {start_date} - {end_date}: {df_filtered.shape}")
-    print(f"Rango de fechas filtrado: {df_filtered.index.min()} a {df_filtered.index.max()}")
-
-    # Reset index para tener date como columna
-    df_filtered = df_filtered.reset_index()
+    print(f"Rango de fechas filtrado: {df_filtered['date'].min()} a {df_filtered['date'].max()}")
 
     # Añadir columna dow (day of week)
     df_filtered = add_day_of_week(df_filtered, 'date')
@@ -70,12 +192,22 @@ def create_subset(start_date, end_date, output_filename=None):
     df_daily['date'] = pd.to_datetime(df_daily['date'])
 
     # Extraer solo la fecha (sin tiempo) para el merge
-    df_filtered['date_only'] = df_filtered['date'].dt.date
     df_daily['date_only'] = df_daily['date'].dt.date
 
     print(f"Datos diarios cargados: {len(df_daily)} registros")
     print(f"Columnas diarias disponibles: {list(df_daily.columns)}")
 
+    if compact:
+        # Niveles una vez por día (equivalente al merge left por date_only, sin repetirlos por minuto)
+        df_compact, df_day_levels = build_compact_minutes(df_filtered)
+        levels = df_daily.set_index('date_only')[LEVEL_COLUMNS].reindex(df_day_levels['date_only'])
+        for col in LEVEL_COLUMNS:
+            df_day_levels[col] = pd.to_numeric(levels[col], errors='coerce').to_numpy(dtype=np.float64)
+        print(f"Subset compacto: {df_compact.shape} minutos, {len(df_day_levels)} días")
+        return df_compact, df_day_levels
+
+    df_filtered['date_only'] = df_filtered['date'].dt.date
+
     # Hacer merge usando solo la fecha
     columns_to_merge = ['date_only', 'long_level', 'short_level', 'long_stop', 'short_stop']
     df_merge = df_daily[columns_to_merge].copy()
@@ -93,30 +225,137 @@ def create_subset(start_date, end_date, output_filename=None):
     print(f"Merge completado. Nuevas columnas añadidas: long_level, short_level, long_stop, short_stop")
     print(f"Datos finales: {df_filtered.shape}")
 
-    # Generar nombre de archivo si no se proporciona
-    if output_filename is None:
-        year_start = start_date[:4]
-        year_end = end_date[:4]
-        if year_start == year_end:
-            output_filename = f'es_1min_data_{year_start}.csv'
-        else:
-            output_filename = f'es_1min_data_{year_start}_{year_end}.csv'
+    # Guardar en la caché de subsets (formato binario, rápido de releer)
+    if cache_path is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            df_filtered.to_parquet(cache_path, index=False)
+            print(f"\nSubset guardado en caché: {cache_path}")
+            removed = evict_subset_cache(cache_path)
+            if removed:
+                print(f"Subsets antiguos eliminados de la caché: {removed}")
+        except ImportError as e:
+            print(f"⚠️  Caché de subsets no disponible ({e})")
+
+    # Exportar CSV legible solo si se pide
+    if export_csv:
+        _export_subset_csv(df_filtered, data_dir, start_date, end_date, output_filename)
 
-    # Guardar en directorio data
-    output_path = os.path.join(data_dir, output_filename)
-    df_filtered.to_csv(output_path, index=False)
+    return df_filtered
 
-    print(f"\nArchivo guardado como: {output_path}")
-    print(f"Número de registros: {len(df_filtered):,}")
-    print(f"Columnas guardadas: {list(df_filtered.columns)}")
+def _to_float32_if_exact(values):
+    """
+    Convierte precios a float32 solo si la conversión es exacta (ticks de 0.25 lo son)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values32 = values.astype(np.float32)
+    if np.array_equal(values32.astype(np.float64), values, equal_nan=True):
+        return values32
+    print("⚠️  Precios no representables en float32 sin pérdida: se mantienen en float64")
+    return values
+
+def _compact_volume(volume):
+    """
+    Volumen en int32 si es entero y cabe; si no, se mantiene su tipo (int64 o float con NaN)
+    """
+    volume = np.asarray(volume)
+    if (np.issubdtype(volume.dtype, np.integer) and len(volume) > 0
+            and np.abs(volume).max() < np.iinfo(np.int32).max):
+        return volume.astype(np.int32)
+    return volume
 
-    return df_filtered
+def build_compact_minutes(df):
+    """
+    Minutos con tipos pequeños y tabla por día (sin niveles) de un subset ordenado por fecha
+
+    Parameters:
+    df (DataFrame): Minutos con date, open/high/low/close y volume (sin domingos)
+
+    Returns:
+    tuple: (df_compact, df_days) - Minutos compactos y tabla por día con date_only,
+           start, end (offsets de fila), dow_code y dow
+    """
+    df = df.reset_index(drop=True)
+    dow_codes = get_dow_codes(df['date'])
+
+    df_compact = pd.DataFrame({
+        'date': df['date'],
+        'open': _to_float32_if_exact(df['open']),
+        'high': _to_float32_if_exact(df['high']),
+        'low': _to_float32_if_exact(df['low']),
+        'close': _to_float32_if_exact(df['close']),
+        'volume': _compact_volume(df['volume']),
+        'dow_code': dow_codes
+    })
+
+    # Tabla por día: offsets del índice de sesiones + dow
+    df_days = build_day_index(df)
+    df_days['dow_code'] = dow_codes[df_days['start'].to_numpy()]
+    df_days['dow'] = [DOW_NAMES[code - 1] for code in df_days['dow_code']]
+
+    return df_compact, df_days
+
+def compact_subset(df):
+    """
+    Representación compacta del subset: minutos con tipos pequeños y niveles en una tabla por día
+
+    - Precios open/high/low/close en float32 (exacto para ticks de 0.25; si no, float64)
+    - volume en int32 si es entero y cabe (si no, se mantiene int64 o float con NaN)
+    - dow como código int8 (1=lunes ... 7=domingo)
+    - Niveles diarios en una tabla aparte (una fila por día) en lugar de repetirse en cada minuto.
+      Se mantienen en float64: la tabla es diminuta y así los stops conservan su valor exacto.
+
+    Parameters:
+    df (DataFrame): Subset de create_subset ordenado por fecha
+
+    Returns:
+    tuple: (df_compact, df_day_levels) - Minutos compactos y tabla de niveles por día
+           (date_only, start, end, dow, dow_code y niveles; start/end son offsets de fila)
+    """
+    df = df.reset_index(drop=True)
+    df_compact, df_day_levels = build_compact_minutes(df)
+
+    # Niveles constantes dentro del día: basta con la primera fila
+    starts = df_day_levels['start'].to_numpy()
+    for col in LEVEL_COLUMNS:
+        df_day_levels[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)[starts]
+
+    before = df.memory_usage(deep=True).sum()
+    after = df_compact.memory_usage(deep=True).sum() + df_day_levels.memory_usage(deep=True).sum()
+    print(f"Subset compacto: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB")
+
+    return df_compact, df_day_levels
+
+def expand_compact_subset(df_compact, df_day_levels):
+    """
+    Reconstruye el formato ancho de create_subset (dow en texto y niveles en cada minuto)
+
+    Parameters:
+    df_compact (DataFrame): Minutos compactos de compact_subset
+    df_day_levels (DataFrame): Tabla por día de compact_subset
+
+    Returns:
+    DataFrame: Mismas columnas que create_subset
+    """
+    lengths = (df_day_levels['end'] - df_day_levels['start']).to_numpy()
+
+    df = pd.DataFrame({'date': df_compact['date']})
+    for col in ['open', 'high', 'low', 'close']:
+        df[col] = df_compact[col].astype(np.float64)
+    volume = df_compact['volume']
+    df['volume'] = volume.astype(np.int64) if pd.api.types.is_integer_dtype(volume) else volume
+    df['dow'] = np.asarray(DOW_NAMES, dtype=object)[df_compact['dow_code'].to_numpy() - 1]
+    for col in LEVEL_COLUMNS:
+        df[col] = np.repeat(df_day_levels[col].to_numpy(), lengths)
+
+    return df
 
 def create_2022_subset():
     """
     Crea un subconjunto del archivo es_1min_data solo para el año 2022
     """
-    return create_subset('2022-01-01', '2022-12-31')
+    # Además del subset devuelto, deja el CSV legible es_1min_data_2022.csv en data/
+    return create_subset('2022-01-01', '2022-12-31', export_csv=True)
 
 if __name__ == "__main__":
     df_2022 = create_2022_subset()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+def build_day_index(df, date_column='date'):
+    """
+    Construye un índice de sesiones con los offsets de fila de cada día
+
+    Se calcula una sola vez por subset. Cada día ocupa las filas [start, end)
+    del DataFrame, de modo que df.iloc[start:end] devuelve los datos del día
+    sin recorrer la columna completa con una máscara booleana.
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha
+    date_column (str): Nombre de la columna con el timestamp (UTC)
+
+    Returns:
+    DataFrame: Columnas date_only (datetime.date), start y end (offsets de fila, end exclusivo)
+    """
+    dates = pd.to_datetime(df[date_column])
+
+    # Día UTC de cada fila como datetime64[D] (equivalente a .dt.date, sin objetos Python)
+    day_values = dates.values.astype('datetime64[D]')
+
+    if len(day_values) == 0:
+        return pd.DataFrame({
+            'date_only': pd.Series(dtype=object),
+            'start': pd.Series(dtype=np.int64),
+            'end': pd.Series(dtype=np.int64)
+        })
+
+    if (day_values[1:] < day_values[:-1]).any():
+        raise ValueError("El DataFrame debe estar ordenado por fecha para construir el índice de días")
+
+    # Posiciones donde cambia el día
+    change_points = np.flatnonzero(day_values[1:] != day_values[:-1]) + 1
+    starts = np.concatenate(([0], change_points)).astype(np.int64)
+    ends = np.concatenate((change_points, [len(day_values)])).astype(np.int64)
+
+    return pd.DataFrame({
+        'date_only': pd.DatetimeIndex(day_values[starts]).date,
+        'start': starts,
+        'end': ends
+    })
+
+def get_day_data(df, day_index, position):
+    """
+    Devuelve las filas de un día a partir del índice de sesiones (slice posicional, sin máscara)
+
+    Parameters:
+    df (DataFrame): Mismo DataFrame usado para construir day_index
+    day_index (DataFrame): Resultado de build_day_index
+    position (int): Posición del día dentro de day_index
+
+    Returns:
+    DataFrame: Filas del día
+    """
+    start = day_index['start'].iat[position]
+    end = day_index['end'].iat[position]
+    return df.iloc[start:end]
+
+if __name__ == "__main__":
+    print("Day index module loaded successfully")
+    print("Available functions:")
+    print("- build_day_index(df, date_column='date')")
+    print("- get_day_data(df, day_index, position)")
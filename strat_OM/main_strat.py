@@ -1,8 +1,9 @@
 import pandas as pd
 import os
-from create_2022_subset import create_subset
+from create_2022_subset import create_subset, expand_compact_subset
 from plot_chart_subset import plot_subset_chart
 from order_management import order_management, save_trading_results
+from online_metrics import create_online_metrics
 
 def main():
     """
@@ -23,6 +24,9 @@ def main():
     use_fixed_stop = TrueFalse   # True = stop fijo en USD, False = stop basado en range
     fixed_stop_usd = 500    # Stop fijo de $500
     trail =          15     # Puntos de ganancia para activar trailing stop (break-even)
+
+    # Motor de ejecución
+    engine = 'vectorized'   # 'vectorized' = motor NumPy, 'loop' = bucle minuto a minuto (referencia)
   
     
   
@@ -31,8 +35,8 @@ def main():
     print("=== CREACIÓN DE SUBSET DE DATOS ===")
     print(f"Período: {start_date} a {end_date}")
 
-    # Crear subset de datos
-    df_subset = create_subset(start_date, end_date)
+    # Crear subset de datos (minutos compactos + tabla de niveles por día)
+    df_subset, day_levels = create_subset(start_date, end_date, compact=True)
 
     print(f"\n=== DATOS CARGADOS ===")
     print(f"Shape: {df_subset.shape}")
@@ -67,21 +71,26 @@ def main():
     else:
         print(f"Target Profit: Mantener posición {tp_days} día(s) adicional(es)")
 
-    trades_df, df_with_trades = order_management(df_subset, dow_filter=dow_filter,
-                                                 use_fixed_stop=use_fixed_stop, fixed_stop_usd=fixed_stop_usd,
-                                                 trail=trail, tp_days=tp_days)
+    # Métricas acumuladas por el motor al cerrar cada trade (solo motores NumPy)
+    metrics = create_online_metrics() if engine != 'loop' else None
+
+    # Marcadores dispersos por fila en lugar de una segunda copia completa del subset
+    trades_df, trade_markers = order_management(df_subset, dow_filter=dow_filter,
+                                                use_fixed_stop=use_fixed_stop, fixed_stop_usd=fixed_stop_usd,
+                                                trail=trail, tp_days=tp_days, engine=engine, enrich='markers',
+                                                metrics=metrics, day_levels=day_levels)
 
     # Generar gráfico con datos de trading (lo último)
     print(f"\n=== GENERANDO GRÁFICO CON TRADES ===")
     # COMENTAR SI NO SE DESEA CHART CON LAS ENTRADAS/SALIDAS
-    #plot_subset_chart('ES', '1min', df_with_trades, 'trades')
+    #plot_subset_chart('ES', '1min', expand_compact_subset(df_subset, day_levels), 'trades', markers=trade_markers)
 
     # Guardar resultados de trading
     if len(trades_df) > 0:
         print(f"\n=== GUARDANDO RESULTADOS ===")
         tracking_filename = save_trading_results(trades_df, start_date, end_date,
                                                   use_fixed_stop=use_fixed_stop, fixed_stop_usd=fixed_stop_usd,
-                                                  trail=trail, tp_days=tp_days)
+                                                  trail=trail, tp_days=tp_days, metrics=metrics)
 
         print(f"\n=== PRIMEROS 10 TRADES ===")
         print(trades_df.head(20))
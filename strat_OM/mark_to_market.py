@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+# Valor del punto del contrato (mismo multiplicador que profit_usd en los motores)
+POINT_VALUE = 50
+
+def trade_legs(arrays, trades):
+    """
+    Filas de entrada/salida, dirección y precios de cada trade sobre los arrays de minutos
+
+    Acepta el registro estructurado de los motores (entry_idx/exit_idx o entry_row/exit_row)
+    o un trades_df con entry_time/exit_time, cuyas filas se localizan con searchsorted
+    sobre arrays['date_ns'].
+
+    Parameters:
+    arrays (dict): Resultado de build_minute_arrays (date_ns, close, day_start, day_end)
+    trades (ndarray o DataFrame): Registro de trades
+
+    Returns:
+    dict: entry_row, exit_row, direction (1/-1), entry_price y exit_price
+    """
+    if isinstance(trades, pd.DataFrame):
+        # order_management/breakout_trades_to_frame devuelven un DataFrame sin columnas si no hay trades
+        if len(trades) == 0:
+            trades = pd.DataFrame({col: pd.Series(dtype=np.float64) for col in ['entry_price', 'exit_price']})
+            entry_ns = exit_ns = np.array([], dtype=np.int64)
+            direction = np.array([], dtype=np.int64)
+        else:
+            entry_ns = pd.to_datetime(trades['entry_time'], utc=True).dt.as_unit('ns').astype(np.int64).to_numpy()
+            exit_ns = pd.to_datetime(trades['exit_time'], utc=True).dt.as_unit('ns').astype(np.int64).to_numpy()
+            direction = np.where(trades['trade_type'].to_numpy() == 'BUY', 1, -1)
+
+        legs = {
+            'entry_row': np.searchsorted(arrays['date_ns'], entry_ns, side='left'),
+            'exit_row': np.searchsorted(arrays['date_ns'], exit_ns, side='left'),
+            'direction': direction
+        }
+        exit_row = np.minimum(legs['exit_row'], len(arrays['date_ns']) - 1)
+        if len(exit_ns) > 0 and (arrays['date_ns'][exit_row] != exit_ns).any():
+            raise ValueError("Hay trades con exit_time fuera de los arrays de minutos")
+    else:
+        entry_field = 'entry_idx' if 'entry_idx' in trades.dtype.names else 'entry_row'
+        exit_field = 'exit_idx' if 'exit_idx' in trades.dtype.names else 'exit_row'
+        legs = {
+            'entry_row': trades[entry_field],
+            'exit_row': trades[exit_field],
+            'direction': trades['direction']
+        }
+
+    legs = {key: np.asarray(values, dtype=np.int64) for key, values in legs.items()}
+    legs['entry_price'] = np.asarray(trades['entry_price'], dtype=np.float64)
+    legs['exit_price'] = np.asarray(trades['exit_price'], dtype=np.float64)
+
+    return legs
+
+def _event_positions(rows, event_rows):
+    """
+    Orden de los eventos y número de eventos con fila <= cada fila consultada
+    """
+    order = np.argsort(event_rows, kind='stable')
+    return order, np.searchsorted(event_rows[order], rows, side='right')
+
+def _cumulative_at(weights, events):
+    """
+    Suma de los pesos de los eventos hasta cada fila consultada (cumsum indexado)
+    """
+    order, counts = events
+    return np.concatenate(([0.0], np.cumsum(weights[order])))[counts]
+
+def _equity_at_rows(arrays, legs, rows, point_value):
+    """
+    Equity mark-to-market (USD) y posición neta en las filas indicadas
+
+    Un trade está abierto en las filas [entry_row, exit_row): ahí se valora al cierre del
+    minuto. En exit_row su P&L pasa a realizado con el precio de salida.
+    """
+    direction = legs['direction'].astype(np.float64)
+    entries = _event_positions(rows, legs['entry_row'])
+    exits = _event_positions(rows, legs['exit_row'])
+
+    # Posición y coste abiertos = entradas hasta la fila - salidas hasta la fila
+    position = _cumulative_at(direction, entries) - _cumulative_at(direction, exits)
+    cost = (_cumulative_at(direction * legs['entry_price'], entries)
+            - _cumulative_at(direction * legs['entry_price'], exits))
+    realized = _cumulative_at(direction * (legs['exit_price'] - legs['entry_price']), exits)
+
+    # Evita residuos de coma flotante en filas sin posición
+    position = np.round(position)
+    cost = np.where(position == 0, 0.0, cost)
+
+    equity = (realized + position * arrays['close'][rows] - cost) * point_value
+
+    return equity, position
+
+def _drawdown(equity):
+    """
+    Drawdown frente al máximo acumulado (partiendo de equity 0)
+    """
+    if len(equity) == 0:
+        return equity.copy()
+    return equity - np.maximum(np.maximum.accumulate(equity), 0.0)
+
+def build_minute_equity(arrays, trades, point_value=POINT_VALUE):
+    """
+    Curva de equity mark-to-market minuto a minuto
+
+    Parameters:
+    arrays (dict): Resultado de build_minute_arrays
+    trades (ndarray o DataFrame): Registro de trades (ver trade_legs)
+    point_value (float): Valor en USD de un punto
+
+    Returns:
+    DataFrame: date, position (contratos netos), equity y drawdown (USD) por minuto
+    """
+    rows = np.arange(len(arrays['close']))
+    equity, position = _equity_at_rows(arrays, trade_legs(arrays, trades), rows, point_value)
+
+    return pd.DataFrame({
+        'date': pd.to_datetime(arrays['date_ns'], utc=True),
+        'position': position.astype(np.int64),
+        'equity': equity,
+        'drawdown': _drawdown(equity)
+    })
+
+def build_daily_equity(arrays, trades, point_value=POINT_VALUE):
+    """
+    Curva de equity mark-to-market diaria, con el peor punto intradía de cada sesión
+
+    Solo se valoran las filas donde la equity puede cambiar (minutos con posición abierta,
+    salidas y apertura/cierre de cada sesión): con la cartera plana la equity es constante,
+    así que el resultado es idéntico al de la curva por minuto y el coste es proporcional
+    al tiempo en mercado. Pensado para ejecutarse dentro de un barrido.
+
+    Parameters:
+    arrays (dict): Resultado de build_minute_arrays
+    trades (ndarray o DataFrame): Registro de trades (ver trade_legs)
+    point_value (float): Valor en USD de un punto
+
+    Returns:
+    DataFrame: date, position (al cierre), equity (al cierre), equity_low, daily_pnl,
+               drawdown (al cierre) y drawdown_low (peor drawdown intradía) por sesión
+    """
+    legs = trade_legs(arrays, trades)
+    n_rows = len(arrays['close'])
+    day_start = arrays['day_start']
+    day_last = arrays['day_end'] - 1
+
+    # Filas a valorar: rangos abiertos, salidas y extremos de cada sesión
+    open_count = (np.bincount(legs['entry_row'], minlength=n_rows + 1)
+                  - np.bincount(legs['exit_row'], minlength=n_rows + 1))
+    evaluate = np.cumsum(open_count[:n_rows]) > 0
+    evaluate[legs['exit_row']] = True
+    evaluate[day_start] = True
+    evaluate[day_last] = True
+    rows = np.flatnonzero(evaluate)
+
+    equity, position = _equity_at_rows(arrays, legs, rows, point_value)
+    drawdown = _drawdown(equity)
+
+    # Cada sesión empieza en su fila day_start (siempre incluida)
+    segments = np.searchsorted(rows, day_start)
+    close_positions = np.searchsorted(rows, day_last)
+    equity_close = equity[close_positions]
+
+    return pd.DataFrame({
+        'date': pd.DatetimeIndex(arrays['day_dates']).date,
+        'position': position[close_positions].astype(np.int64),
+        'equity': equity_close,
+        'equity_low': np.minimum.reduceat(equity, segments),
+        'daily_pnl': np.diff(equity_close, prepend=0.0),
+        'drawdown': _drawdown(equity_close),
+        'drawdown_low': np.minimum.reduceat(drawdown, segments)
+    })
+
+def mark_to_market_stats(daily_equity):
+    """
+    Métricas de riesgo sobre la equity mark-to-market diaria
+
+    Parameters:
+    daily_equity (DataFrame): Resultado de build_daily_equity
+
+    Returns:
+    dict: mtm_max_drawdown (peor drawdown intradía, USD) y mtm_sharpe_ratio (P&L diario)
+    """
+    if len(daily_equity) == 0:
+        return {'mtm_max_drawdown': 0, 'mtm_sharpe_ratio': 0}
+
+    daily_pnl = daily_equity['daily_pnl'].to_numpy()
+    volatility = np.std(daily_pnl, ddof=1) if len(daily_pnl) > 1 else 0
+
+    return {
+        'mtm_max_drawdown': float(daily_equity['drawdown_low'].min()),
+        'mtm_sharpe_ratio': float(np.mean(daily_pnl) / volatility) if volatility > 0 else 0
+    }
+
+if __name__ == "__main__":
+    print("Mark-to-market module loaded successfully")
+    print("Available functions:")
+    print("- trade_legs(arrays, trades)")
+    print("- build_minute_equity(arrays, trades, point_value=POINT_VALUE)")
+    print("- build_daily_equity(arrays, trades, point_value=POINT_VALUE)")
+    print("- mark_to_market_stats(daily_equity)")
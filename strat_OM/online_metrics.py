@@ -0,0 +1,194 @@
+import math
+
+def create_online_metrics():
+    """
+    Crea los acumuladores de métricas que el motor actualiza al cerrar cada trade
+
+    Returns:
+    dict: Sumas, varianzas de Welford (total y downside), equity/peak/drawdown y rachas
+    """
+    return {
+        'count': 0,
+        'wins': 0,
+        'total': 0.0,
+        'gross_profit': 0.0,
+        'gross_loss': 0.0,
+        'max_profit': -math.inf,
+        'max_loss': math.inf,
+        'time_in_market': 0.0,
+        # Welford sobre todos los trades y sobre los trades con pérdida (< 0)
+        'mean': 0.0,
+        'm2': 0.0,
+        'downside_count': 0,
+        'downside_mean': 0.0,
+        'downside_m2': 0.0,
+        # Equity por cierre de trade (el peak arranca en el primer valor, como summary.py)
+        'equity': 0.0,
+        'peak': None,
+        'max_drawdown': 0.0,
+        'drawdown_run': 0,
+        'max_drawdown_duration': 0,
+        # Rachas
+        'winning_streak': 0,
+        'losing_streak': 0,
+        'max_winning_streak': 0,
+        'max_losing_streak': 0,
+        # Período cubierto (ns) para el Calmar
+        'first_entry_ns': None,
+        'last_exit_ns': None,
+        'stopped_early': False
+    }
+
+def update_online_metrics(metrics, profit_usd, is_profit, time_in_market=0.0, entry_ns=None, exit_ns=None):
+    """
+    Actualiza los acumuladores con un trade cerrado (O(1), sin recorrer los anteriores)
+
+    Parameters:
+    metrics (dict): Resultado de create_online_metrics
+    profit_usd (float): Resultado del trade en USD (redondeado como en trades_df)
+    is_profit (bool): Etiqueta PROFIT del trade (profit_points > 0)
+    time_in_market (float): Minutos en mercado
+    entry_ns (int): Timestamp de entrada en ns (opcional, para el Calmar)
+    exit_ns (int): Timestamp de salida en ns (opcional, para el Calmar)
+    """
+    profit_usd = float(profit_usd)
+
+    metrics['count'] += 1
+    metrics['total'] += profit_usd
+    metrics['time_in_market'] += time_in_market
+    metrics['max_profit'] = max(metrics['max_profit'], profit_usd)
+    metrics['max_loss'] = min(metrics['max_loss'], profit_usd)
+
+    if is_profit:
+        metrics['wins'] += 1
+        metrics['gross_profit'] += profit_usd
+        metrics['winning_streak'] += 1
+        metrics['losing_streak'] = 0
+        metrics['max_winning_streak'] = max(metrics['max_winning_streak'], metrics['winning_streak'])
+    else:
+        metrics['gross_loss'] += profit_usd
+        metrics['losing_streak'] += 1
+        metrics['winning_streak'] = 0
+        metrics['max_losing_streak'] = max(metrics['max_losing_streak'], metrics['losing_streak'])
+
+    # Welford: media y suma de cuadrados de desviaciones en una sola pasada
+    delta = profit_usd - metrics['mean']
+    metrics['mean'] += delta / metrics['count']
+    metrics['m2'] += delta * (profit_usd - metrics['mean'])
+
+    if profit_usd < 0:
+        metrics['downside_count'] += 1
+        delta = profit_usd - metrics['downside_mean']
+        metrics['downside_mean'] += delta / metrics['downside_count']
+        metrics['downside_m2'] += delta * (profit_usd - metrics['downside_mean'])
+
+    # Equity, peak y drawdown
+    metrics['equity'] += profit_usd
+    if metrics['peak'] is None or metrics['equity'] > metrics['peak']:
+        metrics['peak'] = metrics['equity']
+    drawdown = metrics['equity'] - metrics['peak']
+    metrics['max_drawdown'] = min(metrics['max_drawdown'], drawdown)
+    metrics['drawdown_run'] = metrics['drawdown_run'] + 1 if drawdown < 0 else 0
+    metrics['max_drawdown_duration'] = max(metrics['max_drawdown_duration'], metrics['drawdown_run'])
+
+    if entry_ns is not None:
+        entry_ns = int(entry_ns)
+        metrics['first_entry_ns'] = entry_ns if metrics['first_entry_ns'] is None else min(metrics['first_entry_ns'], entry_ns)
+    if exit_ns is not None:
+        exit_ns = int(exit_ns)
+        metrics['last_exit_ns'] = exit_ns if metrics['last_exit_ns'] is None else max(metrics['last_exit_ns'], exit_ns)
+
+def online_metrics_summary(metrics):
+    """
+    Estadísticas finales a partir de los acumuladores (mismas definiciones que summary.py)
+
+    Parameters:
+    metrics (dict): Resultado de create_online_metrics ya actualizado
+
+    Returns:
+    dict: Métricas de calculate_basic_stats, calculate_risk_ratios y drawdown, más las
+          rachas en curso y stopped_early
+    """
+    count = metrics['count']
+    if count == 0:
+        return {'total_trades': 0, 'stopped_early': metrics['stopped_early']}
+
+    wins = metrics['wins']
+    losses = count - wins
+    avg_return = metrics['mean']
+
+    volatility = math.sqrt(metrics['m2'] / (count - 1)) if count > 1 else 0
+    downside_volatility = (math.sqrt(metrics['downside_m2'] / (metrics['downside_count'] - 1))
+                           if metrics['downside_count'] > 1 else 0)
+    gross_loss = abs(metrics['gross_loss'])
+
+    # Calmar: retorno anualizado sobre el período entrada inicial - salida final
+    period_days = 0
+    if metrics['first_entry_ns'] is not None and metrics['last_exit_ns'] is not None:
+        period_days = (metrics['last_exit_ns'] - metrics['first_entry_ns']) // (86400 * 10**9)
+    annual_factor = 365 / period_days if period_days > 0 else 1
+    annual_return = avg_return * count * annual_factor
+    max_drawdown = metrics['max_drawdown']
+
+    return {
+        'total_trades': count,
+        'winning_trades': wins,
+        'losing_trades': losses,
+        'win_rate': wins / count * 100,
+        'total_profit_usd': metrics['total'],
+        'avg_trade_profit': avg_return,
+        'avg_winning_trade': metrics['gross_profit'] / wins if wins > 0 else 0,
+        'avg_losing_trade': metrics['gross_loss'] / losses if losses > 0 else 0,
+        'profit_factor': metrics['gross_profit'] / gross_loss if gross_loss > 0 else float('inf'),
+        'gross_profit': metrics['gross_profit'],
+        'gross_loss': gross_loss,
+        'avg_time_in_market': metrics['time_in_market'] / count,
+        'max_profit': metrics['max_profit'],
+        'max_loss': metrics['max_loss'],
+        'max_winning_streak': metrics['max_winning_streak'],
+        'max_losing_streak': metrics['max_losing_streak'],
+        'current_winning_streak': metrics['winning_streak'],
+        'current_losing_streak': metrics['losing_streak'],
+        'sharpe_ratio': avg_return / volatility if volatility > 0 else 0,
+        'sortino_ratio': avg_return / downside_volatility if downside_volatility > 0 else 0,
+        'calmar_ratio': annual_return / abs(max_drawdown) if max_drawdown < 0 else 0,
+        'volatility': volatility,
+        'annual_return': annual_return,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_duration': metrics['max_drawdown_duration'],
+        'stopped_early': metrics['stopped_early']
+    }
+
+def should_stop(metrics, max_drawdown_usd=None, max_losing_streak=None, min_trades=0, min_win_rate=None):
+    """
+    Regla de parada anticipada basada en los acumuladores (para stop_rule del motor)
+
+    Se usa con functools.partial para fijar los umbrales, p.ej.
+    partial(should_stop, max_drawdown_usd=10000), que se puede enviar a procesos worker.
+
+    Parameters:
+    metrics (dict): Acumuladores en curso
+    max_drawdown_usd (float): Parar si el drawdown supera este importe (positivo)
+    max_losing_streak (int): Parar si la racha perdedora en curso llega a este valor
+    min_trades (int): Trades mínimos antes de evaluar min_win_rate
+    min_win_rate (float): Parar si el win rate (%) cae por debajo tras min_trades
+
+    Returns:
+    bool: True si la ejecución debe detenerse
+    """
+    if max_drawdown_usd is not None and metrics['max_drawdown'] <= -abs(max_drawdown_usd):
+        return True
+    if max_losing_streak is not None and metrics['losing_streak'] >= max_losing_streak:
+        return True
+    if (min_win_rate is not None and metrics['count'] >= max(min_trades, 1)
+            and metrics['wins'] / metrics['count'] * 100 < min_win_rate):
+        return True
+    return False
+
+if __name__ == "__main__":
+    print("Online metrics module loaded successfully")
+    print("Available functions:")
+    print("- create_online_metrics()")
+    print("- update_online_metrics(metrics, profit_usd, is_profit, time_in_market=0.0, entry_ns=None, exit_ns=None)")
+    print("- online_metrics_summary(metrics)")
+    print("- should_stop(metrics, max_drawdown_usd=None, max_losing_streak=None, min_trades=0, min_win_rate=None)")
@@ -1,8 +1,14 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-
-def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0):
+from day_index import build_day_index, get_day_data
+from breakout_engine import run_breakout_engine
+from create_2022_subset import expand_compact_subset
+from trade_markers import build_trade_markers, join_trade_markers
+from online_metrics import online_metrics_summary
+
+def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0, engine='loop', enrich='frame',
+                     metrics=None, stop_rule=None, day_levels=None):
     """
     Sistema de gestión de órdenes basado en señales de crossover con trailing stop y target profit
 
@@ -13,18 +19,87 @@ def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800,
     fixed_stop_usd (float): Cantidad en USD para stop fijo (default 800)
     trail (float): Puntos de ganancia para activar trailing stop a break-even (default 12)
     tp_days (int): Días para mantener la posición (0=cierre mismo día, 1=siguiente día, etc.)
+    engine (str): 'loop' = bucle minuto a minuto (referencia), 'vectorized' = motor NumPy (breakout_engine),
+                  'grid' = motor NumPy con rejilla días x minutos (session_grid),
+                  'indexed' = motor NumPy con salidas por primer toque en O(log n) (range_query)
+    enrich (str): 'frame' = DataFrame completo con marcadores (df_with_trades), 'markers' = solo la
+                  tabla dispersa de marcadores (trade_markers), None = sin enriquecimiento
+    metrics (dict): Acumuladores de create_online_metrics que el motor actualiza al cerrar cada
+                    trade (solo motores NumPy; online_metrics_summary da las estadísticas finales)
+    stop_rule (callable): stop_rule(metrics) -> bool para detener la ejecución antes de tiempo
+                          (solo motores NumPy)
+    day_levels (DataFrame): Tabla por día de create_subset(compact=True); con ella df son los
+                            minutos compactos y los motores NumPy leen los niveles de la tabla
+                            (build_compact_arrays). El bucle usa expand_compact_subset.
 
     Returns:
     tuple: (trades_df, df_with_trades) - Registro de operaciones y DataFrame enriquecido
+           (o tabla de marcadores con enrich='markers', None con enrich=None)
     """
+    if enrich not in ('frame', 'markers', None):
+        raise ValueError(f"Enriquecimiento no soportado: {enrich} (usar 'frame', 'markers' o None)")
+
+
+    # Minutos compactos: el bucle necesita el formato ancho (niveles y dow en cada minuto)
+    if day_levels is not None and engine == 'loop':
+        df = expand_compact_subset(df, day_levels)
+        day_levels = None
 
     # Preparar datos
     df = df.copy()
-    df = df.sort_values('date').reset_index(drop=True)
+    if day_levels is None:
+        df = df.sort_values('date').reset_index(drop=True)
+    else:
+        # Los offsets de day_levels se refieren al orden de create_subset
+        df = df.reset_index(drop=True)
 
     # Detectar señales de crossover (misma lógica que en el gráfico)
     df['date_only'] = df['date'].dt.date
 
+    # Índice de sesiones (offsets start/end por día), construido una sola vez
+    day_index = build_day_index(df) if day_levels is None else day_levels[['date_only', 'start', 'end']]
+
+    # Seleccionar motor: ambos devuelven el mismo esquema de trades_df
+    if engine in ('vectorized', 'grid', 'indexed'):
+        trades_df = run_breakout_engine(df, dow_filter=dow_filter, use_fixed_stop=use_fixed_stop,
+                                        fixed_stop_usd=fixed_stop_usd, trail=trail, tp_days=tp_days,
+                                        day_index=day_index, use_grid=(engine == 'grid'),
+                                        use_exit_index=(engine == 'indexed'), metrics=metrics, stop_rule=stop_rule,
+                                        day_levels=day_levels)
+    elif engine == 'loop':
+        if metrics is not None or stop_rule is not None:
+            raise ValueError("Las métricas online y stop_rule requieren un motor NumPy ('vectorized', 'grid' o 'indexed')")
+        trades_df = _order_management_loop(df, day_index, dow_filter=dow_filter, use_fixed_stop=use_fixed_stop,
+                                           fixed_stop_usd=fixed_stop_usd, trail=trail, tp_days=tp_days)
+    else:
+        raise ValueError(f"Motor no soportado: {engine} (usar 'loop', 'vectorized', 'grid' o 'indexed')")
+
+    # Solo se necesita el registro de operaciones
+    if enrich is None:
+        return trades_df, None
+
+    # Marcadores de entrada/salida por offset de fila (búsqueda binaria sobre 'date')
+    markers = build_trade_markers(df, trades_df)
+    if enrich == 'markers':
+        return trades_df, markers
+
+    # Enriquecer DataFrame original con datos de trading
+    df_with_trades = join_trade_markers(df, markers)
+
+    return trades_df, df_with_trades
+
+def _order_management_loop(df, day_index, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0):
+    """
+    Motor de referencia: recorre cada día minuto a minuto
+
+    Parameters:
+    df (DataFrame): Datos ordenados por fecha con columna date_only
+    day_index (DataFrame): Índice de sesiones de df
+    dow_filter, use_fixed_stop, fixed_stop_usd, trail, tp_days: Igual que order_management
+
+    Returns:
+    DataFrame: Registro de operaciones
+    """
     # Agrupar por día para obtener niveles únicos
     daily_levels = df.groupby('date_only').agg({
         'long_level': 'first',
@@ -37,12 +112,16 @@ def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800,
     for col in ['long_level', 'short_level', 'long_stop', 'short_stop']:
         daily_levels[col] = pd.to_numeric(daily_levels[col], errors='coerce')
 
+    # Posición de cada día dentro del índice de sesiones
+    day_positions = {date_only: pos for pos, date_only in enumerate(day_index['date_only'])}
+
     trades = []
     active_trade = None  # Mantener trade activo a través de múltiples días
 
     # Procesar cada día
     for _, day_levels in daily_levels.iterrows():
-        day_data = df[df['date_only'] == day_levels['date_only']].copy()
+        # Slice posicional del día (sin máscara sobre toda la columna ni copia)
+        day_data = get_day_data(df, day_index, day_positions[day_levels['date_only']])
 
         if len(day_data) < 2:
             continue
@@ -66,8 +145,6 @@ def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800,
             if day_dow != dow_mapping.get(dow_filter):
                 continue
 
-        day_data = day_data.sort_values('date').reset_index(drop=True)
-
         long_level = day_levels['long_level']
         short_level = day_levels['short_level']
         long_stop = day_levels['long_stop']
@@ -222,7 +299,7 @@ def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800,
     # Si queda un trade activo al final del período, cerrarlo
     if active_trade is not None:
         # Buscar el último precio disponible
-        last_day_data = df[df['date_only'] == df['date_only'].max()]
+        last_day_data = get_day_data(df, day_index, len(day_index) - 1)
         if len(last_day_data) > 0:
             last_price = last_day_data.iloc[-1]['close']
             last_time = last_day_data.iloc[-1]['date']
@@ -241,7 +318,7 @@ def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800,
             # Registrar trade final
             trade_record = {
                 'date': active_trade['date_only'],
-                'dow': df[df['date_only'] == active_trade['date_only']].iloc[0]['dow'],
+                'dow': get_day_data(df, day_index, day_positions[active_trade['date_only']]).iloc[0]['dow'],
                 'trade_type': active_trade['trade_type'],
                 'entry_time': active_trade['entry_time'],
                 'entry_price': active_trade['entry_price'],
@@ -258,34 +335,10 @@ def order_management(df, dow_filter=0, use_fixed_stop=False, fixed_stop_usd=800,
             trades.append(trade_record)
 
     # Convertir a DataFrame
-    trades_df = pd.DataFrame(trades)
-
-    # Enriquecer DataFrame original con datos de trading
-    df_with_trades = df.copy()
-
-    # Inicializar columnas con el mismo tipo de datetime que 'date'
-    df_with_trades['entry_time'] = pd.Series(dtype='datetime64[ns, UTC]')
-    df_with_trades['entry_price'] = np.nan
-    df_with_trades['exit_time'] = pd.Series(dtype='datetime64[ns, UTC]')
-    df_with_trades['exit_price'] = np.nan
-    df_with_trades['trade_type'] = ''
-
-    # Añadir datos de trading al DataFrame original
-    for _, trade in trades_df.iterrows():
-        # Marcar entrada
-        entry_mask = df_with_trades['date'] == trade['entry_time']
-        df_with_trades.loc[entry_mask, 'entry_time'] = trade['entry_time']
-        df_with_trades.loc[entry_mask, 'entry_price'] = trade['entry_price']
-        df_with_trades.loc[entry_mask, 'trade_type'] = trade['trade_type']
-
-        # Marcar salida
-        exit_mask = df_with_trades['date'] == trade['exit_time']
-        df_with_trades.loc[exit_mask, 'exit_time'] = trade['exit_time']
-        df_with_trades.loc[exit_mask, 'exit_price'] = trade['exit_price']
+    return pd.DataFrame(trades)
 
-    return trades_df, df_with_trades
-
-def save_trading_results(trades_df, period_start, period_end, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0):
+def save_trading_results(trades_df, period_start, period_end, use_fixed_stop=False, fixed_stop_usd=800, trail=12, tp_days=0,
+                         metrics=None):
     """
     Guarda los resultados de trading en CSV
 
@@ -297,6 +350,7 @@ def save_trading_results(trades_df, period_start, period_end, use_fixed_stop=Fal
     fixed_stop_usd (float): Valor del stop fijo en USD
     trail (float): Puntos para activar trailing stop
     tp_days (int): Días para mantener la posición
+    metrics (dict): Acumuladores del motor (opcional): el resumen se lee de ellos sin recalcular
     """
     if len(trades_df) == 0:
         print("No hay trades para guardar")
@@ -328,12 +382,20 @@ def save_trading_results(trades_df, period_start, period_end, use_fixed_stop=Fal
     # Guardar CSV
     trades_df.to_csv(full_path, index=False)
 
-    # Estadísticas resumen
-    total_trades = len(trades_df)
-    profitable_trades = len(trades_df[trades_df['profit_label'] == 'PROFIT'])
-    total_profit_usd = trades_df['profit_usd'].sum()
-    win_rate = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
-    avg_time_in_market = trades_df['time_in_market_minutes'].mean()
+    # Estadísticas resumen (de los acumuladores del motor si están disponibles)
+    if metrics is not None:
+        stats = online_metrics_summary(metrics)
+        total_trades = stats['total_trades']
+        profitable_trades = stats['winning_trades']
+        total_profit_usd = stats['total_profit_usd']
+        win_rate = stats['win_rate']
+        avg_time_in_market = stats['avg_time_in_market']
+    else:
+        total_trades = len(trades_df)
+        profitable_trades = len(trades_df[trades_df['profit_label'] == 'PROFIT'])
+        total_profit_usd = trades_df['profit_usd'].sum()
+        win_rate = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
+        avg_time_in_market = trades_df['time_in_market_minutes'].mean()
 
     print(f"\n=== RESULTADOS DE TRADING ===")
     print(f"Archivo guardado: {full_path}")
@@ -0,0 +1,299 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import time
+import itertools
+from functools import partial
+from multiprocessing import Pool
+
+# Agregar el directorio padre al path para importar utils y quant_stat
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from utils.date_utils import add_day_of_week
+from utils.minute_cache import load_minute_range
+from quant_stat.range_calculations import range_indicator_matrices
+from quant_stat.get_levels import level_matrices
+from create_2022_subset import build_compact_minutes
+from breakout_engine import build_compact_arrays, get_entry_candidates, run_exit_stage, LEVEL_COLUMNS
+from shared_bars import publish_arrays, attach_arrays, release_arrays
+from mark_to_market import build_daily_equity, mark_to_market_stats
+from online_metrics import create_online_metrics, online_metrics_summary, should_stop
+
+# =============================================================================
+# CONFIGURACIÓN DEL BARRIDO DE PARÁMETROS
+# =============================================================================
+start_date = '2017-09-02'
+end_date = '2025-04-28'
+dow_filter = 0
+
+# Parámetros de niveles (se recalculan los niveles diarios por cada combinación)
+EXPANSION_PCTS = [0.3, 0.4, 0.5]
+STOP_MULTIPLIERS = [0.5, 1.0, 2.5]
+LOOKBACKS = [3, 5, 10]
+
+# Parámetros de salida (se ejecutan en paralelo sobre los mismos niveles)
+TRAILS = [10, 15, 20]
+TP_DAYS = [0, 1, 2]
+STOP_CONFIGS = [(False, 0), (True, 500), (True, 800)]  # (use_fixed_stop, fixed_stop_usd)
+
+# Parada anticipada: abandonar una combinación cuando su drawdown supera este importe (None = sin parada)
+MAX_DRAWDOWN_STOP = None
+
+# Métricas de cada combinación (claves de online_metrics_summary)
+SUMMARY_COLUMNS = ['total_trades', 'win_rate', 'total_profit_usd', 'avg_trade_profit', 'profit_factor',
+                   'max_winning_streak', 'max_losing_streak', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio',
+                   'max_drawdown', 'max_drawdown_duration']
+
+# Estado de cada proceso worker (vistas sobre la memoria compartida, válidas para todas sus tareas)
+_WORKER_ARRAYS = None
+_WORKER_BLOCKS = None
+
+def load_sweep_data(start_date, end_date):
+    """
+    Carga una sola vez los minutos del período y las velas diarias de todo el histórico
+
+    Las velas diarias se calculan sobre el histórico completo (incluyendo domingos)
+    para que los niveles coincidan con los de main.py, que usa todo el warm-up disponible.
+
+    Parameters:
+    start_date (str): Fecha inicial 'YYYY-MM-DD'
+    end_date (str): Fecha final 'YYYY-MM-DD'
+
+    Returns:
+    tuple: (df_compact, df_days, df_daily_bars) - Minutos compactos del período sin domingos,
+           su tabla por día (build_compact_minutes, sin niveles) y velas diarias
+    """
+    data_path = os.path.join(parent_dir, 'data', 'es_1min_data.csv')
+    df = load_minute_range(data_path)
+
+    # Normalizar columnas igual que main.py
+    df.columns = [col.strip().lower() for col in df.columns]
+    df = df.rename(columns={'volumen': 'volume'})
+
+    # Velas diarias (misma agregación que main.py)
+    df_daily_bars = df.resample('1D').agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum'
+    }).dropna().reset_index()
+
+    # Minutos del período, sin domingos (igual que create_subset)
+    df_minutes = df.loc[start_date:end_date].reset_index()
+    df_minutes = add_day_of_week(df_minutes, 'date')
+    df_minutes = df_minutes[df_minutes['dow'] != 'sunday']
+
+    # Representación compacta: los niveles de cada set se añaden por día en los workers
+    df_compact, df_days = build_compact_minutes(df_minutes)
+
+    print(f"Minutos cargados: {df_compact.shape} | Días: {len(df_days)} | Velas diarias: {df_daily_bars.shape}")
+
+    return df_compact, df_days, df_daily_bars
+
+def compute_level_matrices(df_daily_bars, day_dates, expansion_pcts, stop_multipliers, lookbacks):
+    """
+    Niveles diarios de todas las combinaciones de (expansion_pct, stop_multiplier, lookback) en una
+    llamada, alineados con los días del subset
+
+    Parameters:
+    df_daily_bars (DataFrame): Velas diarias con columnas date/open/high/low/close
+    day_dates (array): Fechas (datetime.date) de los días del subset, en orden
+    expansion_pcts (list): Valores de expansion_pct
+    stop_multipliers (list): Valores de stop_multiplier
+    lookbacks (list): Valores de range_lookback
+
+    Returns:
+    tuple: (params, levels) - DataFrame con una fila por combinación (orden de itertools.product)
+           y matrices días x combinaciones por nivel, alineadas con day_dates
+    """
+    ranges = range_indicator_matrices(df_daily_bars, expansion_pcts, stop_multipliers, lookbacks)
+    levels = level_matrices(df_daily_bars, ranges['range_enter'], ranges['range_stop'])
+
+    # Equivalente al merge left por date_only de create_subset (sin domingos)
+    df_days = add_day_of_week(df_daily_bars[['date']], 'date')
+    keep = (df_days['dow'] != 'sunday').to_numpy()
+    daily_dates = pd.Index(df_days['date'].dt.date[keep])
+    positions = daily_dates.get_indexer(day_dates)
+    found = positions >= 0
+
+    aligned = {}
+    for col in LEVEL_COLUMNS:
+        matrix = np.full((len(day_dates), len(ranges['params'])), np.nan)
+        matrix[found] = levels[col][keep][positions[found]]
+        aligned[col] = matrix
+
+    return ranges['params'], aligned
+
+def _init_worker(handle):
+    """
+    Inicializador del pool: se conecta (sin copiar) a los arrays de minutos en memoria compartida
+    """
+    global _WORKER_ARRAYS, _WORKER_BLOCKS
+    _WORKER_ARRAYS, _WORKER_BLOCKS = attach_arrays(handle)
+
+def _run_level_set(task):
+    """
+    Ejecuta en un worker todas las combinaciones de salida de un bloque para un set de niveles
+
+    Las métricas se acumulan en el motor al cerrar cada trade (online_metrics), así que no
+    se construye trades_df ni se recorre el registro otra vez.
+    """
+    level_params, level_arrays, exit_grid, dow_filter, stop_rule = task
+
+    arrays = dict(_WORKER_ARRAYS)
+    arrays.update(level_arrays)
+
+    # Las entradas solo dependen de los niveles: la tabla se reutiliza entre bloques del mismo set
+    candidates = get_entry_candidates(arrays, dow_filter=dow_filter)
+
+    rows = []
+    for trail, tp_days, use_fixed_stop, fixed_stop_usd in exit_grid:
+        metrics = create_online_metrics()
+        trades = run_exit_stage(arrays, candidates, use_fixed_stop=use_fixed_stop,
+                                fixed_stop_usd=fixed_stop_usd, trail=trail, tp_days=tp_days,
+                                metrics=metrics, stop_rule=stop_rule)
+        stats = online_metrics_summary(metrics)
+
+        row = dict(level_params)
+        row.update({
+            'trail': trail,
+            'tp_days': tp_days,
+            'use_fixed_stop': use_fixed_stop,
+            'fixed_stop_usd': fixed_stop_usd
+        })
+        row.update({col: stats[col] for col in SUMMARY_COLUMNS if col in stats})
+        if stop_rule is not None:
+            row['stopped_early'] = stats['stopped_early']
+
+        # Riesgo abierto (intradía y overnight) que la equity por salidas no refleja
+        row.update(mark_to_market_stats(build_daily_equity(arrays, trades)))
+        rows.append(row)
+
+    return rows
+
+def run_parameter_sweep(start_date, end_date, expansion_pcts, stop_multipliers, lookbacks,
+                        trails, tp_days_list, stop_configs, dow_filter=0, processes=None, chunk_size=8,
+                        stop_rule=None):
+    """
+    Barrido de parámetros: niveles por (expansion_pct, stop_multiplier, lookback) y
+    ejecuciones en paralelo del motor vectorizado por (trail, tp_days, stop)
+
+    Parameters:
+    start_date (str): Fecha inicial 'YYYY-MM-DD'
+    end_date (str): Fecha final 'YYYY-MM-DD'
+    expansion_pcts (list): Valores de expansion_pct
+    stop_multipliers (list): Valores de stop_multiplier
+    lookbacks (list): Valores de range_lookback
+    trails (list): Valores de trail (puntos para break-even)
+    tp_days_list (list): Valores de tp_days
+    stop_configs (list): Tuplas (use_fixed_stop, fixed_stop_usd)
+    dow_filter (int): Filtro de día de la semana (0=sin filtro)
+    processes (int): Número de procesos (None = todos los cores)
+    chunk_size (int): Combinaciones de salida por tarea
+    stop_rule (callable): Regla de parada anticipada por combinación (opcional, debe poder
+                          enviarse a los workers, p.ej. partial(should_stop, max_drawdown_usd=...))
+
+    Returns:
+    DataFrame: Una fila por combinación con sus métricas principales
+    """
+    df_compact, df_days, df_daily_bars = load_sweep_data(start_date, end_date)
+
+    base_arrays = build_compact_arrays(df_compact, df_days)
+    day_dates = list(df_days['date_only'])
+
+    # Combinaciones de salida (stop fijo: solo los pares configurados)
+    exit_grid = [(trail, tp_days, use_fixed_stop, fixed_stop_usd)
+                 for trail, tp_days, (use_fixed_stop, fixed_stop_usd)
+                 in itertools.product(trails, tp_days_list, stop_configs)]
+    exit_chunks = [exit_grid[i:i + chunk_size] for i in range(0, len(exit_grid), chunk_size)]
+
+    # Los niveles de todos los sets se calculan de una vez en el proceso principal
+    level_params_df, level_matrix = compute_level_matrices(df_daily_bars, day_dates, expansion_pcts,
+                                                           stop_multipliers, lookbacks)
+    total = len(level_params_df) * len(exit_grid)
+    print(f"Barrido: {len(level_params_df)} sets de niveles x {len(exit_grid)} salidas = {total:,} combinaciones")
+
+    def tasks():
+        for k, (expansion_pct, stop_multiplier, lookback) in enumerate(level_params_df.itertuples(index=False)):
+            level_arrays = {col: np.ascontiguousarray(level_matrix[col][:, k]) for col in LEVEL_COLUMNS}
+            level_params = {
+                'expansion_pct': float(expansion_pct),
+                'stop_multiplier': float(stop_multiplier),
+                'lookback': int(lookback)
+            }
+            for chunk in exit_chunks:
+                yield level_params, level_arrays, chunk, dow_filter, stop_rule
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    # Publicar los arrays de minutos una sola vez: los workers solo reciben el handle
+    handle, blocks = publish_arrays(base_arrays)
+    del base_arrays
+
+    start_time = time.perf_counter()
+    rows = []
+    try:
+        with Pool(processes=processes, initializer=_init_worker, initargs=(handle,)) as pool:
+            for chunk_rows in pool.imap_unordered(_run_level_set, tasks()):
+                rows.extend(chunk_rows)
+                print(f"  {len(rows):,}/{total:,} combinaciones completadas", end='\r')
+    finally:
+        release_arrays(blocks)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\nBarrido completado en {elapsed:.1f}s con {processes} procesos")
+
+    results = pd.DataFrame(rows)
+    if 'total_profit_usd' in results.columns:
+        results = results.sort_values('total_profit_usd', ascending=False, na_position='last')
+
+    return results.reset_index(drop=True)
+
+def save_sweep_results(results, start_date, end_date):
+    """
+    Guarda la tabla de resultados del barrido en outputs/
+
+    Parameters:
+    results (DataFrame): Resultado de run_parameter_sweep
+    start_date (str): Fecha inicial
+    end_date (str): Fecha final
+
+    Returns:
+    str: Ruta del fichero guardado
+    """
+    outputs_dir = os.path.join(parent_dir, 'outputs')
+    os.makedirs(outputs_dir, exist_ok=True)
+
+    filename = f"sweep_results_{start_date.replace('-', '')}_{end_date.replace('-', '')}.csv"
+    full_path = os.path.join(outputs_dir, filename)
+    results.to_csv(full_path, index=False)
+
+    print(f"Resultados del barrido guardados en: {full_path}")
+
+    return full_path
+
+def main():
+    """
+    Ejecuta el barrido con la configuración del inicio del fichero
+    """
+    print("=== BARRIDO DE PARÁMETROS ===")
+    print(f"Período: {start_date} a {end_date}")
+
+    stop_rule = partial(should_stop, max_drawdown_usd=MAX_DRAWDOWN_STOP) if MAX_DRAWDOWN_STOP is not None else None
+
+    results = run_parameter_sweep(start_date, end_date, EXPANSION_PCTS, STOP_MULTIPLIERS, LOOKBACKS,
+                                  TRAILS, TP_DAYS, STOP_CONFIGS, dow_filter=dow_filter, stop_rule=stop_rule)
+
+    save_sweep_results(results, start_date, end_date)
+
+    print("\n=== TOP 10 COMBINACIONES ===")
+    print(results.head(10).to_string(index=False))
+
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
 import os
+import sys
 import webbrowser
 import pandas as pd
+import numpy as np
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 
-def plot_subset_chart(symbol, timeframe, df, suffix='subset'):
+# Agregar el directorio padre al path para importar utils
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from create_2022_subset import create_subset
+from day_index import build_day_index
+from session_grid import build_session_grid, grid_first_crossovers
+
+def plot_subset_chart(symbol, timeframe, df, suffix='subset', markers=None):
     """
     Plot chart for subset data
 
@@ -13,6 +23,8 @@ def plot_subset_chart(symbol, timeframe, df, suffix='subset'):
     timeframe (str): Timeframe
     df (DataFrame): Data to plot
     suffix (str): Suffix for filename
+    markers (DataFrame): Sparse trade markers from build_trade_markers (optional, used instead of
+                         the entry/exit columns of df, so the full df_with_trades is not needed)
     """
     html_path = f'charts/close_vol_chart_{symbol}_{timeframe}_{suffix}.html'
     os.makedirs(os.path.dirname(html_path), exist_ok=True)
@@ -95,47 +107,39 @@ def plot_subset_chart(symbol, timeframe, df, suffix='subset'):
         crossover_points = []
         crossunder_points = []
 
-        for _, row in daily_levels.iterrows():
-            # Filtrar datos del día específico
-            day_data = df[df['date_only'] == row['date_only']].copy()
-
-            if len(day_data) > 1 and not pd.isna(row['long_level']) and not pd.isna(row['short_level']):
-                day_data = day_data.sort_values('date')
-
-                # Convertir niveles a float
-                long_level = float(row['long_level'])
-                short_level = float(row['short_level'])
-
-                # Flags para controlar primer cruce del día
-                first_crossover_found = False
-                first_crossunder_found = False
-
-                # Detectar SOLO el primer crossover/crossunder del día
-                for i in range(1, len(day_data)):
-                    prev_close = day_data.iloc[i-1]['close']
-                    curr_close = day_data.iloc[i]['close']
-
-                    # Crossover verde: SOLO el primer cruce por encima de long_level
-                    if not first_crossover_found and prev_close <= long_level < curr_close:
-                        crossover_points.append({
-                            'date': day_data.iloc[i]['date'],
-                            'price': curr_close,
-                            'level': long_level
-                        })
-                        first_crossover_found = True
-
-                    # Crossunder rojo: SOLO el primer cruce por debajo de short_level
-                    if not first_crossunder_found and prev_close >= short_level > curr_close:
-                        crossunder_points.append({
-                            'date': day_data.iloc[i]['date'],
-                            'price': curr_close,
-                            'level': short_level
-                        })
-                        first_crossunder_found = True
-
-                    # Si ya encontramos ambos cruces, no necesitamos seguir buscando
-                    if first_crossover_found and first_crossunder_found:
-                        break
+        # Índice de sesiones (df ya está ordenado por fecha): mismo orden que daily_levels
+        day_index = build_day_index(df)
+
+        # Rejilla días x minutos: primer cruce de todos los días con una sola reducción
+        grid = build_session_grid({
+            'day_start': day_index['start'].to_numpy(),
+            'day_end': day_index['end'].to_numpy(),
+            'close': df['close'].to_numpy(dtype=float)
+        })
+        long_levels = daily_levels['long_level'].to_numpy(dtype=float)
+        short_levels = daily_levels['short_level'].to_numpy(dtype=float)
+        long_col, short_col = grid_first_crossovers(grid, long_levels, short_levels)
+
+        # Solo días con más de un minuto y ambos niveles definidos
+        usable = (grid['length'] > 1) & ~np.isnan(long_levels) & ~np.isnan(short_levels)
+        dates = df['date']
+        closes = df['close'].to_numpy()
+
+        for day in np.flatnonzero(usable & (long_col >= 0)):
+            row_pos = grid['row_index'][day, long_col[day]]
+            crossover_points.append({
+                'date': dates.iloc[row_pos],
+                'price': closes[row_pos],
+                'level': long_levels[day]
+            })
+
+        for day in np.flatnonzero(usable & (short_col >= 0)):
+            row_pos = grid['row_index'][day, short_col[day]]
+            crossunder_points.append({
+                'date': dates.iloc[row_pos],
+                'price': closes[row_pos],
+                'level': short_levels[day]
+            })
 
         # Añadir puntos verdes para crossovers (TAMAÑO 8)
         if crossover_points:
@@ -163,14 +167,17 @@ def plot_subset_chart(symbol, timeframe, df, suffix='subset'):
                 hovertemplate='First Short Crossunder<br>Price: %{y:.2f}<extra></extra>'
             ), row=1, col=1)
 
+    # Filas con datos de trading: tabla dispersa de marcadores o columnas de df_with_trades
+    trade_rows = markers if markers is not None else df
+
     # Añadir puntos de salida y líneas de conexión si tenemos datos de trading
-    if 'entry_time' in df.columns and 'exit_time' in df.columns:
+    if 'entry_time' in trade_rows.columns and 'exit_time' in trade_rows.columns:
         # Obtener datos de entrada y salida por separado
-        entry_data = df[df['entry_time'].notna()][
+        entry_data = trade_rows[trade_rows['entry_time'].notna()][
             ['entry_time', 'entry_price', 'trade_type']
         ].drop_duplicates()
 
-        exit_data = df[df['exit_time'].notna()][
+        exit_data = trade_rows[trade_rows['exit_time'].notna()][
             ['exit_time', 'exit_price']
         ].drop_duplicates()
 
@@ -220,7 +227,7 @@ def plot_subset_chart(symbol, timeframe, df, suffix='subset'):
         # Para las líneas de conexión, necesitamos reconstruir los pares entry/exit
         if len(entry_data) > 0 and len(exit_data) > 0:
             # Crear un DataFrame temporal para matchear entradas y salidas por tiempo
-            temp_df = df[['date', 'entry_time', 'entry_price', 'exit_time', 'exit_price', 'trade_type']].copy()
+            temp_df = trade_rows[['date', 'entry_time', 'entry_price', 'exit_time', 'exit_price', 'trade_type']].copy()
 
             # Buscar pares de entrada/salida válidos
             entry_times = temp_df[temp_df['entry_time'].notna()]['entry_time'].unique()
@@ -301,16 +308,8 @@ def plot_2022_data():
     """
     Función específica para plotear datos de 2022
     """
-    # Cargar datos de 2022 - usar ruta absoluta
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(current_dir)
-    data_path = os.path.join(parent_dir, 'data', 'es_1min_data_2022.csv')
-
-    print(f"Cargando datos desde: {data_path}")
-    df = pd.read_csv(data_path)
-
-    # Convertir columna date a datetime si no lo está
-    df['date'] = pd.to_datetime(df['date'])
+    # Subset de 2022 con niveles y sin domingos (caché de subsets / bar store)
+    df = create_subset('2022-01-01', '2022-12-31')
 
     print(f"Datos cargados: {df.shape}")
     print(f"Período: {df['date'].min()} a {df['date'].max()}")
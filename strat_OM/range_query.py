@@ -0,0 +1,158 @@
+import numpy as np
+
+def build_range_index(values, op='min', mask=None):
+    """
+    Índice de mínimos/máximos por bloques alineados de tamaño 2^k (árbol de segmentos en arrays)
+
+    Permite responder "primer minuto en [start, end) con precio <= X" (op='min') o
+    ">= X" (op='max') en tiempo logarítmico, sin recorrer el tramo minuto a minuto.
+    Memoria: ~2 veces el array (potencia de dos), frente a n·log(n) de una sparse table.
+
+    Parameters:
+    values (array): Precios por fila (close, high o low)
+    op (str): 'min' para consultas <= X, 'max' para consultas >= X
+    mask (array): Filas consultables (opcional); el resto nunca se devuelve
+
+    Returns:
+    dict: 'op', 'n', 'levels' (un array por nivel) y 'flat'/'offsets' para consultas en bloque
+    """
+    if op not in ('min', 'max'):
+        raise ValueError(f"Operación no soportada: {op} (usar 'min' o 'max')")
+
+    # Valor neutro: nunca cumple la condición (también para NaN y filas enmascaradas)
+    neutral = np.inf if op == 'min' else -np.inf
+    reduce = np.minimum if op == 'min' else np.maximum
+
+    values = np.array(values, dtype=np.float64)
+    n = len(values)
+    values[np.isnan(values)] = neutral
+    if mask is not None:
+        values[~np.asarray(mask, dtype=bool)] = neutral
+
+    size = 1
+    while size < n:
+        size *= 2
+
+    base = np.full(size, neutral)
+    base[:n] = values
+
+    levels = [base]
+    while len(levels[-1]) > 1:
+        previous = levels[-1]
+        levels.append(reduce(previous[0::2], previous[1::2]))
+
+    offsets = np.concatenate(([0], np.cumsum([len(level) for level in levels])[:-1])).astype(np.int64)
+
+    return {
+        'op': op,
+        'n': n,
+        'levels': levels,
+        'flat': np.concatenate(levels),
+        'offsets': offsets
+    }
+
+def _hits(op, value, threshold):
+    return value <= threshold if op == 'min' else value >= threshold
+
+def first_touch(index, start, end, threshold):
+    """
+    Primera fila en [start, end) cuyo valor cumple <= threshold (índice 'min') o >= threshold ('max')
+
+    Parameters:
+    index (dict): Resultado de build_range_index
+    start (int): Primera fila (inclusive)
+    end (int): Última fila (exclusive)
+    threshold (float): Nivel de precio
+
+    Returns:
+    int: Fila encontrada o -1 si ninguna cumple
+    """
+    op = index['op']
+    levels = index['levels']
+    end = min(end, index['n'])
+    position = start
+    k = 0
+
+    if position >= end:
+        return -1
+
+    while True:
+        block = 1 << k
+        if position + block <= end:
+            if _hits(op, levels[k][position >> k], threshold):
+                # El bloque contiene la fila: bajar a su mitad izquierda
+                if k == 0:
+                    return position
+                k -= 1
+                continue
+
+            # Bloque sin coincidencias: saltarlo entero y subir mientras quepan bloques mayores
+            position += block
+            if position >= end:
+                return -1
+            while k + 1 < len(levels) and (position & ((2 << k) - 1)) == 0 and position + (2 << k) <= end:
+                k += 1
+        else:
+            k -= 1
+
+def first_touch_many(index, starts, ends, thresholds):
+    """
+    Versión en bloque de first_touch: resuelve muchas consultas a la vez con operaciones NumPy
+
+    Parameters:
+    index (dict): Resultado de build_range_index
+    starts (array): Primera fila de cada consulta (inclusive)
+    ends (array): Última fila de cada consulta (exclusive)
+    thresholds (array): Nivel de precio de cada consulta
+
+    Returns:
+    ndarray: Fila encontrada por consulta (-1 si ninguna cumple)
+    """
+    op = index['op']
+    flat = index['flat']
+    offsets = index['offsets']
+    n_levels = len(index['levels'])
+
+    position = np.array(starts, dtype=np.int64)
+    end = np.minimum(np.asarray(ends, dtype=np.int64), index['n'])
+    threshold = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), position.shape)
+    level = np.zeros(len(position), dtype=np.int64)
+    result = np.full(len(position), -1, dtype=np.int64)
+
+    active = np.flatnonzero(position < end)
+    while len(active) > 0:
+        p, k, e = position[active], level[active], end[active]
+        block = np.left_shift(1, k)
+        fits = p + block <= e
+        hit = fits & _hits(op, flat[offsets[k] + np.right_shift(p, k)], threshold[active])
+
+        found = hit & (k == 0)
+        result[active[found]] = p[found]
+
+        # Bajar de nivel: bloque con coincidencia (k > 0) o bloque que no cabe
+        descend = (hit & (k > 0)) | ~fits
+        level[active[descend]] -= 1
+
+        # Saltar bloques sin coincidencias
+        skip = fits & ~hit
+        position[active[skip]] += block[skip]
+
+        finished = found | (skip & (position[active] >= e))
+        climbing = active[skip & ~finished]
+        active = active[~finished]
+
+        # Subir de nivel mientras la posición esté alineada y el bloque mayor quepa
+        while len(climbing) > 0:
+            p, k = position[climbing], level[climbing]
+            can_climb = (k + 1 < n_levels) & ((p & (np.left_shift(2, k) - 1)) == 0) & (p + np.left_shift(2, k) <= end[climbing])
+            climbing = climbing[can_climb]
+            level[climbing] += 1
+
+    return result
+
+if __name__ == "__main__":
+    print("Range query module loaded successfully")
+    print("Available functions:")
+    print("- build_range_index(values, op='min', mask=None)")
+    print("- first_touch(index, start, end, threshold)")
+    print("- first_touch_many(index, starts, ends, thresholds)")
@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+
+def _as_matrix(values, dtype=np.float64):
+    """
+    Vector (un run) o matriz (runs x trades) como matriz 2-D
+    """
+    return np.atleast_2d(np.asarray(values, dtype=dtype))
+
+def _window_starts(valid, window, times):
+    """
+    Primer trade de la ventana que termina en cada trade
+
+    Con window entero la ventana son los últimos 'window' trades; con una ventana de
+    calendario ('365D', Timedelta) son los trades con exit_time en (t - window, t],
+    como rolling(window) de pandas.
+    """
+    n_runs, n_trades = valid.shape
+    positions = np.broadcast_to(np.arange(n_trades), (n_runs, n_trades))
+
+    if times is None:
+        return np.maximum(positions - (window - 1), 0)
+
+    span = pd.Timedelta(window).value
+    if span <= 0:
+        raise ValueError(f"La ventana de calendario debe ser positiva: {window}")
+
+    # El relleno (NaT) repite el último tiempo válido para mantener cada fila ordenada
+    time_ns = _as_matrix(times, dtype='datetime64[ns]').view(np.int64)
+    time_ns = np.maximum.accumulate(time_ns, axis=1)
+
+    starts = np.empty((n_runs, n_trades), dtype=np.int64)
+    for run in range(n_runs):
+        starts[run] = np.searchsorted(time_ns[run], time_ns[run] - span, side='right')
+
+    # Filas sin trades (todo NaT): la ventana nunca empieza después de su propio trade
+    return np.minimum(starts, positions)
+
+def _window_sum(values, starts):
+    """
+    Suma de cada ventana [start, i] con sumas acumuladas (O(n) por run)
+    """
+    totals = np.concatenate((np.zeros((len(values), 1)), np.cumsum(values, axis=1)), axis=1)
+    ends = np.arange(1, values.shape[1] + 1)
+    return totals[:, ends] - np.take_along_axis(totals, starts, axis=1)
+
+def _window_variance(count, centered_sum, centered_squares, scale):
+    """
+    Varianza muestral (ddof=1) a partir de las sumas de la ventana
+
+    Las diferencias de sumas acumuladas dejan residuos de redondeo: por debajo de la
+    tolerancia (relativa a la escala del run) la varianza se considera nula.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (centered_squares - centered_sum ** 2 / count) / (count - 1)
+    variance = np.where(count > 1, variance, 0.0)
+    return np.where(variance > 1e-10 * scale, variance, 0.0)
+
+def _window_max(values, starts, ends):
+    """
+    Máximo de values[run, start:end + 1] por consulta (sparse table por potencias de dos)
+    """
+    tables = [values]
+    width = 1
+    while 2 * width <= values.shape[1]:
+        previous = tables[-1]
+        tables.append(np.maximum(previous[:, :-width], previous[:, width:]))
+        width *= 2
+
+    length = ends - starts + 1
+    level = np.floor(np.log2(length)).astype(np.int64)
+    result = np.empty(starts.shape)
+    for k, table in enumerate(tables):
+        selected = level == k
+        if not selected.any():
+            continue
+        runs = np.broadcast_to(np.arange(len(values))[:, None], starts.shape)[selected]
+        left = table[runs, starts[selected]]
+        right = table[runs, ends[selected] - (1 << k) + 1]
+        result[selected] = np.maximum(left, right)
+    return result
+
+def stack_trade_runs(trades_list):
+    """
+    Apila varios registros de trades (p.ej. runs de un barrido) en matrices con relleno
+
+    Parameters:
+    trades_list (list): trades_df de cada run (con exit_time y profit_usd)
+
+    Returns:
+    tuple: (pnl, times) - matrices runs x trades ordenadas por salida, con NaN/NaT al final;
+           válidas para rolling_trade_metrics y calculate_batch_trade_stats
+    """
+    n_trades = max([len(trades_df) for trades_df in trades_list], default=0)
+    pnl = np.full((len(trades_list), n_trades), np.nan)
+    times = np.full((len(trades_list), n_trades), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    for run, trades_df in enumerate(trades_list):
+        if len(trades_df) == 0:
+            continue
+        df_sorted = trades_df.sort_values('exit_time')
+        pnl[run, :len(df_sorted)] = df_sorted['profit_usd'].to_numpy(dtype=np.float64)
+        times[run, :len(df_sorted)] = pd.to_datetime(df_sorted['exit_time'], utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+    return pnl, times
+
+def rolling_trade_metrics(pnl, window, times=None, min_periods=None):
+    """
+    Métricas móviles por trade para un run o una pila de runs de un barrido
+
+    Las sumas de cada ventana (P&L, cuadrados, ganancias, pérdidas) salen de sumas
+    acumuladas, así que el coste es O(n) por run sea cual sea la ventana; el drawdown
+    usa una sparse table sobre la equity. Las definiciones son las de summary.py
+    (PROFIT = P&L > 0, Sortino con la desviación de los trades negativos).
+
+    Parameters:
+    pnl (array): profit_usd por trade en orden de salida; matriz runs x trades con NaN de relleno al final
+    window (int o str): Número de trades o ventana de calendario sobre times ('365D', Timedelta)
+    times (array): exit_time de cada trade (misma forma que pnl), necesario con ventana de calendario
+    min_periods (int): Trades mínimos en la ventana (default window con ventana por trades, 1 por calendario)
+
+    Returns:
+    dict: Matrices (o vectores si pnl es 1-D) con trades, win_rate, expectancy, sharpe_ratio,
+          sortino_ratio, profit_factor y drawdown (equity frente a su máximo dentro de la
+          ventana); NaN en el relleno y antes de min_periods
+    """
+    single_run = np.ndim(pnl) == 1
+    values = _as_matrix(pnl)
+    valid = ~np.isnan(values)
+
+    if isinstance(window, (int, np.integer)):
+        if window < 1:
+            raise ValueError(f"La ventana debe ser >= 1 trade: {window}")
+        if times is not None:
+            raise ValueError("Con una ventana por número de trades no se usa times")
+        default_min_periods = window
+    else:
+        if times is None:
+            raise ValueError("Una ventana de calendario necesita los exit_time de los trades (times)")
+        default_min_periods = 1
+    min_periods = default_min_periods if min_periods is None else min_periods
+
+    starts = _window_starts(valid, window, times)
+    filled = np.where(valid, values, 0.0)
+
+    # Centrar por la media del run reduce el error de las sumas de cuadrados
+    counts_per_run = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+    center = filled.sum(axis=1, keepdims=True) / counts_per_run
+    centered = np.where(valid, values - center, 0.0)
+    scale = (centered ** 2).sum(axis=1, keepdims=True)
+
+    wins = valid & (filled > 0)
+    negatives = valid & (filled < 0)
+
+    count = _window_sum(valid.astype(np.float64), starts)
+    total = _window_sum(filled, starts)
+    win_count = _window_sum(wins.astype(np.float64), starts)
+    gross_profit = _window_sum(np.where(wins, filled, 0.0), starts)
+    gross_loss = -_window_sum(np.where(valid & ~wins, filled, 0.0), starts)
+
+    variance = _window_variance(count, _window_sum(centered, starts), _window_sum(centered ** 2, starts), scale)
+    negative_count = _window_sum(negatives.astype(np.float64), starts)
+    downside_variance = _window_variance(negative_count,
+                                         _window_sum(np.where(negatives, centered, 0.0), starts),
+                                         _window_sum(np.where(negatives, centered ** 2, 0.0), starts), scale)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expectancy = total / count
+        volatility = np.sqrt(variance)
+        downside_volatility = np.sqrt(downside_variance)
+        sharpe_ratio = np.where(volatility > 0, expectancy / volatility, 0.0)
+        sortino_ratio = np.where(downside_volatility > 0, expectancy / downside_volatility, 0.0)
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+        win_rate = win_count / count * 100
+
+    # Drawdown: equity del trade frente al máximo de la equity desde el inicio de la ventana
+    equity = np.concatenate((np.zeros((len(values), 1)), np.cumsum(filled, axis=1)), axis=1)
+    ends = np.broadcast_to(np.arange(1, values.shape[1] + 1), starts.shape)
+    drawdown = equity[:, 1:] - _window_max(equity, starts, ends)
+
+    metrics = {
+        'trades': count,
+        'win_rate': win_rate,
+        'expectancy': expectancy,
+        'sharpe_ratio': sharpe_ratio,
+        'sortino_ratio': sortino_ratio,
+        'profit_factor': profit_factor,
+        'drawdown': drawdown
+    }
+
+    defined = valid & (count >= max(min_periods, 1))
+    for name, matrix in metrics.items():
+        matrix = np.where(defined, matrix, np.nan)
+        metrics[name] = matrix[0] if single_run else matrix
+
+    return metrics
+
+def rolling_metrics_frame(trades_df, window, min_periods=None):
+    """
+    Métricas móviles de un trades_df (ordenado por salida) como DataFrame
+
+    Parameters:
+    trades_df (DataFrame): Registro de operaciones con exit_time y profit_usd
+    window (int o str): Número de trades o ventana de calendario ('365D')
+    min_periods (int): Trades mínimos en la ventana (ver rolling_trade_metrics)
+
+    Returns:
+    DataFrame: exit_time y una columna por métrica, una fila por trade
+    """
+    df_sorted = trades_df.sort_values('exit_time')
+    times = None
+    if not isinstance(window, (int, np.integer)):
+        times = pd.to_datetime(df_sorted['exit_time'], utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+    metrics = rolling_trade_metrics(df_sorted['profit_usd'].to_numpy(dtype=np.float64), window,
+                                    times=times, min_periods=min_periods)
+
+    result = pd.DataFrame(metrics, index=df_sorted.index)
+    result.insert(0, 'exit_time', df_sorted['exit_time'])
+    return result.reset_index(drop=True)
+
+if __name__ == "__main__":
+    print("Rolling metrics module loaded successfully")
+    print("Available functions:")
+    print("- stack_trade_runs(trades_list)")
+    print("- rolling_trade_metrics(pnl, window, times=None, min_periods=None)")
+    print("- rolling_metrics_frame(trades_df, window, min_periods=None)")
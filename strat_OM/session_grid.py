@@ -0,0 +1,134 @@
+import numpy as np
+
+def build_session_grid(arrays, columns=('close',)):
+    """
+    Reorganiza columnas de minutos en una rejilla 2-D (días x minutos de la sesión)
+
+    La fila d contiene los minutos [day_start[d], day_end[d]) en orden; el resto de
+    la fila se rellena con NaN y queda marcado como no válido en 'valid'. Con esta
+    forma, primer cruce, extremos acumulados o valor de fin de día son reducciones
+    sobre el eje 1 para todos los días a la vez.
+
+    Parameters:
+    arrays (dict): Arrays con day_start/day_end y las columnas por fila (p.ej. build_breakout_arrays)
+    columns (tuple): Columnas a incluir en la rejilla
+
+    Returns:
+    dict: 'length' (minutos por día), 'valid' (máscara), 'row_index' (fila original o -1)
+          y una rejilla float64 por columna
+    """
+    day_start = np.asarray(arrays['day_start'], dtype=np.int64)
+    day_end = np.asarray(arrays['day_end'], dtype=np.int64)
+    length = day_end - day_start
+    n_days = len(length)
+    width = int(length.max()) if n_days > 0 else 0
+
+    # Posición (día, columna) de cada fila
+    day_id = np.repeat(np.arange(n_days), length)
+    # Sin días (subset vacío) todas las rejillas quedan con forma (0, 0)
+    offsets = (np.cumsum(length) - length).astype(np.int64)
+    col_id = np.arange(int(length.sum()), dtype=np.int64) - np.repeat(offsets, length)
+    rows = day_start[day_id] + col_id
+
+    valid = np.zeros((n_days, width), dtype=bool)
+    valid[day_id, col_id] = True
+
+    row_index = np.full((n_days, width), -1, dtype=np.int64)
+    row_index[day_id, col_id] = rows
+
+    grid = {'length': length, 'valid': valid, 'row_index': row_index}
+    for col in columns:
+        values = np.full((n_days, width), np.nan, dtype=np.float64)
+        values[day_id, col_id] = np.asarray(arrays[col], dtype=np.float64)[rows]
+        grid[col] = values
+
+    return grid
+
+def first_true_per_day(mask, from_col=None):
+    """
+    Primera columna True de cada fila de la rejilla
+
+    Parameters:
+    mask (ndarray): Máscara booleana días x minutos
+    from_col (ndarray): Columna mínima por día (opcional, ignora las anteriores)
+
+    Returns:
+    ndarray: Columna del primer True por día (-1 si no hay ninguno)
+    """
+    if from_col is not None:
+        cols = np.arange(mask.shape[1])
+        mask = mask & (cols[np.newaxis, :] >= np.asarray(from_col)[:, np.newaxis])
+
+    if mask.shape[1] == 0:
+        return np.full(mask.shape[0], -1, dtype=np.int64)
+
+    first = np.argmax(mask, axis=1).astype(np.int64)
+    first[~mask.any(axis=1)] = -1
+
+    return first
+
+def running_max(grid_values):
+    """
+    Máximo acumulado por día a lo largo de la sesión (ignora NaN)
+    """
+    return np.fmax.accumulate(grid_values, axis=1)
+
+def running_min(grid_values):
+    """
+    Mínimo acumulado por día a lo largo de la sesión (ignora NaN)
+    """
+    return np.fmin.accumulate(grid_values, axis=1)
+
+def end_of_day(grid_values, length):
+    """
+    Último valor de cada día (NaN para días sin minutos)
+
+    Parameters:
+    grid_values (ndarray): Rejilla días x minutos
+    length (ndarray): Minutos por día
+
+    Returns:
+    ndarray: Valor del último minuto de cada día
+    """
+    result = np.full(len(length), np.nan)
+    has_rows = length > 0
+    result[has_rows] = grid_values[np.flatnonzero(has_rows), length[has_rows] - 1]
+
+    return result
+
+def grid_first_crossovers(grid, long_level, short_level):
+    """
+    Primer crossover por encima de long_level y primer crossunder de short_level de cada día
+
+    Misma condición que el bucle minuto a minuto (desde el segundo minuto del día):
+    prev_close <= long_level < close y prev_close >= short_level > close.
+
+    Parameters:
+    grid (dict): Resultado de build_session_grid con la columna close
+    long_level (ndarray): Nivel long por día
+    short_level (ndarray): Nivel short por día
+
+    Returns:
+    tuple: (long_col, short_col) - columna del primer cruce por día (-1 si no hay)
+    """
+    close = grid['close']
+    prev_close = np.full_like(close, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+
+    long_level = np.asarray(long_level, dtype=np.float64)[:, np.newaxis]
+    short_level = np.asarray(short_level, dtype=np.float64)[:, np.newaxis]
+
+    long_cross = (prev_close <= long_level) & (long_level < close)
+    short_cross = (prev_close >= short_level) & (short_level > close)
+
+    return first_true_per_day(long_cross), first_true_per_day(short_cross)
+
+if __name__ == "__main__":
+    print("Session grid module loaded successfully")
+    print("Available functions:")
+    print("- build_session_grid(arrays, columns=('close',))")
+    print("- first_true_per_day(mask, from_col=None)")
+    print("- running_max(grid_values)")
+    print("- running_min(grid_values)")
+    print("- end_of_day(grid_values, length)")
+    print("- grid_first_crossovers(grid, long_level, short_level)")
@@ -0,0 +1,90 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+def publish_arrays(arrays):
+    """
+    Publica un dict de arrays NumPy en memoria compartida (una copia, una sola vez)
+
+    Los arrays de tipo object (p.ej. nombres de dow) no se pueden compartir y se
+    devuelven tal cual dentro del handle (son pequeños: uno por día).
+
+    Parameters:
+    arrays (dict): Arrays a publicar (date_ns, open, high, low, close, volume, niveles, ...)
+
+    Returns:
+    tuple: (handle, blocks) - handle serializable para los workers y bloques SharedMemory
+           que el proceso principal debe mantener vivos y liberar con release_arrays
+    """
+    handle = {}
+    blocks = []
+
+    for name, values in arrays.items():
+        values = np.asarray(values)
+
+        if values.dtype == object:
+            handle[name] = {'inline': values}
+            continue
+
+        # SharedMemory no admite tamaño 0
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+        shared[...] = values
+        blocks.append(block)
+
+        handle[name] = {
+            'shm_name': block.name,
+            'shape': values.shape,
+            'dtype': values.dtype.str
+        }
+
+    return handle, blocks
+
+def attach_arrays(handle):
+    """
+    Se conecta desde un worker a los arrays publicados, en modo solo lectura y sin copiar
+
+    Parameters:
+    handle (dict): Handle devuelto por publish_arrays
+
+    Returns:
+    tuple: (arrays, blocks) - dict de vistas de solo lectura y bloques SharedMemory abiertos
+           (hay que mantener blocks vivo mientras se usen las vistas)
+    """
+    arrays = {}
+    blocks = []
+
+    for name, spec in handle.items():
+        if 'inline' in spec:
+            arrays[name] = spec['inline']
+            continue
+
+        # track=False (Python >= 3.13): el worker no es propietario del bloque.
+        # En versiones anteriores los workers del pool comparten el resource_tracker del padre.
+        try:
+            block = shared_memory.SharedMemory(name=spec['shm_name'], track=False)
+        except TypeError:
+            block = shared_memory.SharedMemory(name=spec['shm_name'])
+        view = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=block.buf)
+        view.flags.writeable = False
+        blocks.append(block)
+        arrays[name] = view
+
+    return arrays, blocks
+
+def release_arrays(blocks):
+    """
+    Cierra y elimina los bloques de memoria compartida creados por publish_arrays
+
+    Parameters:
+    blocks (list): Bloques devueltos por publish_arrays
+    """
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+if __name__ == "__main__":
+    print("Shared bars module loaded successfully")
+    print("Available functions:")
+    print("- publish_arrays(arrays)")
+    print("- attach_arrays(handle)")
+    print("- release_arrays(blocks)")
@@ -4,8 +4,11 @@ import plotly.graph_objs as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import os
+import glob
 import webbrowser
 from datetime import datetime
+from multiprocessing import Pool
+from rolling_metrics import rolling_metrics_frame
 
 # ============================================================
 # CONFIGURACIÓN: Especificar archivo a analizar (o None para el más reciente)
@@ -15,13 +18,18 @@ from datetime import datetime
 #target_filename = 'tracking_record_20170902_20250428_fix_stop_500_trail_15_tp_2d.csv'  # Cambiar por nombre específico: 'tracking_record_20200815_20230313.csv'
 target_filename = 'tracking_record_20170902_20250428_range_stop_trail_1500_tp_0d.csv'  # Cambiar por nombre específico: 'tracking_record_20200815_20230313.csv'
 
+# Modo batch: analiza todos los outputs/tracking_record_*.csv sin gráficos y genera un leaderboard
+batch_mode = False
+leaderboard_sort_by = 'total_profit_usd'  # Columna por la que se ordena el leaderboard
 
-def load_tracking_data(filename=None):
+
+def load_tracking_data(filename=None, verbose=True):
     """
     Carga los datos del tracking record
 
     Parameters:
     filename (str): Nombre del archivo de tracking (opcional)
+    verbose (bool): Imprimir la ruta del archivo cargado
 
     Returns:
     DataFrame: Datos de trading cargados
@@ -45,7 +53,8 @@ def load_tracking_data(filename=None):
     outputs_dir = os.path.join(parent_dir, 'outputs')
     file_path = os.path.join(outputs_dir, filename)
 
-    print(f"Cargando datos desde: {file_path}")
+    if verbose:
+        print(f"Cargando datos desde: {file_path}")
 
     df = pd.read_csv(file_path)
     df['entry_time'] = pd.to_datetime(df['entry_time'])
@@ -117,6 +126,31 @@ def calculate_basic_stats(df):
         'max_losing_streak': max_losing_streak
     }
 
+def max_run_lengths(flags):
+    """
+    Longitud de la racha más larga de valores True en cada fila (run-length encoding)
+
+    Los inicios y finales de cada racha salen de np.diff sobre la matriz con una
+    columna False a cada lado, sin recorrer los trades en Python.
+
+    Parameters:
+    flags (array): Matriz booleana (sets x trades) o vector de un solo set
+
+    Returns:
+    ndarray: Racha máxima por fila (0 si no hay ningún True)
+    """
+    flags = np.atleast_2d(np.asarray(flags, dtype=bool))
+    n_rows = flags.shape[0]
+
+    edges = np.diff(np.pad(flags.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+
+    longest = np.zeros(n_rows, dtype=np.int64)
+    np.maximum.at(longest, start_rows, end_cols - start_cols)
+
+    return longest
+
 def calculate_streaks(profit_labels):
     """
     Calcula las rachas máximas de ganancias y pérdidas
@@ -124,20 +158,10 @@ def calculate_streaks(profit_labels):
     if len(profit_labels) == 0:
         return 0, 0
 
-    max_winning_streak = 0
-    max_losing_streak = 0
-    current_winning_streak = 0
-    current_losing_streak = 0
-
-    for label in profit_labels:
-        if label == 'PROFIT':
-            current_winning_streak += 1
-            current_losing_streak = 0
-            max_winning_streak = max(max_winning_streak, current_winning_streak)
-        else:
-            current_losing_streak += 1
-            current_winning_streak = 0
-            max_losing_streak = max(max_losing_streak, current_losing_streak)
+    is_profit = np.asarray(profit_labels) == 'PROFIT'
+
+    max_winning_streak = int(max_run_lengths(is_profit)[0])
+    max_losing_streak = int(max_run_lengths(~is_profit)[0])
 
     return max_winning_streak, max_losing_streak
 
@@ -162,30 +186,78 @@ def calculate_drawdown_stats(equity_curve):
     max_drawdown = drawdown.min()
     max_drawdown_pct = drawdown_pct.min()
 
-    # Duración del drawdown
-    in_drawdown = drawdown < 0
-    drawdown_periods = []
+    # Duración del drawdown (racha más larga de trades por debajo del peak)
+    in_drawdown = (drawdown < 0).to_numpy()
+    max_drawdown_duration = int(max_run_lengths(in_drawdown)[0])
+
+    return {
+        'max_drawdown': max_drawdown,
+        'max_drawdown_pct': max_drawdown_pct,
+        'max_drawdown_duration': max_drawdown_duration,
+        'drawdown_series': drawdown
+    }
+
+def calculate_batch_trade_stats(pnl_matrix):
+    """
+    Rachas y drawdown de muchos sets de parámetros en una sola llamada vectorizada
 
-    if in_drawdown.any():
-        start_dd = None
-        for i, is_dd in enumerate(in_drawdown):
-            if is_dd and start_dd is None:
-                start_dd = i
-            elif not is_dd and start_dd is not None:
-                drawdown_periods.append(i - start_dd)
-                start_dd = None
+    Cada fila es la secuencia de profit_usd de un set (en orden cronológico), rellenada
+    con NaN al final hasta la longitud de la fila más larga. Los resultados coinciden con
+    calculate_streaks (PROFIT = profit > 0) y calculate_drawdown_stats fila a fila.
 
-        # Si termina en drawdown
-        if start_dd is not None:
-            drawdown_periods.append(len(in_drawdown) - start_dd)
+    Parameters:
+    pnl_matrix (array): Matriz sets x trades de P&L por trade, con NaN como relleno
 
-    max_drawdown_duration = max(drawdown_periods) if drawdown_periods else 0
+    Returns:
+    dict: Arrays por set con total_trades, max_winning_streak, max_losing_streak,
+          max_drawdown, max_drawdown_pct, max_drawdown_duration y recovery_time (trades
+          desde el valle del máximo drawdown hasta recuperar el peak; NaN si no se recupera)
+    """
+    pnl = np.atleast_2d(np.asarray(pnl_matrix, dtype=np.float64))
+    if pnl.shape[1] == 0:
+        pnl = np.full((len(pnl), 1), np.nan)
+    valid = ~np.isnan(pnl)
+    total_trades = valid.sum(axis=1)
+
+    # Rachas (el relleno no cuenta ni como ganancia ni como pérdida)
+    is_profit = valid & (pnl > 0)
+    max_winning_streak = max_run_lengths(is_profit)
+    max_losing_streak = max_run_lengths(valid & ~is_profit)
+
+    # Equity y drawdown (el relleno repite el último valor y queda fuera de las máscaras)
+    equity = np.cumsum(np.where(valid, pnl, 0.0), axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    drawdown = np.where(valid, equity - peak, np.nan)
+
+    has_trades = total_trades > 0
+    filled = np.where(valid, drawdown, np.inf)
+    trough = np.argmin(filled, axis=1)
+    max_drawdown = np.where(has_trades, filled[np.arange(len(pnl)), trough], np.nan)
+
+    # Drawdown en % del peak (mismas divisiones que calculate_drawdown_stats; NaN se ignora)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown_pct = np.where(valid, drawdown / peak * 100, np.nan)
+    drawdown_pct = np.where(np.isnan(drawdown_pct), np.inf, drawdown_pct).min(axis=1)
+    max_drawdown_pct = np.where(drawdown_pct == np.inf, np.nan, drawdown_pct)
+
+    max_drawdown_duration = max_run_lengths(valid & (drawdown < 0))
+
+    # Recuperación: primer trade posterior al valle que vuelve a tocar el peak
+    columns = np.arange(pnl.shape[1])
+    recovered = valid & (drawdown >= 0) & (columns[None, :] > trough[:, None])
+    first_recovery = np.argmax(recovered, axis=1)
+    recovery_time = np.where(recovered.any(axis=1), first_recovery - trough, np.nan)
+    recovery_time[has_trades & (max_drawdown == 0)] = 0
+    recovery_time[~has_trades] = np.nan
 
     return {
+        'total_trades': total_trades,
+        'max_winning_streak': max_winning_streak,
+        'max_losing_streak': max_losing_streak,
         'max_drawdown': max_drawdown,
         'max_drawdown_pct': max_drawdown_pct,
         'max_drawdown_duration': max_drawdown_duration,
-        'drawdown_series': drawdown
+        'recovery_time': recovery_time
     }
 
 def calculate_risk_ratios(df):
@@ -580,16 +652,14 @@ def create_performance_charts(df, stats, filename_prefix):
         opacity=0.7
     ), row=2, col=1)
 
-    # 4. Rolling win rate
-    df_sorted = df.sort_values('exit_time')
-    window = min(20, len(df_sorted) // 4)  # Ventana móvil
+    # 4. Rolling win rate (sumas acumuladas de rolling_metrics, sin apply por trade)
+    window = min(20, len(df) // 4)  # Ventana móvil
     if window > 0:
-        rolling_wins = df_sorted['profit_label'].apply(lambda x: 1 if x == 'PROFIT' else 0)
-        rolling_win_rate = rolling_wins.rolling(window=window).mean() * 100
+        rolling = rolling_metrics_frame(df, window)
 
         fig.add_trace(go.Scatter(
-            x=df_sorted['exit_time'],
-            y=rolling_win_rate,
+            x=rolling['exit_time'],
+            y=rolling['win_rate'],
             mode='lines',
             name=f'Rolling Win Rate ({window} trades)',
             line=dict(color='purple', width=2)
@@ -809,6 +879,105 @@ def generate_strategy_summary(filename=None):
 
     return stats, risk_ratios, df
 
+def summarize_tracking_file(filename):
+    """
+    Métricas de un tracking record sin generar gráficos (una fila del leaderboard)
+
+    El drawdown no se calcula aquí: se devuelve el P&L ordenado por salida para que
+    generate_batch_summary lo resuelva para todos los archivos con calculate_batch_trade_stats.
+
+    Parameters:
+    filename (str): Nombre del archivo de tracking en outputs/
+
+    Returns:
+    tuple: (row, pnl) - estadísticas básicas y ratios de riesgo del archivo, y profit_usd
+           ordenado por exit_time (misma equity curve que generate_strategy_summary)
+    """
+    df, tracking_filename = load_tracking_data(filename, verbose=False)
+
+    row = {
+        'filename': tracking_filename,
+        'strategy': tracking_filename.replace('tracking_record_', '').replace('.csv', '')
+    }
+    if len(df) == 0:
+        row['total_trades'] = 0
+        return row, np.array([], dtype=np.float64)
+
+    row.update(calculate_basic_stats(df))
+    row.update(calculate_risk_ratios(df))
+
+    pnl = df.sort_values('exit_time')['profit_usd'].to_numpy(dtype=np.float64)
+
+    return row, pnl
+
+def generate_batch_summary(pattern='tracking_record_*.csv', sort_by='total_profit_usd',
+                           ascending=False, processes=None):
+    """
+    Analiza en paralelo todos los tracking records de outputs/ y guarda un leaderboard
+
+    No genera gráficos: cada worker calcula las métricas de un archivo y el resultado
+    se guarda como un único CSV ordenado en outputs/summary_leaderboard.csv.
+
+    Parameters:
+    pattern (str): Patrón de los archivos a analizar dentro de outputs/
+    sort_by (str): Columna por la que se ordena el leaderboard
+    ascending (bool): Orden ascendente (p.ej. para max_drawdown_duration)
+    processes (int): Número de procesos (None = todos los cores)
+
+    Returns:
+    DataFrame: Una fila por archivo con sus métricas, ordenada por sort_by
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    outputs_dir = os.path.join(os.path.dirname(current_dir), 'outputs')
+
+    tracking_files = sorted(os.path.basename(path) for path in glob.glob(os.path.join(outputs_dir, pattern)))
+    if not tracking_files:
+        raise FileNotFoundError(f"No se encontraron archivos '{pattern}' en {outputs_dir}")
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(tracking_files)))
+
+    print(f"Analizando {len(tracking_files)} tracking records con {processes} procesos...")
+
+    rows = []
+    pnl_rows = []
+    with Pool(processes=processes) as pool:
+        for row, pnl in pool.imap_unordered(summarize_tracking_file, tracking_files):
+            rows.append(row)
+            pnl_rows.append(pnl)
+            print(f"  {len(rows):,}/{len(tracking_files):,} archivos analizados", end='\r')
+    print()
+
+    # Drawdown y recuperación de todos los archivos en una sola llamada (matriz con relleno NaN)
+    pnl_matrix = np.full((len(pnl_rows), max(len(pnl) for pnl in pnl_rows)), np.nan)
+    for i, pnl in enumerate(pnl_rows):
+        pnl_matrix[i, :len(pnl)] = pnl
+    batch_stats = calculate_batch_trade_stats(pnl_matrix)
+
+    leaderboard = pd.DataFrame(rows)
+    for col in ['max_drawdown', 'max_drawdown_pct', 'max_drawdown_duration', 'recovery_time']:
+        leaderboard[col] = np.where(batch_stats['total_trades'] > 0, batch_stats[col], np.nan)
+    if sort_by not in leaderboard.columns:
+        raise ValueError(f"Columna de ordenación desconocida: {sort_by}")
+
+    leaderboard = leaderboard.sort_values(sort_by, ascending=ascending, na_position='last').reset_index(drop=True)
+    leaderboard.insert(0, 'rank', np.arange(1, len(leaderboard) + 1))
+
+    full_path = os.path.join(outputs_dir, 'summary_leaderboard.csv')
+    leaderboard.to_csv(full_path, index=False)
+    print(f"Leaderboard guardado en: {full_path}")
+
+    print(f"\n=== TOP 10 POR {sort_by} ===")
+    top_columns = ['rank', 'strategy', 'total_trades', 'win_rate', 'total_profit_usd', 'profit_factor',
+                   'sharpe_ratio', 'max_drawdown']
+    print(leaderboard[[col for col in top_columns if col in leaderboard.columns]].head(10).to_string(index=False))
+
+    return leaderboard
+
 if __name__ == "__main__":
-    # Ejecutar análisis
-    stats, risk_ratios, df = generate_strategy_summary(target_filename)
\ No newline at end of file
+    if batch_mode:
+        leaderboard = generate_batch_summary(sort_by=leaderboard_sort_by)
+    else:
+        # Ejecutar análisis
+        stats, risk_ratios, df = generate_strategy_summary(target_filename)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import numpy as np
+
+# Esquema fijo del registro de trades del motor de breakout (un registro por trade)
+BREAKOUT_TRADE_DTYPE = np.dtype([
+    ('entry_idx', np.int64),      # fila de entrada
+    ('exit_idx', np.int64),       # fila de salida
+    ('entry_ns', np.int64),       # timestamp de entrada (ns UTC)
+    ('exit_ns', np.int64),        # timestamp de salida (ns UTC)
+    ('entry_day', np.int32),      # posición del día de entrada
+    ('exit_day', np.int32),       # posición del día de salida
+    ('direction', np.int8),       # 1 = BUY, -1 = SELL
+    ('exit_code', np.int8),       # EXIT_STOP_LOSS / EXIT_TARGET / EXIT_END_OF_PERIOD
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('stop_level', np.float64),   # stop final (entrada si se activó el break-even)
+    ('is_profit', np.bool_)
+])
+
+# Esquema fijo del registro de trades del sistema contrarian (mismos nombres que run_contrarian_grid)
+CONTRARIAN_TRADE_DTYPE = np.dtype([
+    ('day', np.int32),            # posición del día operado
+    ('entry_row', np.int64),
+    ('exit_row', np.int64),
+    ('direction', np.int8),       # 1 = BUY, -1 = SELL
+    ('exit_code', np.int8),       # EXIT_STOP_LOSS / EXIT_TARGET / EXIT_EOD
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('prev_day_range', np.float64),
+    ('prev_high', np.float64),
+    ('prev_low', np.float64),
+    ('current_open', np.float64),
+    ('current_high', np.float64),
+    ('current_low', np.float64),
+    ('current_close', np.float64)
+])
+
+def create_trade_buffer(dtype, capacity=256):
+    """
+    Crea un registro de trades preasignado con esquema fijo (array estructurado de NumPy)
+
+    Parameters:
+    dtype (np.dtype): Esquema del registro (BREAKOUT_TRADE_DTYPE o CONTRARIAN_TRADE_DTYPE)
+    capacity (int): Capacidad inicial (se duplica al llenarse)
+
+    Returns:
+    dict: 'data' (array estructurado) y 'size' (trades registrados)
+    """
+    return {'data': np.zeros(max(int(capacity), 1), dtype=dtype), 'size': 0}
+
+def append_trade(buffer, record):
+    """
+    Añade un trade al registro, duplicando la capacidad si está lleno
+
+    Parameters:
+    buffer (dict): Resultado de create_trade_buffer
+    record (tuple): Valores en el orden de los campos del esquema
+    """
+    data = buffer['data']
+    size = buffer['size']
+    if size == len(data):
+        grown = np.zeros(2 * len(data), dtype=data.dtype)
+        grown[:size] = data
+        buffer['data'] = data = grown
+
+    data[size] = record
+    buffer['size'] = size + 1
+
+def trade_records(buffer, copy=False):
+    """
+    Trades registrados como array estructurado (acceso por campo: records['entry_idx'])
+
+    Parameters:
+    buffer (dict): Resultado de create_trade_buffer
+    copy (bool): True devuelve una copia compacta (sin la capacidad libre), lista para
+                 enviarse con pickle desde un proceso worker
+
+    Returns:
+    ndarray: Array estructurado con un registro por trade
+    """
+    records = buffer['data'][:buffer['size']]
+    return records.copy() if copy else records
+
+if __name__ == "__main__":
+    print("Trade buffer module loaded successfully")
+    print("Available functions:")
+    print("- create_trade_buffer(dtype, capacity=256)")
+    print("- append_trade(buffer, record)")
+    print("- trade_records(buffer, copy=False)")
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Columnas de marcadores que order_management añade a df_with_trades
+MARKER_COLUMNS = ['entry_time', 'entry_price', 'exit_time', 'exit_price', 'trade_type']
+
+def _time_values(values):
+    """
+    Timestamps como int64 en ns UTC (para comparar fechas con distinta unidad)
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(values))
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+def _matching_rows(date_ns, times_ns):
+    """
+    Filas de date_ns (ordenado) iguales a cada tiempo, por búsqueda binaria
+
+    Returns:
+    tuple: (posición del tiempo en times_ns, fila) por cada coincidencia
+    """
+    left = np.searchsorted(date_ns, times_ns, side='left')
+    right = np.searchsorted(date_ns, times_ns, side='right')
+    counts = right - left
+
+    owner = np.repeat(np.arange(len(times_ns)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return owner, np.repeat(left, counts) + offsets
+
+def build_trade_markers(df, trades_df):
+    """
+    Tabla dispersa de marcadores de entrada/salida, una fila por minuto marcado
+
+    Las filas se localizan con searchsorted sobre la columna 'date' ordenada
+    (O(trades · log n)), sin máscaras sobre todo el DataFrame ni copias. Si dos trades
+    marcan el mismo minuto prevalece el último, como en el bucle de order_management.
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha (índice 0..n-1)
+    trades_df (DataFrame): Registro de operaciones con entry_time/exit_time
+
+    Returns:
+    DataFrame: Columnas row (offset en df), date y MARKER_COLUMNS (NaN/NaT/'' donde no aplica)
+    """
+    columns = ['row', 'date'] + MARKER_COLUMNS
+    if len(trades_df) == 0:
+        return pd.DataFrame(columns=columns)
+
+    date_ns = _time_values(df['date'])
+
+    entry_owner, entry_rows = _matching_rows(date_ns, _time_values(trades_df['entry_time']))
+    exit_owner, exit_rows = _matching_rows(date_ns, _time_values(trades_df['exit_time']))
+
+    entries = pd.DataFrame({
+        'row': entry_rows,
+        'entry_time': trades_df['entry_time'].to_numpy()[entry_owner],
+        'entry_price': trades_df['entry_price'].to_numpy()[entry_owner],
+        'trade_type': trades_df['trade_type'].to_numpy()[entry_owner]
+    }).drop_duplicates('row', keep='last')
+
+    exits = pd.DataFrame({
+        'row': exit_rows,
+        'exit_time': trades_df['exit_time'].to_numpy()[exit_owner],
+        'exit_price': trades_df['exit_price'].to_numpy()[exit_owner]
+    }).drop_duplicates('row', keep='last')
+
+    markers = entries.merge(exits, on='row', how='outer').sort_values('row').reset_index(drop=True)
+    markers['trade_type'] = markers['trade_type'].fillna('')
+    markers['date'] = df['date'].iloc[markers['row'].to_numpy()].to_numpy()
+
+    return markers[columns]
+
+def join_trade_markers(df, markers):
+    """
+    Une los marcadores dispersos al DataFrame completo (mismo esquema que df_with_trades)
+
+    Parameters:
+    df (DataFrame): Datos de 1 minuto ordenados por fecha (índice 0..n-1)
+    markers (DataFrame): Resultado de build_trade_markers
+
+    Returns:
+    DataFrame: Copia de df con las columnas de MARKER_COLUMNS
+    """
+    df_with_trades = df.copy()
+
+    # Inicializar columnas con el mismo tipo de datetime que 'date'
+    df_with_trades['entry_time'] = pd.Series(dtype='datetime64[ns, UTC]')
+    df_with_trades['entry_price'] = np.nan
+    df_with_trades['exit_time'] = pd.Series(dtype='datetime64[ns, UTC]')
+    df_with_trades['exit_price'] = np.nan
+    df_with_trades['trade_type'] = ''
+
+    if len(markers) == 0:
+        return df_with_trades
+
+    rows = markers['row'].to_numpy(dtype=np.int64)
+    for col in MARKER_COLUMNS:
+        df_with_trades.iloc[rows, df_with_trades.columns.get_loc(col)] = markers[col].to_numpy()
+
+    return df_with_trades
+
+if __name__ == "__main__":
+    print("Trade markers module loaded successfully")
+    print("Available functions:")
+    print("- build_trade_markers(df, trades_df)")
+    print("- join_trade_markers(df, markers)")
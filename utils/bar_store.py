@@ -0,0 +1,411 @@
+import io
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from utils.minute_loader import load_minute_csv, load_minute_csv_tail, csv_prefix_digest
+
+# Directorio (dentro de data/) con un fichero .npy por columna, abiertos con memory-mapping
+STORE_DIRNAME = 'es_1min_bars'
+MANIFEST_FILENAME = 'manifest.json'
+TIMESTAMP_FILENAME = 'date_ns.npy'
+DAY_FILENAMES = {'day_ns': 'day_ns.npy', 'day_start': 'day_start.npy', 'day_end': 'day_end.npy'}
+
+_NS_PER_DAY = 86_400 * 1_000_000_000
+
+def get_store_dir(data_path):
+    """
+    Devuelve el directorio del bar store asociado a un fichero de datos de 1 minuto
+
+    Parameters:
+    data_path (str): Ruta al CSV original (p.ej. data/es_1min_data.csv)
+
+    Returns:
+    str: Ruta del directorio del bar store
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(data_path)), STORE_DIRNAME)
+
+def _source_signature(data_path):
+    """
+    Firma ligera del CSV original (tamaño + fecha de modificación)
+    """
+    stat = os.stat(data_path)
+    return {
+        'source': os.path.basename(data_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+def _load_manifest(store_dir):
+    manifest_path = os.path.join(store_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def has_bar_store(data_path):
+    """
+    Comprueba si existe un bar store para el CSV (aunque esté desactualizado)
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+
+    Returns:
+    bool: True si el directorio del bar store tiene manifest
+    """
+    return _load_manifest(get_store_dir(data_path)) is not None
+
+def is_store_valid(data_path, store_dir=None):
+    """
+    Comprueba si el bar store corresponde al CSV actual
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    store_dir (str): Directorio del bar store (opcional)
+
+    Returns:
+    bool: True si el bar store existe y el CSV no ha cambiado desde su creación
+    """
+    if store_dir is None:
+        store_dir = get_store_dir(data_path)
+
+    manifest = _load_manifest(store_dir)
+    if manifest is None:
+        return False
+
+    return manifest.get('signature') == _source_signature(data_path)
+
+def _save_day_table(store_dir, date_ns):
+    """
+    Guarda la tabla de offsets por día UTC: filas [day_start, day_end) de cada día
+
+    Returns:
+    int: Número de días
+    """
+    day_values = np.asarray(date_ns) // _NS_PER_DAY
+    change_points = np.flatnonzero(day_values[1:] != day_values[:-1]) + 1
+    day_start = np.concatenate(([0], change_points)).astype(np.int64)
+    day_end = np.concatenate((change_points, [len(day_values)])).astype(np.int64)
+    if len(day_values) == 0:
+        day_start = day_end = np.array([], dtype=np.int64)
+    np.save(os.path.join(store_dir, DAY_FILENAMES['day_ns']), day_values[day_start] * _NS_PER_DAY)
+    np.save(os.path.join(store_dir, DAY_FILENAMES['day_start']), day_start)
+    np.save(os.path.join(store_dir, DAY_FILENAMES['day_end']), day_end)
+
+    return int(len(day_start))
+
+def _append_npy(path, values, rows):
+    """
+    Añade values al final de un .npy de una dimensión con rows filas válidas
+
+    Se reescribe solo la cabecera (misma longitud gracias al relleno del formato) y se
+    escriben los bytes nuevos tras las rows primeras filas, así que repetir una escritura
+    interrumpida no duplica datos.
+
+    Returns:
+    bool: False si no se puede añadir sin reescribir el fichero (dtype o cabecera distintos)
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            read_header, write_header = np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0
+        elif version == (2, 0):
+            read_header, write_header = np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0
+        else:
+            return False
+        shape, fortran_order, dtype = read_header(f)
+        data_offset = f.tell()
+        if len(shape) != 1 or fortran_order or values.dtype != dtype:
+            return False
+
+        header = io.BytesIO()
+        write_header(header, {'descr': np.lib.format.dtype_to_descr(dtype),
+                              'fortran_order': False,
+                              'shape': (rows + len(values),)})
+        if len(header.getvalue()) != data_offset:
+            return False
+
+        f.seek(0)
+        f.write(header.getvalue())
+        f.seek(data_offset + rows * dtype.itemsize)
+        f.truncate()
+        f.write(np.ascontiguousarray(values).tobytes())
+
+    return True
+
+def append_bar_store(data_path, store_dir=None):
+    """
+    Añade al bar store solo las filas nuevas del final del CSV
+
+    Lee el CSV a partir del tamaño ya procesado (load_minute_csv_tail), añade los valores al
+    final de cada .npy y regenera la tabla de días (pequeña). Si el CSV no ha crecido solo por
+    el final, o las filas nuevas no encajan en los ficheros existentes, se reconstruye completo.
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    store_dir (str): Directorio del bar store (opcional)
+
+    Returns:
+    dict: Manifest actualizado
+    """
+    if store_dir is None:
+        store_dir = get_store_dir(data_path)
+
+    manifest = _load_manifest(store_dir)
+    df_new = None
+    if manifest is not None and 'prefix_digest' in manifest and manifest['rows'] > 0:
+        date_ns = np.load(os.path.join(store_dir, TIMESTAMP_FILENAME), mmap_mode='r')
+        last_time = pd.Timestamp(int(date_ns[manifest['rows'] - 1]), tz='UTC')
+        del date_ns
+        df_new = load_minute_csv_tail(data_path, manifest['signature']['size'], manifest['prefix_digest'],
+                                      after=last_time if manifest['index_tz'] is not None else last_time.tz_localize(None))
+    if df_new is None or list(df_new.columns) != manifest['columns']:
+        return build_bar_store(data_path, store_dir)
+
+    index = df_new.index
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    new_values = {TIMESTAMP_FILENAME: index.tz_convert('UTC').as_unit('ns').asi8}
+    for col in manifest['columns']:
+        new_values[f'{col}.npy'] = df_new[col].to_numpy()
+
+    for filename, values in new_values.items():
+        if not _append_npy(os.path.join(store_dir, filename), values, manifest['rows']):
+            return build_bar_store(data_path, store_dir)
+
+    rows = manifest['rows'] + len(df_new)
+    date_ns = np.load(os.path.join(store_dir, TIMESTAMP_FILENAME), mmap_mode='r')
+    day_count = _save_day_table(store_dir, date_ns)
+    del date_ns
+
+    signature = _source_signature(data_path)
+    manifest.update({
+        'signature': signature,
+        'prefix_digest': csv_prefix_digest(data_path, signature['size']),
+        'rows': int(rows),
+        'days': day_count
+    })
+    with open(os.path.join(store_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Bar store actualizado: {len(df_new):,} registros añadidos ({rows:,} en total, {day_count:,} días)")
+
+    return manifest
+
+def build_bar_store(data_path, store_dir=None):
+    """
+    Convierte (una sola vez) el CSV de 1 minuto a un array .npy por columna más una tabla de offsets por día
+
+    Los timestamps se guardan como int64 (ns desde epoch, UTC) para poder abrirlos sin parsear.
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    store_dir (str): Directorio del bar store (opcional)
+
+    Returns:
+    dict: Manifest con la firma del CSV, columnas y número de días
+    """
+    if store_dir is None:
+        store_dir = get_store_dir(data_path)
+
+    print(f"Construyendo bar store desde: {data_path}")
+    df = load_minute_csv(data_path)
+
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    # Regenerar desde cero para no mezclar columnas antiguas
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+
+    index = df.index
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    date_ns = index.tz_convert('UTC').as_unit('ns').asi8
+    np.save(os.path.join(store_dir, TIMESTAMP_FILENAME), date_ns)
+
+    columns = []
+    for col in df.columns:
+        np.save(os.path.join(store_dir, f'{col}.npy'), df[col].to_numpy())
+        columns.append(col)
+
+    day_count = _save_day_table(store_dir, date_ns)
+
+    # El manifest se escribe al final: si la conversión se interrumpe, el store no se da por válido
+    signature = _source_signature(data_path)
+    manifest = {
+        'signature': signature,
+        'prefix_digest': csv_prefix_digest(data_path, signature['size']),
+        'rows': int(len(df)),
+        'days': day_count,
+        'index_name': df.index.name,
+        'index_unit': df.index.unit,
+        'index_tz': None if df.index.tz is None else str(df.index.tz),
+        'columns': columns
+    }
+    with open(os.path.join(store_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Bar store creado en: {store_dir} ({len(columns)} columnas, {len(df):,} registros, {day_count:,} días)")
+
+    return manifest
+
+def open_bar_store(data_path, store_dir=None):
+    """
+    Abre el bar store con memory-mapping (no lee los datos, solo mapea los ficheros)
+
+    Si el CSV solo ha crecido por el final, se añaden las filas nuevas (append_bar_store);
+    si el bar store no existe o el CSV ha cambiado de otra forma, se reconstruye.
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    store_dir (str): Directorio del bar store (opcional)
+
+    Returns:
+    dict: Arrays de solo lectura date_ns, columnas de precio/volumen, day_ns/day_start/day_end y 'manifest'
+    """
+    if store_dir is None:
+        store_dir = get_store_dir(data_path)
+
+    if is_store_valid(data_path, store_dir):
+        manifest = _load_manifest(store_dir)
+    else:
+        manifest = append_bar_store(data_path, store_dir)
+
+    store = {'manifest': manifest}
+    store['date_ns'] = np.load(os.path.join(store_dir, TIMESTAMP_FILENAME), mmap_mode='r')
+    for col in manifest['columns']:
+        store[col] = np.load(os.path.join(store_dir, f'{col}.npy'), mmap_mode='r')
+    for name, filename in DAY_FILENAMES.items():
+        store[name] = np.load(os.path.join(store_dir, filename), mmap_mode='r')
+
+    return store
+
+def _bound_ns(value, is_end):
+    """
+    Convierte un límite de fecha a ns UTC con la semántica de .loc[start:end]
+
+    Un límite en texto sin zona horaria cubre el período completo de su propia resolución
+    ('2018' todo el año, '2018-02' todo el mes, 'YYYY-MM-DD' el día completo), como el
+    slicing parcial por strings de pandas.
+    """
+    ts = pd.Timestamp(value)
+    if isinstance(value, str) and ts.tzinfo is None:
+        period = pd.Period(value.strip())
+        bound = (period + 1).start_time if is_end else period.start_time
+        return bound.tz_localize('UTC').as_unit('ns').value, 'left'
+
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    ns = ts.tz_convert('UTC').as_unit('ns').value
+    return ns, 'right' if is_end else 'left'
+
+def find_range(store, start_date=None, end_date=None):
+    """
+    Localiza las filas de un rango de fechas por búsqueda binaria sobre los timestamps
+
+    Parameters:
+    store (dict): Resultado de open_bar_store
+    start_date (str): Fecha inicial (opcional, None = desde el principio)
+    end_date (str): Fecha final inclusive (opcional, None = hasta el final)
+
+    Returns:
+    tuple: (lo, hi) - filas [lo, hi) del rango
+    """
+    date_ns = store['date_ns']
+
+    lo = 0
+    if start_date is not None:
+        ns, side = _bound_ns(start_date, is_end=False)
+        lo = int(np.searchsorted(date_ns, ns, side=side))
+
+    hi = len(date_ns)
+    if end_date is not None:
+        ns, side = _bound_ns(end_date, is_end=True)
+        hi = int(np.searchsorted(date_ns, ns, side=side))
+
+    return lo, max(lo, hi)
+
+def slice_bar_store(store, start_date=None, end_date=None):
+    """
+    Vistas (sin copia) de todas las columnas para un rango de fechas
+
+    La tabla de días se recorta a los días del rango y sus offsets se rebasan al inicio del slice.
+
+    Parameters:
+    store (dict): Resultado de open_bar_store
+    start_date (str): Fecha inicial (opcional)
+    end_date (str): Fecha final inclusive (opcional)
+
+    Returns:
+    dict: Vistas date_ns y columnas, más day_ns/day_start/day_end del rango
+    """
+    lo, hi = find_range(store, start_date, end_date)
+
+    views = {'date_ns': store['date_ns'][lo:hi]}
+    for col in store['manifest']['columns']:
+        views[col] = store[col][lo:hi]
+
+    # Días que solapan [lo, hi) (el primero y el último pueden quedar recortados)
+    first_day = int(np.searchsorted(store['day_end'], lo, side='right'))
+    last_day = int(np.searchsorted(store['day_start'], hi, side='left'))
+    views['day_ns'] = store['day_ns'][first_day:last_day]
+    views['day_start'] = np.clip(store['day_start'][first_day:last_day], lo, hi) - lo
+    views['day_end'] = np.clip(store['day_end'][first_day:last_day], lo, hi) - lo
+
+    return views
+
+def bar_store_frame(views, manifest, as_index=True):
+    """
+    DataFrame sobre las vistas de slice_bar_store sin copiar las columnas
+
+    Las columnas de precio/volumen son las propias vistas (solo lectura, memory-mapped);
+    solo los timestamps se convierten a la resolución y zona horaria originales.
+
+    Parameters:
+    views (dict): Resultado de slice_bar_store
+    manifest (dict): Manifest del bar store (store['manifest'])
+    as_index (bool): Si usar la fecha como índice (True) o como primera columna (False)
+
+    Returns:
+    DataFrame: Mismas columnas y tipos que load_minute_csv
+    """
+    dates = pd.DatetimeIndex(np.asarray(views['date_ns']).view('datetime64[ns]'), name=manifest['index_name'])
+    if manifest['index_tz'] is not None:
+        dates = dates.tz_localize('UTC').tz_convert(manifest['index_tz'])
+    dates = dates.as_unit(manifest['index_unit'])
+
+    columns = {col: np.asarray(views[col]) for col in manifest['columns']}
+    if as_index:
+        return pd.DataFrame(columns, index=dates, copy=False)
+    return pd.DataFrame({manifest['index_name']: dates, **columns}, copy=False)
+
+def load_bar_range(data_path, start_date=None, end_date=None):
+    """
+    Carga un rango de fechas del bar store como DataFrame indexado por fecha
+
+    Las columnas no se copian: son vistas de solo lectura sobre los ficheros mapeados
+    (para modificar valores en el sitio, usar .copy()).
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    start_date (str): Fecha inicial 'YYYY-MM-DD' (opcional)
+    end_date (str): Fecha final 'YYYY-MM-DD' inclusive (opcional)
+
+    Returns:
+    DataFrame: Mismo resultado que pd.read_csv(..., index_col=0, parse_dates=True).loc[start_date:end_date]
+    """
+    store = open_bar_store(data_path)
+    manifest = store['manifest']
+    df = bar_store_frame(slice_bar_store(store, start_date, end_date), manifest)
+
+    print(f"Bar store: {len(df):,} de {manifest['rows']:,} registros")
+
+    return df
+
+if __name__ == "__main__":
+    # Conversión única del histórico completo
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    build_bar_store(os.path.join(parent_dir, 'data', 'es_1min_data.csv'))
@@ -1,4 +1,9 @@
 import pandas as pd
+import numpy as np
+
+# Nombres de los días; el código dow_code es la posición + 1 (1=lunes ... 7=domingo),
+# la misma numeración que dow_filter en main_strat.py
+DOW_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
 
 def add_day_of_week(df, date_column='date'):
     """
@@ -27,7 +32,20 @@ def add_day_of_week(df, date_column='date'):
 
     return df_copy
 
+def get_dow_codes(dates):
+    """
+    Devuelve el código int8 del día de la semana (1=lunes ... 7=domingo)
+
+    Parameters:
+    dates (Series): Serie de fechas (datetime)
+
+    Returns:
+    ndarray: Códigos int8 del día de la semana
+    """
+    return (pd.to_datetime(dates).dt.dayofweek.to_numpy() + 1).astype(np.int8)
+
 if __name__ == "__main__":
     print("Date utilities module loaded successfully")
     print("Available functions:")
-    print("- add_day_of_week(df, date_column='date')")
\ No newline at end of file
+    print("- add_day_of_week(df, date_column='date')")
+    print("- get_dow_codes(dates)")
\ No newline at end of file
@@ -0,0 +1,255 @@
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+from utils.minute_loader import load_minute_csv, load_minute_csv_tail, csv_prefix_digest
+from utils.bar_store import has_bar_store, load_bar_range
+
+# Directorio (dentro de data/) donde se guarda la caché columnar particionada
+CACHE_DIRNAME = 'es_1min_parquet'
+MANIFEST_FILENAME = 'manifest.json'
+
+def get_cache_dir(data_path):
+    """
+    Devuelve el directorio de caché asociado a un fichero de datos de 1 minuto
+
+    Parameters:
+    data_path (str): Ruta al CSV original (p.ej. data/es_1min_data.csv)
+
+    Returns:
+    str: Ruta del directorio de caché particionada
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(data_path)), CACHE_DIRNAME)
+
+def _source_signature(data_path):
+    """
+    Firma ligera del CSV original (tamaño + fecha de modificación)
+    """
+    stat = os.stat(data_path)
+    return {
+        'source': os.path.basename(data_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+def file_fingerprint(path, block_size=1 << 20):
+    """
+    Huella rápida de un fichero: tamaño, fecha de modificación y hash del primer y último bloque
+
+    Evita leer ficheros de varios GB completos y detecta tanto datos añadidos al final
+    como ficheros reemplazados.
+
+    Parameters:
+    path (str): Ruta del fichero
+    block_size (int): Bytes a leer al principio y al final (default 1 MB)
+
+    Returns:
+    str: Huella hexadecimal (sha1)
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    digest.update(f"{stat.st_size}|{stat.st_mtime_ns}".encode())
+
+    with open(path, 'rb') as f:
+        digest.update(f.read(block_size))
+        if stat.st_size > block_size:
+            f.seek(max(stat.st_size - block_size, block_size))
+            digest.update(f.read(block_size))
+
+    return digest.hexdigest()
+
+def _partition_path(cache_dir, year, month):
+    """
+    Ruta del fichero parquet de una partición año/mes
+    """
+    return os.path.join(cache_dir, f'year={year:04d}', f'month={month:02d}.parquet')
+
+def _load_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def is_cache_valid(data_path, cache_dir=None):
+    """
+    Comprueba si la caché particionada corresponde al CSV actual
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    cache_dir (str): Directorio de caché (opcional)
+
+    Returns:
+    bool: True si la caché existe y el CSV no ha cambiado desde su creación
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir(data_path)
+
+    manifest = _load_manifest(cache_dir)
+    if manifest is None:
+        return False
+
+    return manifest.get('signature') == _source_signature(data_path)
+
+def build_minute_cache(data_path, cache_dir=None):
+    """
+    Convierte (una sola vez) el CSV de 1 minuto a parquet particionado por año/mes
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    cache_dir (str): Directorio de caché (opcional)
+
+    Returns:
+    dict: Manifest con la firma del CSV y la lista de particiones
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir(data_path)
+
+    print(f"Construyendo caché particionada desde: {data_path}")
+    df = load_minute_csv(data_path)
+
+    # Regenerar desde cero para no mezclar particiones antiguas
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    partitions = []
+    for (year, month), part in df.groupby([df.index.year, df.index.month]):
+        part_path = _partition_path(cache_dir, int(year), int(month))
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        part.to_parquet(part_path)
+        partitions.append([int(year), int(month)])
+
+    # El manifest se escribe al final: si la conversión se interrumpe, la caché no se da por válida
+    signature = _source_signature(data_path)
+    manifest = {
+        'signature': signature,
+        'prefix_digest': csv_prefix_digest(data_path, signature['size']),
+        'rows': int(len(df)),
+        'start': str(df.index.min()),
+        'end': str(df.index.max()),
+        'partitions': partitions
+    }
+    with open(os.path.join(cache_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Caché creada en: {cache_dir} ({len(partitions)} particiones, {len(df):,} registros)")
+
+    return manifest
+
+def append_minute_cache(data_path, cache_dir=None):
+    """
+    Añade a la caché particionada solo las filas nuevas del final del CSV
+
+    Lee el CSV a partir del tamaño ya procesado (load_minute_csv_tail) y reescribe solo las
+    particiones año/mes que reciben filas. Si el CSV no ha crecido solo por el final, o la
+    caché es de una versión sin prefix_digest, se reconstruye completa.
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    cache_dir (str): Directorio de caché (opcional)
+
+    Returns:
+    dict: Manifest actualizado
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir(data_path)
+
+    manifest = _load_manifest(cache_dir)
+    df_new = None
+    if manifest is not None and 'prefix_digest' in manifest and manifest['rows'] > 0:
+        df_new = load_minute_csv_tail(data_path, manifest['signature']['size'], manifest['prefix_digest'],
+                                      after=pd.Timestamp(manifest['end']))
+    if df_new is None:
+        return build_minute_cache(data_path, cache_dir)
+
+    end = pd.Timestamp(manifest['end'])
+    partitions = [tuple(partition) for partition in manifest['partitions']]
+    for (year, month), part in df_new.groupby([df_new.index.year, df_new.index.month]):
+        year, month = int(year), int(month)
+        part_path = _partition_path(cache_dir, year, month)
+        if (year, month) in partitions:
+            # Solo las filas registradas en el manifest (una actualización interrumpida no duplica)
+            existing = pd.read_parquet(part_path)
+            part = pd.concat([existing.loc[:end], part])
+        else:
+            os.makedirs(os.path.dirname(part_path), exist_ok=True)
+            partitions.append((year, month))
+        part.to_parquet(part_path)
+
+    signature = _source_signature(data_path)
+    manifest.update({
+        'signature': signature,
+        'prefix_digest': csv_prefix_digest(data_path, signature['size']),
+        'rows': int(manifest['rows'] + len(df_new)),
+        'end': str(df_new.index.max()) if len(df_new) > 0 else manifest['end'],
+        'partitions': [list(partition) for partition in sorted(partitions)]
+    })
+    with open(os.path.join(cache_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Caché actualizada: {len(df_new):,} registros añadidos ({manifest['rows']:,} en total)")
+
+    return manifest
+
+def load_minute_range(data_path, start_date=None, end_date=None):
+    """
+    Carga datos de 1 minuto leyendo solo las particiones año/mes que solapan el rango
+
+    Si existe un bar store (utils/bar_store.py) se usa ese, que localiza el rango por
+    búsqueda binaria sin leer ni parsear nada más.
+    Si el CSV solo ha crecido por el final, se añaden a la caché las filas nuevas; si no
+    existe o ha cambiado de otra forma, se reconstruye automáticamente.
+    Si no hay motor parquet instalado (pyarrow), se lee el CSV completo como antes.
+
+    Parameters:
+    data_path (str): Ruta al CSV original
+    start_date (str): Fecha inicial 'YYYY-MM-DD' (opcional, None = desde el principio)
+    end_date (str): Fecha final 'YYYY-MM-DD' (opcional, None = hasta el final)
+
+    Returns:
+    DataFrame: Datos de 1 minuto indexados por fecha, igual que pd.read_csv(..., index_col=0, parse_dates=True)
+    """
+    if has_bar_store(data_path):
+        return load_bar_range(data_path, start_date, end_date)
+
+    cache_dir = get_cache_dir(data_path)
+
+    try:
+        if is_cache_valid(data_path, cache_dir):
+            manifest = _load_manifest(cache_dir)
+        else:
+            manifest = append_minute_cache(data_path, cache_dir)
+    except ImportError as e:
+        print(f"⚠️  Caché parquet no disponible ({e}). Leyendo CSV completo.")
+        df = load_minute_csv(data_path)
+        return df.loc[start_date:end_date]
+
+    # Seleccionar solo las particiones que solapan el rango pedido
+    first_month = None if start_date is None else (pd.Timestamp(start_date).year, pd.Timestamp(start_date).month)
+    last_month = None if end_date is None else (pd.Timestamp(end_date).year, pd.Timestamp(end_date).month)
+
+    selected = []
+    for year, month in manifest['partitions']:
+        if first_month is not None and (year, month) < first_month:
+            continue
+        if last_month is not None and (year, month) > last_month:
+            continue
+        selected.append(_partition_path(cache_dir, year, month))
+
+    print(f"Leyendo {len(selected)} de {len(manifest['partitions'])} particiones desde: {cache_dir}")
+
+    if not selected:
+        # Mantener el esquema aunque el rango no tenga datos
+        empty = pd.read_parquet(_partition_path(cache_dir, *manifest['partitions'][0]))
+        return empty.iloc[0:0]
+
+    df = pd.concat([pd.read_parquet(path) for path in selected])
+
+    return df.loc[start_date:end_date]
+
+if __name__ == "__main__":
+    # Conversión única del histórico completo
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    build_minute_cache(os.path.join(parent_dir, 'data', 'es_1min_data.csv'))
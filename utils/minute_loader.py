@@ -0,0 +1,144 @@
+import io
+import os
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Formato fijo de los timestamps de los CSV de 1 minuto: '2017-09-01 00:00:00+00:00'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S%z'
+_UTC_SUFFIX = '+00:00'
+_TIMESTAMP_LENGTH = 25
+
+def parse_timestamps(values):
+    """
+    Convierte timestamps UTC en texto a DatetimeIndex sin inferir el formato
+
+    Ruta rápida: si todos los valores tienen el formato fijo 'YYYY-MM-DD HH:MM:SS+00:00'
+    se recortan a 19 caracteres y NumPy los convierte directamente a datetime64[s].
+    Si no, se usa pd.to_datetime con el formato explícito y, como último recurso,
+    con inferencia (mismo resultado que parse_dates=True).
+
+    Parameters:
+    values (array-like): Timestamps en texto
+
+    Returns:
+    DatetimeIndex: Timestamps parseados (UTC si el texto lleva offset)
+    """
+    values = np.asarray(values)
+
+    if len(values) == 0:
+        return pd.DatetimeIndex(pd.to_datetime(values))
+
+    try:
+        # Un valor por la ruta de pandas para fijar la resolución de salida (ns/us según versión)
+        sample = pd.DatetimeIndex(pd.to_datetime(values[:1], format=TIMESTAMP_FORMAT))
+
+        text = values.astype(f'U{_TIMESTAMP_LENGTH}')
+        if (np.char.str_len(text) == _TIMESTAMP_LENGTH).all() and np.char.endswith(text, _UTC_SUFFIX).all():
+            seconds = text.astype('U19').astype('datetime64[s]')
+            return pd.DatetimeIndex(seconds).tz_localize('UTC').as_unit(sample.unit)
+
+        return pd.DatetimeIndex(pd.to_datetime(values, format=TIMESTAMP_FORMAT))
+    except (ValueError, TypeError):
+        return pd.DatetimeIndex(pd.to_datetime(values))
+
+def load_minute_csv(data_path, as_index=True):
+    """
+    Carga un CSV de 1 minuto con la columna de fecha en primera posición
+
+    Equivale a pd.read_csv(data_path, index_col=0, parse_dates=True) (o a leer y convertir
+    la columna 'date' con pd.to_datetime), pero parsea los timestamps con parse_timestamps.
+
+    Parameters:
+    data_path (str): Ruta al CSV
+    as_index (bool): Si usar la fecha como índice (True) o mantenerla como columna (False)
+
+    Returns:
+    DataFrame: Datos de 1 minuto con la fecha parseada
+    """
+    df = pd.read_csv(data_path)
+    date_column = df.columns[0]
+
+    start_time = time.perf_counter()
+    df[date_column] = parse_timestamps(df[date_column].to_numpy())
+    elapsed = time.perf_counter() - start_time
+
+    rate = len(df) / elapsed if elapsed > 0 else float('inf')
+    print(f"Timestamps parseados: {len(df):,} filas en {elapsed:.3f}s ({rate:,.0f} filas/s)")
+
+    if as_index:
+        df = df.set_index(date_column)
+
+    return df
+
+def csv_prefix_digest(data_path, size, block_size=1 << 16):
+    """
+    Huella de los primeros size bytes de un CSV (primer bloque y bloque que termina en size)
+
+    Permite comprobar más tarde que el fichero solo ha crecido por el final: si los mismos
+    bytes siguen en su sitio, lo que haya a partir de size son filas añadidas.
+
+    Parameters:
+    data_path (str): Ruta al CSV
+    size (int): Bytes del fichero que se dan por procesados
+    block_size (int): Bytes a leer en cada extremo (default 64 KB)
+
+    Returns:
+    str: Huella hexadecimal (sha1)
+    """
+    digest = hashlib.sha1()
+    with open(data_path, 'rb') as f:
+        digest.update(f.read(min(block_size, size)))
+        f.seek(max(size - block_size, 0))
+        digest.update(f.read(size - max(size - block_size, 0)))
+
+    return digest.hexdigest()
+
+def load_minute_csv_tail(data_path, offset, prefix_digest, after=None):
+    """
+    Carga solo las filas añadidas a un CSV de 1 minuto a partir del byte offset
+
+    Devuelve None si el fichero no es el mismo de antes con filas añadidas al final
+    (más corto, bytes anteriores modificados o última línea sin terminar): en ese caso
+    hay que releer el CSV completo.
+
+    Parameters:
+    data_path (str): Ruta al CSV
+    offset (int): Tamaño del fichero ya procesado (bytes)
+    prefix_digest (str): csv_prefix_digest(data_path, offset) guardado al procesarlo
+    after (Timestamp): Último timestamp ya procesado; las filas nuevas deben ser posteriores
+
+    Returns:
+    DataFrame: Filas nuevas indexadas por fecha (como load_minute_csv), o None
+    """
+    size = os.path.getsize(data_path)
+    if size < offset or csv_prefix_digest(data_path, offset) != prefix_digest:
+        return None
+
+    with open(data_path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset - 1)
+        if f.read(1) != b'\n':
+            return None
+        tail = f.read()
+
+    df = pd.read_csv(io.BytesIO(header + tail))
+    date_column = df.columns[0]
+    df[date_column] = parse_timestamps(df[date_column].to_numpy())
+    df = df.set_index(date_column)
+
+    if not df.index.is_monotonic_increasing or (after is not None and len(df) > 0 and df.index[0] <= after):
+        return None
+
+    print(f"Filas nuevas en {os.path.basename(data_path)}: {len(df):,} ({size - offset:,} bytes)")
+
+    return df
+
+if __name__ == "__main__":
+    print("Minute loader module loaded successfully")
+    print("Available functions:")
+    print("- parse_timestamps(values)")
+    print("- load_minute_csv(data_path, as_index=True)")
+    print("- csv_prefix_digest(data_path, size, block_size=65536)")
+    print("- load_minute_csv_tail(data_path, offset, prefix_digest, after=None)")